@@ -1,16 +1,59 @@
+import functools
+import hashlib
+import inspect
+import json
 import logging
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from stores.ContentIndex import ContentIndex
+from stores.DatasetStore import DatasetStore
+from stores.OperationHistory import OperationHistory
+from stores.OperationJournal import OperationJournal
+from stores.PresentationSummary import PresentationSummary
+from stores.SessionBackend import SessionBackend
+from errors.SessionStoreConflictException import SessionStoreConflictException
+from utils.clean_slide_name import clean_slide_name
+from utils.fit_text import BODY_TEXT_SIZE_PT, TextCapacities
+from utils.fork_presentation import fork_presentation
+from utils.recommend_layout import LayoutRecommender
+from utils.open_presentation import open_presentation
+from utils.update_footers import update_footers
 
 logger = logging.getLogger("SessionManager")
 
+# results of mutating tool calls kept per session for idempotency_key retries
+MAX_IDEMPOTENT_RESULTS = 128
+PRESENTATIONS_DIRECTORY = "presentations"
+
 
 
 class SessionManager:
     """Manages all active, authenticated client sessions."""
-    def __init__(self, slide_layouts_metadata: dict):
+    def __init__(self, slide_layouts_metadata: dict, backend: SessionBackend = None, text_capacities: TextCapacities = None):
         # The session_id will be the key for our dictionary
         self.active_sessions = {}
         logger.info("SessionManager initialized.")
         self.slide_layouts_metadata = slide_layouts_metadata
+        # the metadata does not change while the server runs, so its version is a hash of its content
+        self.slide_layouts_metadata_version = hashlib.sha1(
+            json.dumps(slide_layouts_metadata, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        # one lock per presentation so a version check and the change it guards happen together
+        self._session_locks = defaultdict(threading.RLock)
+        self._session_locks_lock = threading.Lock()
+        # unsaved changes are journaled so sessions can be rebuilt if the server restarts
+        self.journal = OperationJournal()
+        self._journaled_tools = {}
+        self._replaying = set()
+        self._recoverable = set(self.journal.presentation_filenames())
+        if self._recoverable:
+            logger.info(f"{len(self._recoverable)} presentations can be recovered from the journal")
+        # a shared backend lets several server workers use the same sessions
+        self.backend = backend or SessionBackend()
+        # the space for text in each layout's placeholders, shared by every session
+        self.text_capacities = text_capacities or TextCapacities()
+        self.layout_recommender = LayoutRecommender(slide_layouts_metadata, self.text_capacities)
 
 
     # def start_session(self, session_id: str):
@@ -25,5 +68,397 @@ class SessionManager:
 
     def get_presentation(self, presentation_filename: str):
         """Retrieves the presentation for a given session_id."""
+        self.open_session(presentation_filename)
         return self.active_sessions[presentation_filename].get('presentation')
 
+    def saving(self, presentation_filename: str) -> None:
+        """Called just before a session's presentation is written to the presentations directory."""
+        self.journal.saving(presentation_filename, self.get_version(presentation_filename))
+
+    def checkpoint(self, presentation_filename: str) -> None:
+        """Called after a session's presentation is written to the presentations directory, which makes its journal redundant."""
+        self.journal.checkpoint(presentation_filename, self.get_version(presentation_filename))
+        # datasets stay loaded after a save, so they are journaled again for the changes which use them
+        if 'datasets' in self.active_sessions[presentation_filename]:
+            for dataset_id, file_path in self.get_dataset_store(presentation_filename).sources().items():
+                self.journal.append_dataset(presentation_filename, dataset_id, file_path)
+        self._recoverable.add(presentation_filename)
+        self.store_session(presentation_filename)
+
+    def store_session(self, presentation_filename: str) -> None:
+        """
+        Writes the changes to a session's presentation to a shared backend. A session which has not been stored before
+        replaces any presentation the backend holds under the same filename.
+        """
+        if not self.backend.shared:
+            return
+        session = self.active_sessions[presentation_filename]
+        base_version = session['stored_version'] if 'stored_version' in session else self.backend.stored_version(presentation_filename)
+        self.backend.store(presentation_filename, session['presentation'], base_version, session.get('version', 0))
+        session['stored_version'] = session.get('version', 0)
+
+    def open_session(self, presentation_filename: str) -> bool:
+        """
+        Starts a session for a presentation saved in the presentations directory which has no active session, e.g.
+        after the server restarted. Changes journaled since the presentation was last saved are replayed on top of it.
+        Sessions are only opened when they are next used, so starting the server does not wait for every presentation
+        to load. Returns whether the session is active.
+        """
+        if presentation_filename in self.active_sessions and not self.backend.shared:
+            return True
+        if not isinstance(presentation_filename, str) or os.path.basename(presentation_filename) != presentation_filename:
+            return False
+
+        with self.session_lock(presentation_filename):
+            if self.backend.shared:
+                stored_version = self.backend.stored_version(presentation_filename)
+                session = self.active_sessions.get(presentation_filename)
+                if session and stored_version in (None, session.get('stored_version')):
+                    return True
+                if stored_version is not None:
+                    # another worker created or changed the presentation since this worker last used it
+                    presentation, version = self.backend.load(presentation_filename)
+                    self.active_sessions[presentation_filename] = {
+                        'presentation': presentation, 'version': version, 'stored_version': version
+                    }
+                    return True
+            if presentation_filename in self.active_sessions:
+                return True
+            path = os.path.join(PRESENTATIONS_DIRECTORY, presentation_filename)
+            if presentation_filename not in self._recoverable and not os.path.isfile(path):
+                return False
+
+            records = self.journal.read(presentation_filename)
+            try:
+                presentation = open_presentation(path)
+            except Exception as e:
+                logger.error(f"Unable to open {presentation_filename}, its saved presentation could not be read: {e}")
+                self._recoverable.discard(presentation_filename)
+                return False
+
+            session = {'presentation': presentation, 'version': records[0]['version'] if records else 0}
+            self.active_sessions[presentation_filename] = session
+            saved = self._saved_version(path, records)
+            if saved is not None:
+                # the process died after writing the presentation but before the checkpoint, so the file already
+                # holds the changes up to the version it was saved at
+                session['version'] = saved
+            changes = [record for record in records if 'dataset' in record or ('tool' in record and (saved is None or record['version'] > saved))]
+            change_count = sum('tool' in record for record in changes)
+            replayed = 0
+            failure = None
+            self._replaying.add(presentation_filename)
+            try:
+                for record in changes:
+                    if 'dataset' in record:
+                        try:
+                            self.get_dataset_store(presentation_filename).load(record['file_path'])
+                        except Exception as e:
+                            # a change which uses the dataset fails to replay instead
+                            logger.warning(f"Unable to reload dataset {record['dataset']} of {presentation_filename}: {e}")
+                        continue
+                    tool = self._journaled_tools.get(record['tool'])
+                    result = tool(**record['arguments']) if tool else None
+                    if not (isinstance(result, dict) and result.get("status") == "success"):
+                        failure = f"change {replayed + 1} of {change_count} ({record['tool']}) failed: {result}"
+                        break
+                    session['version'] = record['version']
+                    replayed += 1
+            except Exception as e:
+                failure = f"change {replayed + 1} of {change_count} raised an unexpected error: {e}"
+            finally:
+                self._replaying.discard(presentation_filename)
+            if failure:
+                # the changes which were not replayed would be lost when the journal is next started again
+                preserved_path = self.journal.preserve(presentation_filename)
+                logger.error(
+                    f"Unable to recover every change to {presentation_filename}: {failure}. The session continues at "
+                    f"version {session['version']} and the journal has been kept at {preserved_path}"
+                )
+            if not records or (saved is not None and not change_count):
+                self.checkpoint(presentation_filename)
+            else:
+                self.store_session(presentation_filename)
+            logger.info(f"Opened {presentation_filename} at version {session['version']} with {replayed} of {change_count} journaled changes replayed")
+            return True
+
+    @staticmethod
+    def _saved_version(path: str, records: list[dict]) -> int | None:
+        """
+        Returns the version a presentation was being saved at when its journal ends with a saving record and the
+        presentation file was written after it, or None if the last save completed or never reached the file.
+        """
+        saving = next((record for record in reversed(records) if 'saving' in record), None)
+        if saving is None or os.path.getmtime(path) < saving['time']:
+            return None
+        return saving['version']
+
+    def fork_session(self, presentation_filename: str, fork_filename: str) -> None:
+        """
+        Starts a session for fork_filename with a fork of a session's presentation. The fork shares every part it can
+        with the original, so it takes little time or memory however large the presentation is. The fork is only held
+        in memory: save it and checkpoint it before journaling changes to it, so they can be replayed after a restart.
+        """
+        with self.session_lock(presentation_filename):
+            session = self.active_sessions[presentation_filename]
+            fork = {'presentation': fork_presentation(session['presentation']), 'version': 0}
+            if session.get('footer'):
+                fork['footer'] = dict(session['footer'])
+        with self.session_lock(fork_filename):
+            self.active_sessions[fork_filename] = fork
+            self.store_session(fork_filename)
+
+    def get_dataset_store(self, presentation_filename: str) -> DatasetStore:
+        """Retrieves the cache of parsed uploaded datasets for a given session_id, creating it on first use."""
+        session = self.active_sessions[presentation_filename]
+        if 'datasets' not in session:
+            session['datasets'] = DatasetStore()
+        return session['datasets']
+
+
+    def load_dataset(self, presentation_filename: str, file_path: str) -> str:
+        """
+        Parses a stored data file into a session's dataset cache and returns its dataset_id. The load is journaled, so
+        changes made with the dataset can be replayed if the server restarts.
+        """
+        dataset_id = self.get_dataset_store(presentation_filename).load(file_path)
+        if presentation_filename not in self._replaying:
+            self.journal.append_dataset(presentation_filename, dataset_id, file_path)
+        return dataset_id
+
+    def get_image_parts(self, presentation_filename: str) -> dict:
+        """Retrieves the image parts added to a session's presentation, keyed by the SHA1 of their content."""
+        session = self.active_sessions[presentation_filename]
+        if 'image_parts' not in session:
+            session['image_parts'] = {}
+        return session['image_parts']
+
+    def get_outline_cache(self, presentation_filename: str) -> dict:
+        """Retrieves the slide outlines exported for a given session_id, by the content hash of the slide."""
+        session = self.active_sessions[presentation_filename]
+        if 'outlines' not in session:
+            session['outlines'] = {}
+        return session['outlines']
+
+    def recommend_layout(self, presentation_filename: str, content_kind: str, text: str = None, size_pt: float = BODY_TEXT_SIZE_PT) -> dict | None:
+        """
+        Recommends the layout for a new slide of a session's presentation. Each slide added with one of the layouts
+        which suit the content equally well moves the recommendation on to the next, so the presentation uses a variety
+        of layouts.
+        """
+        with self.session_lock(presentation_filename):
+            presentation = self.active_sessions[presentation_filename]['presentation']
+            return self.layout_recommender.recommend(presentation, content_kind, text, size_pt)
+
+    def set_footer(self, presentation_filename: str, text: str) -> None:
+        """Stores the footer text for a session and applies it, with slide numbers, to every slide."""
+        session = self.active_sessions[presentation_filename]
+        previous = session.get('footer')
+        session['footer'] = {"text": text, "previous_text": previous["text"] if previous else None}
+        update_footers(session['presentation'], 0, session['footer'])
+
+    def mark_structure_changed(self, presentation_filename: str, from_index: int = 0) -> None:
+        """
+        Called by tools after slides are added, removed or moved. from_index is the 0-based index of the first slide
+        whose position may have changed; only slides from there onwards are renumbered.
+        """
+        session = self.active_sessions[presentation_filename]
+        presentation = session['presentation']
+        update_footers(presentation, from_index, session.get('footer'))
+        slide_ids = [slide_id.id for slide_id in presentation.slides._sldIdLst]
+        self.get_summary(presentation_filename).structure_changed(slide_ids, self._bump_version(presentation_filename))
+        self.get_content_index(presentation_filename).structure_changed(slide_ids)
+
+    def mark_slide_changed(self, presentation_filename: str, slide) -> None:
+        """Called by tools after changing the content of a slide, so the slide is digested and indexed again."""
+        self.get_summary(presentation_filename).slide_changed(slide.slide_id, self._bump_version(presentation_filename))
+        self.get_content_index(presentation_filename).slide_changed(slide.slide_id)
+
+    def get_version(self, presentation_filename: str) -> int:
+        """Returns the version of a session's presentation. It increases every time the presentation is changed."""
+        return self.active_sessions[presentation_filename].get('version', 0)
+
+    def _bump_version(self, presentation_filename: str) -> int:
+        session = self.active_sessions[presentation_filename]
+        session['version'] = session.get('version', 0) + 1
+        return session['version']
+
+    def session_lock(self, presentation_filename: str) -> threading.RLock:
+        with self._session_locks_lock:
+            return self._session_locks[presentation_filename]
+
+    def not_modified(self, presentation_filename: str, if_version: int | None) -> dict | None:
+        """
+        Returns a not_modified response for read tools when the caller already has the current version of the
+        presentation, otherwise None.
+        """
+        if if_version is not None and presentation_filename in self.active_sessions:
+            version = self.get_version(presentation_filename)
+            if if_version == version:
+                return {"status": "not_modified", "version": version}
+        return None
+
+    def mutating_tool(self, tool=None, *, record_history: bool = True):
+        """
+        Decorator for tools which change a presentation. Goes beneath @pp_app.tool().
+
+        The decorated tool must accept expected_version and idempotency_key arguments. If expected_version is given and
+        the presentation is no longer at that version, the tool is not run and a failure is returned with the current
+        version. Otherwise the tool runs while holding the presentation's lock, and a successful result is returned with
+        the new version of the presentation.
+
+        A successful result is remembered against its idempotency_key, so a retried call with the same key returns the
+        original result instead of making the change twice. Failed calls made no change and run again when retried.
+
+        Successful changes are also written to the journal, so they can be replayed on the last saved presentation if
+        the server restarts before the presentation is saved again. The tool's arguments must be JSON serialisable.
+        A tool whose change depends on state outside its arguments, e.g. a layout it chose, returns "journal_arguments"
+        in its result: arguments which are journaled in place of those it was called with so a replay makes the same
+        change. They are removed from the result. A tool which succeeds without changing anything returns
+        "changed": False, also removed from the result, so the version, journal and history are left as they are.
+
+        Successful changes are recorded in the session's history so they can be undone. The slide named by the tool's
+        slide_name, slide_index or user_slide_number argument is snapshotted before the tool runs; tools which edit
+        other existing slides call snapshot_slide first. Use @session_manager.mutating_tool(record_history=False) for
+        tools which should not be undoable themselves.
+        """
+        if tool is None:
+            return functools.partial(self.mutating_tool, record_history=record_history)
+
+        signature = inspect.signature(tool)
+
+        @functools.wraps(tool)
+        def wrapper(*args, **kwargs):
+            presentation_filename = kwargs.get('presentation_filename', args[0] if args else None)
+            if not self.open_session(presentation_filename):
+                # the tool reports the missing presentation itself
+                return tool(*args, **kwargs)
+
+            with self.session_lock(presentation_filename):
+                idempotency_key = kwargs.get('idempotency_key')
+                results = self.active_sessions[presentation_filename].setdefault('idempotent_results', OrderedDict())
+                result_key = f"{tool.__name__}:{idempotency_key}"
+                if idempotency_key and result_key in results:
+                    logger.info(f"Returning stored result of {tool.__name__} for idempotency_key {idempotency_key}")
+                    results.move_to_end(result_key)
+                    return {**results[result_key], "repeated": True}
+
+                version = self.get_version(presentation_filename)
+                expected_version = kwargs.get('expected_version')
+                if expected_version is not None and expected_version != version:
+                    logger.warning(f"Version conflict on {presentation_filename}: expected {expected_version}, at {version}")
+                    return {
+                        "status": "failure",
+                        "message": f"Version conflict: the presentation is at version {version}, not expected_version {expected_version}. "
+                                   f"It has been changed since you last read it. No changes were made.",
+                        "version": version
+                    }
+
+                history = self.get_history(presentation_filename) if record_history else None
+                if history is not None:
+                    presentation = self.get_presentation(presentation_filename)
+                    history.begin(tool.__name__, presentation, self.active_sessions[presentation_filename].get('footer'))
+                    for slide in self._slides_named_in(presentation, kwargs):
+                        history.snapshot_slide(slide)
+                result = None
+                try:
+                    result = tool(*args, **kwargs)
+                finally:
+                    if history is not None:
+                        if isinstance(result, dict) and result.get("status") == "success" and result.get("changed", True):
+                            history.commit()
+                        else:
+                            history.discard()
+                journal_arguments = result.pop("journal_arguments", None) if isinstance(result, dict) else None
+                changed = result.pop("changed", True) if isinstance(result, dict) else True
+                if isinstance(result, dict) and result.get("status") == "success":
+                    if changed and self.get_version(presentation_filename) == version:
+                        self._bump_version(presentation_filename)
+                    result["version"] = self.get_version(presentation_filename)
+                    if changed and presentation_filename not in self._replaying:
+                        try:
+                            self.store_session(presentation_filename)
+                        except SessionStoreConflictException as e:
+                            logger.warning(f"Discarding change to {presentation_filename} made by {tool.__name__}: {e.message}")
+                            # the presentation is loaded again from the backend when it is next used
+                            del self.active_sessions[presentation_filename]
+                            return {
+                                "status": "failure",
+                                "message": "Version conflict: the presentation was changed by another request at the same time. "
+                                           "No changes were made. Please try again."
+                            }
+                        arguments = signature.bind(*args, **kwargs).arguments
+                        arguments.pop('expected_version', None)
+                        arguments.update(journal_arguments or {})
+                        self.journal.append(presentation_filename, tool.__name__, arguments, result["version"])
+                    if idempotency_key:
+                        results[result_key] = dict(result)
+                        if len(results) > MAX_IDEMPOTENT_RESULTS:
+                            results.popitem(last=False)
+                return result
+
+        self._journaled_tools[tool.__name__] = wrapper
+        return wrapper
+
+    @staticmethod
+    def _slides_named_in(presentation, kwargs: dict) -> list:
+        """Returns the existing slides a tool call names through its slide_name, slide_index or user_slide_number arguments."""
+        slides = presentation.slides
+        named = []
+        slide_name = kwargs.get('slide_name')
+        if isinstance(slide_name, str):
+            names = {slide_name, clean_slide_name(slide_name)}
+            named.extend(slide for slide in slides if slide.name in names)
+        for index in (kwargs.get('slide_index'), (kwargs.get('user_slide_number') or 0) - 1):
+            # indexing only loads the slide at that index
+            if isinstance(index, int) and 0 <= index < len(slides):
+                named.append(slides[index])
+        return named
+
+    def get_history(self, presentation_filename: str) -> OperationHistory:
+        """Retrieves the undo and redo history for a given session_id, creating it on first use."""
+        session = self.active_sessions[presentation_filename]
+        if 'history' not in session:
+            session['history'] = OperationHistory()
+        return session['history']
+
+    def snapshot_slide(self, presentation_filename: str, slide) -> None:
+        """Called by mutating tools before they edit an existing slide which is not named in their arguments."""
+        self.get_history(presentation_filename).snapshot_slide(slide)
+
+    def undo(self, presentation_filename: str, redo: bool = False) -> str | None:
+        """
+        Reverts the latest change to a session's presentation, or with redo makes the latest undone change again.
+        Returns the name of the tool whose change was reverted or repeated, or None if there was nothing to do.
+        """
+        presentation = self.get_presentation(presentation_filename)
+        session = self.active_sessions[presentation_filename]
+        history = self.get_history(presentation_filename)
+        restored = history.redo(presentation, session.get('footer')) if redo else history.undo(presentation, session.get('footer'))
+        if restored is None:
+            return None
+        label, slide_ids, footer = restored
+        # slides added after the undo take the footer the presentation had at that point
+        if footer:
+            session['footer'] = footer
+        else:
+            session.pop('footer', None)
+        self.mark_structure_changed(presentation_filename, 0)
+        for slide_id in slide_ids:
+            self.get_summary(presentation_filename).slide_changed(slide_id, self.get_version(presentation_filename))
+            self.get_content_index(presentation_filename).slide_changed(slide_id)
+        return label
+
+    def get_summary(self, presentation_filename: str) -> PresentationSummary:
+        """Retrieves the maintained presentation summary for a given session_id, creating it on first use."""
+        session = self.active_sessions[presentation_filename]
+        if 'summary' not in session:
+            session['summary'] = PresentationSummary()
+        return session['summary']
+
+    def get_content_index(self, presentation_filename: str) -> ContentIndex:
+        """Retrieves the full-text index of the presentation for a given session_id, creating it on first use."""
+        session = self.active_sessions[presentation_filename]
+        if 'content_index' not in session:
+            session['content_index'] = ContentIndex()
+        return session['content_index']
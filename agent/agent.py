@@ -9,6 +9,7 @@ from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnecti
 from agent.file_type_checker_callback.file_type_checker_callback import file_type_checker_callback
 from agent.file_type_checker_callback.handle_files_tool import handle_files_tool
 from google.adk.tools.base_tool import BaseTool
+from utils.layout_catalog import load_catalog_prompt
 import logging
 from datetime import datetime
 
@@ -44,6 +45,10 @@ except KeyError:
 
 
 
+# the slide layouts the server generated from the template, in a compact form for the instruction
+slide_layouts_prompt = load_catalog_prompt()
+
+
 pp_mcp_toolset = MCPToolset(
     connection_params=StreamableHTTPConnectionParams(
         url="http://127.0.0.1:8001/mcp/",
@@ -86,6 +91,26 @@ def set_presentation_filename_in_state(filename: str, tool_context: ToolContext)
     return
 
 
+def set_existing_presentation_filename_in_state(filename: str, tool_context: ToolContext) -> None:
+    """
+    Sets the filename of an existing, previously saved presentation on the state object so work on it can be resumed.
+
+    CRITICAL INSTRUCTION: Immediately AFTER calling this tool, you must call the open_presentation tool in the pp_mcp_toolset
+    with the presentation filename from the session state.
+
+    arg: filename: string. The full filename of the existing presentation, including its .pptx extension
+    arg: tool_context: ToolContext
+    return: None
+    """
+    if tool_context.state.get("presentation_filename"):
+        return f"The current presentation filename is {tool_context.state.get('presentation_filename')}. If you wish to edit a different presentation, please start a new session"
+
+    if not filename.endswith('.pptx'):
+        filename = filename + '.pptx'
+    tool_context.state['presentation_filename'] = filename
+    return
+
+
 def get_presentation_filename_from_state(tool_context: ToolContext) -> str:
     """
     Gets the presentation filename from the state object.
@@ -95,7 +120,7 @@ def get_presentation_filename_from_state(tool_context: ToolContext) -> str:
 
 def check_presentation_filename_exists_before_calling_mcp_tool(tool: BaseTool, args: Dict[str, Any],
                                                                tool_context: ToolContext):
-    permitted = ("set_presentation_filename_in_state", "get_presentation_filename_from_state")
+    permitted = ("set_presentation_filename_in_state", "set_existing_presentation_filename_in_state", "get_presentation_filename_from_state")
     if tool.name in permitted:
         return
     filename = tool_context.state.get('presentation_filename')
@@ -122,6 +147,11 @@ root_agent = Agent(
     If {presentation_filename} does not have a value or if the value is an emtpy string (i.e ""), then you must prompt the user to enter a presentation filename
     then call your set_presentation_filename_in_state tool.
     
+    ***RESUMING AN EXISTING POWERPOINT PRESENTATION***
+    If the user asks to carry on working on a presentation they have saved before, ask for its full filename if you do not have it,
+    call your set_existing_presentation_filename_in_state tool with it and then call the open_presentation tool.
+    Do NOT call set_prs_on_sess_man_and_save_presentation_to_dir for an existing presentation, as it would replace it with a new one.
+    
     *** CALLING POWERPOINT MCP TOOLS WITH FILENAME PARAMETER***
     All tools which are part of the jaywing_pp_mcp_toolset must be called with a filename parameter.  
     When calling a jaywing_pp_mcp_toolset tool, ALWAYS use the get_presentation_filename_from_state tool to access 
@@ -134,6 +164,44 @@ root_agent = Agent(
         1. Delete the slide which is prompting the failure status
         2. Inform the user of the details of the error. Refer to the "message" of the dictionary
         3. Inform the user that the slide has been deleted
+    If a failure "message" says there is a version conflict, the presentation was changed by someone else. Do NOT delete any slides.
+    Tell the user the presentation has changed and ask whether to continue.
+
+    ***PRESENTATION VERSIONS***
+    Every tool that changes the presentation returns the new "version" of the presentation when it succeeds.
+    Pass the latest version you received as expected_version when changing the presentation, so your change is not applied on top of changes you have not seen.
+    When you call get_slide_layouts_metadata or show_presentation_summary again, pass the "version" of the result you already have as if_version.
+    If the result has a "status" of "not_modified", reuse the result you already have.
+    When changing the presentation, pass a new unique idempotency_key with each change. If you are unsure whether a call worked
+    (e.g. it timed out) and you retry it, use the SAME idempotency_key so the change is not made twice.
+    
+    ***VARIANTS OF A PRESENTATION***
+    If the user asks for another version of the presentation, e.g. for a different client or with different wording, call the
+    fork_presentation tool instead of building a new presentation. To change or save the variant, call tools with the
+    "variant_filename" it returns as the presentation_filename. This is the only time you may use a presentation_filename which is
+    not from get_presentation_filename_from_state. Tell the user the variant's filename.
+
+    ***REUSING SLIDES FROM OTHER PRESENTATIONS***
+    If the user asks to reuse slides from another saved presentation, ask for its full filename if you do not have it and call the
+    import_slides tool with it as the source_filename. To combine whole presentations into the current one, call the merge_presentations tool.
+    Do NOT rebuild slides which already exist in another presentation.
+
+    ***MOVING AND DUPLICATING SLIDES***
+    To change the order of slides, call the reorder_slides tool once with the new order of every slide. Do NOT delete and re-add slides to move them.
+    To make a copy of a slide, e.g. as the starting point for a similar slide, call the duplicate_slide tool.
+    If the user provides long text for a text slide, call add_text_to_slide with split_overflow set to true instead of shortening the
+    text or adding slides yourself. The text is continued on new slides, and the result lists the indexes of every slide it used.
+
+    ***FINDING AND REPLACING TEXT***
+    To find which slides mention something, call the search_presentation tool rather than reading the slides one by one.
+    To change a word or phrase everywhere in the presentation, e.g. a change of terminology, call the find_and_replace tool once.
+    If its result lists text in "not_replaced", change that text with the text tools.
+    To read the content of an existing presentation, e.g. after resuming it, call the export_outline tool. If its result has a
+    "next_slide_number", call it again from that slide number only if you need the rest of the presentation.
+
+    ***UNDOING CHANGES***
+    If you have made a mistake, e.g. added content to the wrong slide or added a slide you did not need, call the undo tool
+    to revert your most recent change(s). Do not delete and rebuild slides to correct a mistake. Changes you have undone can be made again with the redo tool.
     
     ***HANDLING FILES*** 
     CRITICAL INSTRUCTION: If you receive a message block with [FILE ATTACHMENT], you MUST do the following:
@@ -165,12 +233,28 @@ root_agent = Agent(
         "status": "success",
         "filename": "data.csv",
         "data_type": is_data,
-        "object_data": this will be csv data in bytes,
+        "schema": {
+            "columns": [{"name": "Date", "type": "date", "missing": 0}, {"name": "Revenue", "type": "integer", "missing": 0}],
+            "row_count": 16,
+            "sample_rows": [["01/01/2023", "15200"], ["01/02/2023", "14850"]]
+        }
     }
-    In this example, because the data_type is is_data, you must then call either the chart_handler or the table_handler depending on the user instructions.
+    Data files return a "schema" instead of the raw file contents. Image files return only the filename.
+    Other file types return the file contents in bytes under "object_data".
+    In this example, because the data_type is is_data, you must then:
+        1. Call the load_dataset tool with the filename. It returns a dataset_id.
+        2. Call the query_uploaded_dataset tool with the dataset_id to get the chart_data or table_data the user asked for.
+           Use the column names and types in the schema to choose the columns, filters and group_by. Do NOT copy values out of the file yourself.
+        3. Call either the chart_handler or the table_handler with the returned data depending on the user instructions.
+    If the user asks for more charts or tables from the same file, call query_uploaded_dataset again with the same dataset_id.
+    If the user asks for the same chart for each region, product or other group in the data, call the add_small_multiple_charts tool ONCE
+    with the dataset_id and the group_by column instead of adding each slide and chart yourself.
+    If the data_type is is_image, call the add_image_to_slide tool with the filename and the slide to place the image on.
+    The tool resizes the image to fit the slide, so NEVER try to resize or re-encode the image yourself.
     
     ONLY EVER call the handle_files_tool when you receive a message block with [FILE ATTACHMENT].
     NEVER call the the handle_files_tool more than once per message block with [FILE ATTACHMENT].
+    If the user uploads several files at once you will receive one [FILE ATTACHMENT] block per file. Handle each block separately.
 
     ***SAVING THE PRESENTATION***
     Every time you have finished making changes to the presentation, you MUST call the save_presentation tool.
@@ -189,9 +273,11 @@ root_agent = Agent(
         can add to the presentation.
         - Specific slides can only accept specific types of content based on their 'content-type' property. For example, a slide layout with a 
         content-type of 'Text' can only accept text content. A slide layout with a content-type of 'Image and Text' can accept either an image or text.
-        - Slides have other limitation such as the amount of text they can accept. The 'description' property outlines how many words can be added to 
-        the slide. For example: 'Text content can be up to 120 words long.' Use your count_words tool to see how many words are in the user provided content
-        before choosing a slide layout.
+        - Slides have other limitation such as the amount of text they can accept. The 'word_capacity' property is how many words of text can be added 
+        to the slide. For example: a word_capacity of 120 means the text content can be up to 120 words long.
+        - To choose a slide layout, call the recommend_layout tool with the content_type of the content and the text to add, rather than counting
+        words yourself. It returns a layout which takes the content and has room for the text, and varies the layout between similar slides.
+        You can also call add_new_slide with "auto" as the slide_layout_name and the content_type and text to choose and add the layout in one step.
         - When adding slides for a presentation with multiple slides, use a variety of layouts based on the content provided. For example, if the user 
         asks you to add nine slides with text on them, do not only use the Large_Text_Left_White layout.
         - Once you have determined which slide layout to use, YOU MUST:
@@ -203,45 +289,11 @@ root_agent = Agent(
         
         You have a small range of slide layouts available for use. 
         IMPORTANT: Whenever you add a new slide, you must use the slide_layout_index from the below configs to add the slide.
+        The configs are generated from the presentation template, one line per slide layout with its fields separated by "|".
         If a user asks you to add a slide with a name similar (but not the same) as the slides below, you MUST clarify which slide they are referring to 
         before you attempt to add it to the presentation.
         
-        layouts:
-          - slide_layout_index: 0
-            slide_layout_name: Title Slide
-            active: true
-            user_friendly_name: Title Slide
-            type: TITLE
-            content-type: Title
-            description: A title slide with a title and sub-title a plain white background. Use for the main title slide in a presentation.
-          - slide_layout_index: 1
-            slide_layout_name: Text Slide
-            active: true
-            user_friendly_name: Text Slide
-            type: CONTENT
-            content-type: Text
-            description: A content slide with a title, subtitle, and text placeholder. Can hold up to 180 words
-          - slide_layout_index: 2
-            slide_layout_name: Chart and Text Slide
-            active: true
-            user_friendly_name: Chart and Text Slide
-            type: CONTENT
-            content-type: Chart and Text
-            description: A content slide with a chart placeholder and text placeholder. Can hold up to 150 words
-          - slide_layout_index: 3
-            slide_layout_name: Large Text Slide
-            active: true
-            user_friendly_name: Large Text Slide
-            type: CONTENT
-            content-type: Text
-            description: A content slide with a large text placeholder. Can hold up to 300 words
-          - slide_layout_index: 4
-            slide_layout_name: Table and Text Slide
-            active: true
-            user_friendly_name: Table and Text Slide
-            type: CONTENT
-            content-type: Table and Text
-            description: A content slide with a table placeholder and text placeholder. Can hold up to 150 words
+""" + slide_layouts_prompt + """
             
         EXAMPLE of a slide layout metadata:
         {
@@ -266,6 +318,8 @@ root_agent = Agent(
         you continue.
         When a user provides chart or table data, they may also ask you to generate a summary analysis of the data. If this is requested, 
         you should generate approximately 130 words of content separated into paragraphs and use the add_text_to_slide tool to add this content to the same slide as the chart or table in question.
+        Before writing a summary, ALWAYS call the summarise_data tool with the chart_data (or with the dataset_id for an uploaded file) and base
+        every figure in the summary on the totals, averages, changes and trends it returns. NEVER calculate these figures yourself.
         
         - INDIRECT FILE CONTENT: Users may provide image or data files indirectly via an external service. If a file has been made available, 
         you will receive a [FILE ATTACHMENT] message block. Follow the instructions in ***HANDLING FILES*** to process this content before adding it 
@@ -343,6 +397,7 @@ root_agent = Agent(
         handle_files_tool,
         pp_mcp_toolset,
         set_presentation_filename_in_state,
+        set_existing_presentation_filename_in_state,
         get_presentation_filename_from_state],
     before_agent_callback=set_presentation_filename_default_if_none_exists,
     before_model_callback=file_type_checker_callback,
@@ -0,0 +1,44 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from stores.FileStore import shared_file_store
+
+logger = logging.getLogger(__name__)
+
+FILE_STORAGE_PATH = "file_storage"
+MAX_WRITER_THREADS = 4
+WAIT_FOR_WRITE_SECONDS = 30
+
+# Uploads are content addressed and deduplicated. Unused uploads are swept after the store's TTL.
+file_store = shared_file_store(FILE_STORAGE_PATH)
+file_store.start_sweeper()
+
+# Uploads are written on a small thread pool so the model callback never blocks on disk I/O.
+_executor = ThreadPoolExecutor(max_workers=MAX_WRITER_THREADS, thread_name_prefix="file-storage-writer")
+_pending_writes: dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def _forget_write(file_name: str, future: Future) -> None:
+    if future.exception():
+        logger.error(f"Failed to save upload name={file_name}: {future.exception()}")
+    with _pending_lock:
+        if _pending_writes.get(file_name) is future:
+            del _pending_writes[file_name]
+
+
+def persist_upload(file_name: str, data: bytes, file_extension: str, session_id: str) -> Future:
+    """Queues an upload to be written to the file store under the logical file_name and returns immediately."""
+    future = _executor.submit(file_store.put, data, file_extension, session_id, file_name)
+    with _pending_lock:
+        _pending_writes[file_name] = future
+    future.add_done_callback(lambda f: _forget_write(file_name, f))
+    return future
+
+
+def wait_for_upload(file_name: str, timeout: float = WAIT_FOR_WRITE_SECONDS) -> None:
+    """Blocks until a queued write of file_name has finished. Returns at once if no write is pending."""
+    with _pending_lock:
+        future = _pending_writes.get(file_name)
+    if future:
+        future.result(timeout=timeout)
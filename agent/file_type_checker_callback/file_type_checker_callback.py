@@ -1,13 +1,35 @@
 import logging
-import os
 import uuid
 from google.adk.agents.callback_context import CallbackContext
 from google.genai import types as gt
 from google.adk.models import LlmResponse, LlmRequest
-from agent.file_type_checker_callback.type_checker_utils import pdf_type_checker, image_type_checker, data_type_checker
+from agent.file_type_checker_callback.type_checker_utils import classify_part, FILE_EXTENSIONS
+from agent.file_type_checker_callback.file_storage_writer import persist_upload
 
 logger = logging.getLogger(__name__)
 
+# Checks file size against configured limits
+MAX_FILE_SIZES = {
+    "image": (2 * 1024 * 1024, "Image file size exceeds the limit of 2MB."),  # 2MB
+    "data": (10 * 1024 * 1024, "Data file size exceeds the limit of 10MB."),  # 10MB
+}
+
+
+def _error_response(message: str) -> LlmResponse:
+    return LlmResponse(
+        contents=[
+            gt.Content(
+                role="model",
+                parts=[
+                    gt.Part(
+                        text=f"[ERROR]\n{message}"
+                    )
+                ],
+            )
+        ]
+    )
+
+
 def file_type_checker_callback(
     callback_context: CallbackContext,
     llm_request: LlmRequest
@@ -19,98 +41,41 @@ def file_type_checker_callback(
             user = content
             break
 
-    is_pdf = False
-    is_image = False
-    is_data = False
-    mime_types: set[str] = set()
-
-    if user and user.parts:
-        for p in user.parts:
-            idata = getattr(p, "inline_data", None)
-
-            if idata and idata.data:
-                mt = (idata.mime_type or "").lower()
-                if mt:
-                    mime_types.add(mt)
-                if pdf_type_checker(p):
-                    is_pdf = True
-                if image_type_checker(p):
-                    is_image = True
-                if data_type_checker(p):
-                    is_data = True
-
-
-    # Checks file size against configured limits
-    MAX_IMAGE_SIZE = 2 * 1024 * 1024  # 2MB
-    MAX_DATA_SIZE = 10 * 1024 * 1024  # 10MB
-
-    if user and user.parts:
-        for p in user.parts:
-            file_size = 0
-            idata = getattr(p, "inline_data", None)
-            # fdata = getattr(p, "file_data", None)
-
-            if idata and idata.data:
-                file_size = len(idata.data)
-
-            if file_size > 0:
-                if image_type_checker(p) and file_size > MAX_IMAGE_SIZE:
-                    return LlmResponse(
-                        contents=[
-                            gt.Content(
-                                role="model",
-                                parts=[
-                                    gt.Part(
-                                        text="[ERROR]\nImage file size exceeds the limit of 2MB."
-                                    )
-                                ],
-                            )
-                        ]
-                    )
-                if data_type_checker(p) and file_size > MAX_DATA_SIZE:
-                    return LlmResponse(
-                        contents=[
-                            gt.Content(
-                                role="model",
-                                parts=[
-                                    gt.Part(
-                                        text="[ERROR]\nData file size exceeds the limit of 10MB."
-                                    )
-                                ],
-                            )
-                        ]
-                    )
-
-    # saves approved attachments to local directory
-        if is_pdf or is_image or is_data:
-            try:
-
-                file_name = uuid.uuid4().hex[:16]
-                for extension in mime_types:
-                    file_extension = extension.split("/")[1]
-                data = p.inline_data.data
-
-                file_storage_path = "file_storage"
-                file_path = os.path.join(file_storage_path, f"{file_name}.{file_extension}")
-                with open(file_path, "wb") as f:
-                    f.write(data)
-
-            except Exception as e:
-                logger.exception("Failed to save  name=%s", file_name, )
-                return {"status": "failure", "message": f"Failed to save file: {e!s}", "file_name": file_name}
-
-
-            meta = (
-                f"""[FILE ATTACHMENT]
-                mime_types = {','.join(sorted(mime_types)) if mime_types else 'unknown'}
-                file_name = '{file_name}.{file_extension}'
-                is_pdf = {'true' if is_pdf else 'false'}
-                is_image = {'true' if is_image else 'false'}
-                is_data = {'true' if is_data else 'false'}"""
-            )
+    if not user or not user.parts:
+        return None
+
+    # Classify every part once and check its size before anything is saved
+    accepted = []
+    for p in user.parts:
+        classification = classify_part(p)
+        if not classification:
+            continue
+        kind, mime_type = classification
+        data = p.inline_data.data
+        max_size, error_message = MAX_FILE_SIZES.get(kind, (None, None))
+        if max_size and len(data) > max_size:
+            return _error_response(error_message)
+        accepted.append((kind, mime_type, data))
+
+    # saves approved attachments to the file store without blocking the model call
+    session_id = callback_context.state.get("presentation_filename") or "unassigned"
+    attachment_blocks = []
+    for kind, mime_type, data in accepted:
+        file_extension = FILE_EXTENSIONS.get(mime_type, mime_type.split("/")[-1])
+        file_name = f"{uuid.uuid4().hex[:16]}.{file_extension}"
+        persist_upload(file_name, data, file_extension, session_id)
+
+        attachment_blocks.append(
+            f"""[FILE ATTACHMENT]
+                mime_types = {mime_type}
+                file_name = '{file_name}'
+                is_pdf = {'true' if kind == 'pdf' else 'false'}
+                is_image = {'true' if kind == 'image' else 'false'}
+                is_data = {'true' if kind == 'data' else 'false'}"""
+        )
 
     llm_request.contents = llm_request.contents or []
-    if is_pdf or is_image or is_data:
-        llm_request.contents.insert(0, gt.Content(role="model", parts=[gt.Part(text=meta)]))
+    if attachment_blocks:
+        llm_request.contents.insert(0, gt.Content(role="model", parts=[gt.Part(text=block) for block in attachment_blocks]))
 
     return None
@@ -1,6 +1,9 @@
 import os
 import logging
 from typing import Any
+from utils.ingest_data_file import ingest_data_file
+from agent.file_type_checker_callback.file_storage_writer import wait_for_upload, file_store
+from errors.DataFileIngestionException import DataFileIngestionException
 
 
 
@@ -17,13 +20,42 @@ def handle_files_tool(
         data_type: str,
 ) -> dict[str, Any]:
 
-    file_path = os.path.join("file_storage", filename)
-
     try:
-        if not os.path.exists(file_path):
-            logger.error(f"File not found in local storage: {file_path}")
+        # uploads are saved in the background by file_type_checker_callback, make sure this one has landed
+        wait_for_upload(filename)
+
+        # logical filenames are resolved to their content-addressed object through the file store index
+        file_path = file_store.resolve(filename)
+        if not file_path or not os.path.exists(file_path):
+            logger.error(f"File not found in local storage: {filename}")
             return {"status": "failure", "message": f"File not found: {filename}"}
 
+        # spreadsheets are streamed into a compact schema rather than handed to the model as raw bytes.
+        # The full data is loaded and queried server side with the load_dataset and query_uploaded_dataset tools.
+        if data_type == "is_data":
+            try:
+                schema = ingest_data_file(file_path)
+            except DataFileIngestionException as e:
+                logger.error(f"Unable to ingest data file {filename}: {e}")
+                return {"status": "failure", "message": f"Unable to read data file: {e}"}
+
+            logger.info(f"Successfully ingested {filename} from local file storage.")
+            return {
+                "status": "success",
+                "filename": filename,
+                "data_type": data_type,
+                "schema": schema
+            }
+
+        # images are resized and placed server side by the add_image_to_slide tool, so only the filename is needed
+        if data_type == "is_image":
+            logger.info(f"Image {filename} is available in local file storage.")
+            return {
+                "status": "success",
+                "filename": filename,
+                "data_type": data_type
+            }
+
         with open(file_path, "rb") as f:
             object_data = f.read()
 
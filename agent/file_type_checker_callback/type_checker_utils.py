@@ -86,4 +86,57 @@ def data_type_checker(part: gt.Part) -> bool:
         if mime_type in accepted_mime_types or display_name.endswith(accepted_extensions):
             return True
 
-    return False
\ No newline at end of file
+    return False
+
+# Leading bytes of the binary formats we accept. CSV has no signature so it is recognised by mime type or name.
+MAGIC_BYTES = (
+    (b"%PDF-", "pdf", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image", "image/png"),
+    (b"\xff\xd8\xff", "image", "image/jpeg"),
+    (b"PK\x03\x04", "data", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    (b"\xd0\xcf\x11\xe0", "data", "application/vnd.ms-excel"),
+)
+
+FILE_EXTENSIONS = {
+    "application/pdf": "pdf",
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "text/csv": "csv",
+    "application/vnd.ms-excel": "xls",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+}
+
+
+def sniff_file_type(data: bytes) -> tuple[str, str] | None:
+    """Returns the (kind, mime_type) of data from its magic bytes, or None if it has no known signature."""
+    head = data[:8].lstrip()
+    for magic, kind, mime_type in MAGIC_BYTES:
+        if head.startswith(magic):
+            return kind, mime_type
+    return None
+
+
+def classify_part(part: gt.Part) -> tuple[str, str] | None:
+    """
+    Classifies an inline upload once, returning its (kind, mime_type) where kind is 'pdf', 'image' or 'data'.
+
+    The magic bytes are sniffed first. A zip signature alone is not enough to call a file a spreadsheet, so the
+    xlsx match is only trusted when the declared type agrees; otherwise the declared mime type and display name
+    are checked as before. Returns None for parts that are not an accepted upload.
+    """
+    idata = getattr(part, "inline_data", None)
+    if not idata or not idata.data:
+        return None
+
+    declared_mime_type = (idata.mime_type or "").lower()
+    sniffed = sniff_file_type(idata.data)
+    if sniffed and (sniffed[0] != "data" or data_type_checker(part)):
+        return sniffed
+
+    if pdf_type_checker(part):
+        return "pdf", "application/pdf"
+    if image_type_checker(part):
+        return "image", declared_mime_type or "image/jpeg"
+    if data_type_checker(part):
+        return "data", declared_mime_type or "text/csv"
+    return None
@@ -0,0 +1,9 @@
+class DataFileIngestionException(Exception):
+    """Exception raised for Data File Ingestion error scenarios.
+
+    Attributes:
+        message -- explanation of the error
+    """
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,9 @@
+class DatasetQueryException(Exception):
+    """Exception raised for Dataset Query error scenarios.
+
+    Attributes:
+        message -- explanation of the error
+    """
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
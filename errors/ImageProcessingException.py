@@ -0,0 +1,9 @@
+class ImageProcessingException(Exception):
+    """Exception raised for Image Processing error scenarios.
+
+    Attributes:
+        message -- explanation of the error
+    """
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,9 @@
+class SessionStoreConflictException(Exception):
+    """Exception raised when a presentation in a shared session store was changed by another server worker.
+
+    Attributes:
+        message -- explanation of the error
+    """
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -8,13 +8,22 @@ from fastmcp.server.dependencies import get_http_headers
 from starlette.requests import Request
 from starlette.responses import PlainTextResponse
 from fastmcp.server.middleware import Middleware, MiddlewareContext
-# from utils.presentations.create_new_presentation_from_template import create_new_presentation_from_template
+from utils.presentations.create_new_presentation_from_template import create_new_presentation_from_template
 from SessionManager import SessionManager
+from utils.fit_text import TextCapacities
+from utils.layout_catalog import LAYOUT_OVERRIDES_PATH, load_layout_catalog
+from stores.SessionBackend import SessionBackend
+from stores.SQLitePartStore import SQLitePartStore
 from tools.chart_tools import register_chart_tools
 from tools.presentation_tools import register_presentation_tools
 from tools.text_tools import register_text_tools
 from tools.slide_tools import register_slide_tools
 from tools.table_tools import register_table_tools
+from tools.dataset_tools import register_dataset_tools
+from tools.image_tools import register_image_tools
+from tools.history_tools import register_history_tools
+from tools.import_tools import register_import_tools
+from tools.search_tools import register_search_tools
 # from utils.presentations.save_presentation_to_S3 import save_presentation_to_presentations_directory
 
 logging.basicConfig(level=logging.INFO)
@@ -24,11 +33,20 @@ logger.info("Starting PP server")
 dotenv.load_dotenv()
 
 logger.info("Generating slide layout metadata for Session Manager")
+# the space for text in each layout's placeholders, shared by every session
+text_capacities = TextCapacities()
 try:
-    with open('indexes/slide_layouts_full.yaml') as slide_yaml:
-        slide_layouts_metadata = yaml.safe_load(slide_yaml)
+    # every presentation is created from the template, so the catalog of its layouts serves every session
+    template = create_new_presentation_from_template()
+    text_capacities.precompute(template)
+    slide_layouts_metadata = load_layout_catalog(template, text_capacities)
 except Exception as e:
-    raise Exception("Error opening Slides YAML file at indexes/slides_layout.yaml")
+    logger.warning(f"Using the slide layouts in {LAYOUT_OVERRIDES_PATH}, the template could not be read: {e}")
+    try:
+        with open(LAYOUT_OVERRIDES_PATH) as slide_yaml:
+            slide_layouts_metadata = yaml.safe_load(slide_yaml)
+    except Exception as e:
+        raise Exception(f"Error opening Slides YAML file at {LAYOUT_OVERRIDES_PATH}")
 
 class SessionManagerMiddleware(Middleware):
     def __init__(self, session_manager: SessionManager):
@@ -59,7 +77,12 @@ app = FastMCP(
     log_level="INFO",
 )
 
-session_manager = SessionManager(slide_layouts_metadata)
+# SESSION_BACKEND=sqlite shares sessions between server workers through a SQLite database
+if os.environ.get("SESSION_BACKEND") == "sqlite":
+    session_backend = SQLitePartStore(os.environ.get("SESSION_DATABASE", "sessions.db"))
+else:
+    session_backend = SessionBackend()
+session_manager = SessionManager(slide_layouts_metadata, session_backend, text_capacities)
 app.add_middleware(SessionManagerMiddleware(session_manager))
 
 register_presentation_tools(app, session_manager)
@@ -67,6 +90,11 @@ register_slide_tools(app, session_manager)
 register_text_tools(app, session_manager)
 register_chart_tools(app, session_manager)
 register_table_tools(app, session_manager)
+register_dataset_tools(app, session_manager)
+register_image_tools(app, session_manager)
+register_history_tools(app, session_manager)
+register_import_tools(app, session_manager)
+register_search_tools(app, session_manager)
 
 
 @app.custom_route("/health", methods=["GET"])
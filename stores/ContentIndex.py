@@ -0,0 +1,134 @@
+import logging
+import re
+from collections import defaultdict
+
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+from utils.digest_slide import FOOTER_PLACEHOLDER_TYPES
+
+logger = logging.getLogger("ContentIndex")
+
+WORD = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> set[str]:
+    return {token.lower() for token in WORD.findall(text)}
+
+
+def iter_text_frames(slide):
+    """
+    Yields (location, text_frame) for the text boxes, placeholders, table cells and chart titles of a slide, including
+    those in group shapes. Footer placeholders are left out, as update_footers rewrites them.
+    """
+    def shape_text_frames(shapes):
+        for shape in shapes:
+            if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+                yield from shape_text_frames(shape.shapes)
+                continue
+            if shape.is_placeholder and shape.placeholder_format.type in FOOTER_PLACEHOLDER_TYPES:
+                continue
+            if shape.has_text_frame:
+                yield f"'{shape.name}'", shape.text_frame
+            elif getattr(shape, 'has_table', False) and shape.has_table:
+                for row_index, row in enumerate(shape.table.rows):
+                    for column_index, cell in enumerate(row.cells):
+                        yield f"table '{shape.name}' row {row_index + 1} column {column_index + 1}", cell.text_frame
+            elif getattr(shape, 'has_chart', False) and shape.has_chart and shape.chart.has_title:
+                yield f"chart '{shape.name}' title", shape.chart.chart_title.text_frame
+
+    yield from shape_text_frames(slide.shapes)
+
+
+class ContentIndex:
+    """
+    Per-session inverted index of the words in a presentation's text, table cells and chart titles.
+
+    Like PresentationSummary it is kept up to date through SessionManager: a changed slide is marked dirty and only
+    dirty slides are read again when the index is next searched. Each slide's paragraphs are kept alongside the
+    index, so a search only looks at the slides which contain every word of the query and never re-reads the
+    others. Slides are tracked by their slide_id, which stays the same when slides are moved.
+    """
+    def __init__(self):
+        # word -> ids of the slides containing it
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        # slide_id -> [(location, paragraph text)]
+        self._paragraphs: dict[int, list[tuple[str, str]]] = {}
+        self._tokens: dict[int, set[str]] = {}
+        self._dirty: set[int] = set()
+        self._indexed_slide_ids: set[int] = set()
+
+    def slide_changed(self, slide_id: int) -> None:
+        self._dirty.add(slide_id)
+
+    def structure_changed(self, slide_ids: list[int]) -> None:
+        """Records that slides were added, removed or moved. slide_ids is the new order of the slides."""
+        current = set(slide_ids)
+        for slide_id in self._indexed_slide_ids - current:
+            self._remove(slide_id)
+            self._dirty.discard(slide_id)
+        self._dirty.update(current - self._indexed_slide_ids)
+        self._indexed_slide_ids = current
+
+    def _remove(self, slide_id: int) -> None:
+        for token in self._tokens.pop(slide_id, ()):
+            postings = self._postings[token]
+            postings.discard(slide_id)
+            if not postings:
+                del self._postings[token]
+        self._paragraphs.pop(slide_id, None)
+
+    def _refresh(self, presentation) -> list[int]:
+        slide_ids = [slide_id.id for slide_id in presentation.slides._sldIdLst]
+        if set(slide_ids) != self._indexed_slide_ids:
+            # slides added or removed without a tool reporting it
+            self.structure_changed(slide_ids)
+        if self._dirty:
+            for slide_id in self._dirty:
+                self._remove(slide_id)
+                slide = presentation.slides.get(slide_id)
+                if slide is None:
+                    continue
+                paragraphs = [
+                    (location, paragraph_text)
+                    for location, text_frame in iter_text_frames(slide)
+                    for paragraph_text in (paragraph.text for paragraph in text_frame.paragraphs)
+                    if paragraph_text.strip()
+                ]
+                tokens = set().union(*(_tokens(text) for _, text in paragraphs))
+                for token in tokens:
+                    self._postings[token].add(slide_id)
+                self._paragraphs[slide_id] = paragraphs
+                self._tokens[slide_id] = tokens
+            logger.info(f"Indexed {len(self._dirty)} changed slides")
+            self._dirty.clear()
+        return slide_ids
+
+    def _candidate_slide_ids(self, slide_ids: list[int], words: str = None) -> list[int]:
+        """
+        Returns the ids of the slides, in slide order, which contain every word in words. Without words, or if words
+        has none, every slide is a candidate.
+        """
+        tokens = _tokens(words or "")
+        if not tokens:
+            return slide_ids
+        # intersecting from the rarest word keeps the sets small
+        postings = sorted((self._postings.get(token, set()) for token in tokens), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return [slide_id for slide_id in slide_ids if slide_id in candidates]
+
+    def search(self, presentation, pattern: re.Pattern, words: str = None) -> list[dict]:
+        """
+        Returns the paragraphs matching a compiled pattern, in slide order. words, the literal words any match must
+        contain, narrows the search to the slides the index says contain them all.
+
+        Example of the Returned List:
+        [{"slide_index": 4, "slide_id": 259, "location": "table 'Table 3' row 2 column 1", "text": "Q3 revenue"}]
+        """
+        slide_ids = self._refresh(presentation)
+        positions = {slide_id: i + 1 for i, slide_id in enumerate(slide_ids)}
+        matches = []
+        for slide_id in self._candidate_slide_ids(slide_ids, words):
+            for location, text in self._paragraphs[slide_id]:
+                if pattern.search(text):
+                    matches.append({"slide_index": positions[slide_id], "slide_id": slide_id, "location": location, "text": text})
+        return matches
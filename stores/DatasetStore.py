@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.ingest_data_file import load_data_file_columns
+
+logger = logging.getLogger("DatasetStore")
+
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024  # 64MB of column arrays per session
+DATASET_CACHE_DIRECTORY = "dataset_cache"
+HASH_READ_BYTES = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """Returns the sha256 hex digest of a file, read in fixed size blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetStore:
+    """
+    Per-session cache of parsed uploads held as columnar NumPy arrays.
+
+    Datasets are keyed by a hash of the uploaded file's content, so uploading or loading the same
+    spreadsheet twice parses it once. In-memory arrays are bounded by max_memory_bytes: when the budget
+    is exceeded the least recently used dataset is written to the cache directory as .npy files and
+    replaced with read-only memory maps of those files, so it stays queryable without using heap memory.
+    """
+    def __init__(self, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES, cache_directory: str = DATASET_CACHE_DIRECTORY):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_directory = cache_directory
+        # dataset_id -> {"schema": dict, "columns": dict[str, np.ndarray], "memory_mapped": bool}
+        self._datasets: OrderedDict[str, dict] = OrderedDict()
+        # dataset_id -> the path of the file it was parsed from
+        self._sources: dict[str, str] = {}
+        self._memory_bytes = 0
+
+    def load(self, file_path: str) -> str:
+        """
+        Parses a data file into the store unless a file with the same content is already cached.
+        Returns the dataset_id used to address the dataset in later calls.
+        """
+        dataset_id = hash_file(file_path)[:16]
+        self._sources[dataset_id] = file_path
+        if dataset_id in self._datasets:
+            logger.info(f"Dataset {dataset_id} already cached, skipping parse of {file_path}")
+            self._datasets.move_to_end(dataset_id)
+            return dataset_id
+
+        schema, columns = load_data_file_columns(file_path)
+        self._datasets[dataset_id] = {"schema": schema, "columns": columns, "memory_mapped": False}
+        self._memory_bytes += self._columns_nbytes(columns)
+        logger.info(f"Cached dataset {dataset_id} from {file_path}. In-memory datasets use {self._memory_bytes} bytes")
+        self._evict()
+        return dataset_id
+
+    def get(self, dataset_id: str) -> dict:
+        """Returns the cached dataset for dataset_id. Raises KeyError if it has not been loaded."""
+        dataset = self._datasets[dataset_id]
+        self._datasets.move_to_end(dataset_id)
+        return dataset
+
+    def sources(self) -> dict[str, str]:
+        """Returns the path of the file each loaded dataset was parsed from, by dataset_id."""
+        return dict(self._sources)
+
+    def __contains__(self, dataset_id: str) -> bool:
+        return dataset_id in self._datasets
+
+    @staticmethod
+    def _columns_nbytes(columns: dict[str, np.ndarray]) -> int:
+        return sum(values.nbytes for values in columns.values())
+
+    def _evict(self) -> None:
+        """Memory maps least recently used datasets until the in-memory arrays fit the budget."""
+        for dataset_id, dataset in self._datasets.items():
+            if self._memory_bytes <= self.max_memory_bytes:
+                return
+            if dataset["memory_mapped"]:
+                continue
+            # never spill the dataset that was just used
+            if dataset_id == next(reversed(self._datasets)):
+                return
+            self._memory_bytes -= self._columns_nbytes(dataset["columns"])
+            dataset["columns"] = self._spill_to_disk(dataset_id, dataset["columns"])
+            dataset["memory_mapped"] = True
+            logger.info(f"Evicted dataset {dataset_id} to memory-mapped files in {self.cache_directory}")
+
+    def _spill_to_disk(self, dataset_id: str, columns: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        dataset_directory = os.path.join(self.cache_directory, dataset_id)
+        os.makedirs(dataset_directory, exist_ok=True)
+        mapped_columns = {}
+        for i, (name, values) in enumerate(columns.items()):
+            # files are named by position because column names may contain any character
+            column_path = os.path.join(dataset_directory, f"{i}.npy")
+            if not os.path.exists(column_path):
+                # datasets are content addressed, so another session may be spilling the same file
+                temp_path = f"{column_path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    np.save(f, values)
+                os.replace(temp_path, column_path)
+            mapped_columns[name] = np.load(column_path, mmap_mode="r")
+        return mapped_columns
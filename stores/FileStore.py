@@ -0,0 +1,206 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("FileStore")
+
+DEFAULT_FILE_STORAGE_PATH = "file_storage"
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # 7 days
+DEFAULT_SWEEP_INTERVAL_SECONDS = 60 * 60  # 1 hour
+INDEX_FILENAME = "index.json"
+OBJECTS_DIRECTORY = "objects"
+# one empty file per logical filename whose modification time is when it was last resolved, sharded like objects
+ACCESS_DIRECTORY = "access"
+
+
+class FileStore:
+    """
+    Content-addressed, deduplicated storage for uploaded files.
+
+    Each distinct file is stored once, named by the sha256 of its content and sharded into two levels
+    of subdirectories (objects/ab/cd/abcd....ext) so no directory grows large. Uploads are addressed by
+    a logical filename which a small JSON index maps to the content hash. The index also keeps a reference
+    count per session for every object. A background sweeper drops logical names that have not been used
+    for ttl_seconds and deletes objects that are no longer referenced. A logical filename's last use is
+    recorded by touching a small access file, sharded like the objects, so every process which resolves it keeps
+    it alive without rewriting the index.
+
+    Only the process that writes uploads (the agent) should call put, sweep or start_sweeper. Other
+    processes (the MCP server) may resolve logical filenames; the index is re-read when it changes on disk.
+    """
+    def __init__(self, root: str = DEFAULT_FILE_STORAGE_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self._index_path = os.path.join(root, INDEX_FILENAME)
+        self._index_mtime = None
+        # files: logical filename -> {"hash", "extension", "session", "last_access"}
+        # objects: hash -> {"extension", "size", "refs": {session: count}}
+        self._index = {"files": {}, "objects": {}}
+        self._lock = threading.RLock()
+        self._sweeper = None
+        os.makedirs(os.path.join(root, OBJECTS_DIRECTORY), exist_ok=True)
+        os.makedirs(os.path.join(root, ACCESS_DIRECTORY), exist_ok=True)
+        self._load_index()
+
+    def _object_path(self, content_hash: str, extension: str) -> str:
+        return os.path.join(self.root, OBJECTS_DIRECTORY, content_hash[:2], content_hash[2:4], f"{content_hash}.{extension}")
+
+    def _access_path(self, logical_name: str) -> str:
+        name_hash = hashlib.sha256(logical_name.encode()).hexdigest()
+        return os.path.join(self.root, ACCESS_DIRECTORY, name_hash[:2], name_hash[2:4], name_hash)
+
+    def _touch(self, logical_name: str) -> None:
+        access_path = self._access_path(logical_name)
+        try:
+            os.utime(access_path)
+        except FileNotFoundError:
+            try:
+                os.makedirs(os.path.dirname(access_path), exist_ok=True)
+                with open(access_path, "a"):
+                    pass
+            except OSError as e:
+                # a sweep in another process pruned the shard directory, the index still records the access
+                logger.warning(f"Unable to record access to {logical_name}: {e}")
+
+    @staticmethod
+    def _remove_sharded(path: str) -> None:
+        """Removes a sharded file and prunes its two shard directories once they are empty."""
+        try:
+            os.remove(path)
+            shard_directory = os.path.dirname(path)
+            os.rmdir(shard_directory)
+            os.rmdir(os.path.dirname(shard_directory))
+        except OSError:
+            # already removed, or the shard directory still holds other files
+            pass
+
+    def _last_access(self, logical_name: str, entry: dict) -> float:
+        """Returns when a logical filename was last stored or resolved, by any process."""
+        try:
+            return max(entry["last_access"], os.path.getmtime(self._access_path(logical_name)))
+        except OSError:
+            return entry["last_access"]
+
+    def _load_index(self) -> None:
+        try:
+            mtime = os.path.getmtime(self._index_path)
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+        with open(self._index_path) as f:
+            self._index = json.load(f)
+        self._index_mtime = mtime
+
+    def _save_index(self) -> None:
+        temp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, self._index_path)
+        self._index_mtime = os.path.getmtime(self._index_path)
+
+    def put(self, data: bytes, extension: str, session_id: str, logical_name: str) -> str:
+        """
+        Stores data under logical_name for session_id and returns the path of the stored object.
+        If identical content is already stored, only the index is updated.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(content_hash, extension)
+        # held from checking for the object until it is referenced, so a sweep cannot delete it in between
+        with self._lock:
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, object_path)
+                logger.info(f"Stored new object {content_hash} for {logical_name}")
+            else:
+                logger.info(f"Deduplicated {logical_name} against existing object {content_hash}")
+
+            self._load_index()
+            stored_object = self._index["objects"].setdefault(
+                content_hash, {"extension": extension, "size": len(data), "refs": {}}
+            )
+            stored_object["refs"][session_id] = stored_object["refs"].get(session_id, 0) + 1
+            self._index["files"][logical_name] = {
+                "hash": content_hash,
+                "extension": extension,
+                "session": session_id,
+                "last_access": time.time(),
+            }
+            self._save_index()
+            self._touch(logical_name)
+        return object_path
+
+    def resolve(self, logical_name: str) -> str | None:
+        """Returns the path of the object stored for a logical filename, or None if it is unknown."""
+        with self._lock:
+            self._load_index()
+            entry = self._index["files"].get(logical_name)
+            if not entry:
+                # uploads saved before the store existed live directly in the storage root
+                legacy_path = os.path.join(self.root, logical_name)
+                return legacy_path if os.path.isfile(legacy_path) else None
+            self._touch(logical_name)
+            return self._object_path(entry["hash"], entry["extension"])
+
+    def _drop_file(self, logical_name: str) -> None:
+        entry = self._index["files"].pop(logical_name)
+        stored_object = self._index["objects"].get(entry["hash"])
+        if not stored_object:
+            return
+        refs = stored_object["refs"]
+        refs[entry["session"]] = refs.get(entry["session"], 1) - 1
+        if refs[entry["session"]] <= 0:
+            del refs[entry["session"]]
+
+    def sweep(self) -> int:
+        """
+        Drops logical filenames unused for longer than the TTL and deletes objects with no remaining references.
+        Returns the number of objects deleted.
+        """
+        deleted = 0
+        with self._lock:
+            self._load_index()
+            expiry = time.time() - self.ttl_seconds
+            for logical_name in [n for n, e in self._index["files"].items() if self._last_access(n, e) < expiry]:
+                self._drop_file(logical_name)
+                self._remove_sharded(self._access_path(logical_name))
+
+            for content_hash, stored_object in list(self._index["objects"].items()):
+                if stored_object["refs"]:
+                    continue
+                self._remove_sharded(self._object_path(content_hash, stored_object["extension"]))
+                del self._index["objects"][content_hash]
+                deleted += 1
+            self._save_index()
+        if deleted:
+            logger.info(f"File storage sweep deleted {deleted} unreferenced objects")
+        return deleted
+
+    def start_sweeper(self, interval_seconds: int = DEFAULT_SWEEP_INTERVAL_SECONDS) -> None:
+        """Starts a daemon thread which sweeps the store every interval_seconds."""
+        if self._sweeper:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"File storage sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="file-storage-sweeper", daemon=True)
+        self._sweeper.start()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_file_store(root: str = DEFAULT_FILE_STORAGE_PATH) -> FileStore:
+    """Returns the one FileStore of a process for a storage root, so every user of it shares its index and lock."""
+    return FileStore(root)
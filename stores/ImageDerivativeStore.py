@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.fit_image import fit_image
+
+logger = logging.getLogger("ImageDerivativeStore")
+
+DEFAULT_MAX_MEMORY_BYTES = 32 * 1024 * 1024  # 32MB of fitted images shared by every session
+IMAGE_CACHE_DIRECTORY = "image_cache"
+MAX_IMAGE_WORKERS = 4
+
+
+class ImageDerivativeStore:
+    """
+    Process-wide cache of images fitted to a placeholder size.
+
+    Derivatives are keyed by the sha256 of the source image together with the target size and fit mode,
+    so placing the same photo in the same kind of placeholder resizes it once, whichever deck it goes into.
+    The same bytes object is handed out for every hit, which lets python-pptx recognise a repeated image
+    and reuse one media part inside a deck. Recently used derivatives are kept in memory up to
+    max_memory_bytes and every derivative is written to the cache directory so it survives a restart.
+
+    Resizing and recompressing run on a small worker pool (Pillow releases the GIL while it works), which
+    also bounds how many full resolution images are decoded at once. Concurrent requests for the same
+    derivative share one job.
+    """
+    def __init__(
+            self,
+            max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+            cache_directory: str = IMAGE_CACHE_DIRECTORY,
+            max_workers: int = MAX_IMAGE_WORKERS
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_directory = cache_directory
+        # derivative key -> (data, extension)
+        self._derivatives: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self._memory_bytes = 0
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-fitter")
+
+    @staticmethod
+    def derivative_key(data: bytes, width_px: int, height_px: int, mode: str) -> str:
+        return f"{hashlib.sha256(data).hexdigest()}_{width_px}x{height_px}_{mode}"
+
+    def get(self, data: bytes, width_px: int, height_px: int, mode: str = "contain") -> tuple[bytes, str]:
+        """
+        Returns the image fitted to width_px by height_px and its file extension, resizing it only if
+        no cached derivative exists. Raises ImageProcessingException if the image cannot be read.
+        """
+        key = self.derivative_key(data, width_px, height_px, mode)
+        with self._lock:
+            if key in self._derivatives:
+                self._derivatives.move_to_end(key)
+                return self._derivatives[key]
+            future = self._pending.get(key)
+            if not future:
+                future = self._executor.submit(self._load_or_fit, key, data, width_px, height_px, mode)
+                self._pending[key] = future
+
+        try:
+            derivative = future.result()
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+        with self._lock:
+            if key not in self._derivatives:
+                self._derivatives[key] = derivative
+                self._memory_bytes += len(derivative[0])
+                self._evict()
+            return self._derivatives[key]
+
+    def _load_or_fit(self, key: str, data: bytes, width_px: int, height_px: int, mode: str) -> tuple[bytes, str]:
+        for extension in ("jpg", "png"):
+            cached_path = os.path.join(self.cache_directory, f"{key}.{extension}")
+            if os.path.exists(cached_path):
+                logger.info(f"Loaded image derivative {key} from {self.cache_directory}")
+                with open(cached_path, "rb") as f:
+                    return f.read(), extension
+
+        fitted, extension = fit_image(data, width_px, height_px, mode)
+        os.makedirs(self.cache_directory, exist_ok=True)
+        cached_path = os.path.join(self.cache_directory, f"{key}.{extension}")
+        temp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(fitted)
+        os.replace(temp_path, cached_path)
+        return fitted, extension
+
+    def _evict(self) -> None:
+        """Drops least recently used derivatives from memory until they fit the budget. They remain on disk."""
+        while self._memory_bytes > self.max_memory_bytes and len(self._derivatives) > 1:
+            key, (data, _) = self._derivatives.popitem(last=False)
+            self._memory_bytes -= len(data)
+            logger.info(f"Evicted image derivative {key} from memory")
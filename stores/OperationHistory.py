@@ -0,0 +1,122 @@
+import copy
+import logging
+from collections import deque
+
+logger = logging.getLogger("OperationHistory")
+
+DEFAULT_MAX_DEPTH = 20
+
+
+class Snapshot:
+    """
+    The state a tool call may change: the order of the slides with the presentation's relationships to them, the
+    XML and relationships of each slide the call edited, and the session's footer state.
+
+    Only slides that are edited are copied. A slide that is added or removed keeps its part, which is held by the
+    relationships copied here, so putting it back is a matter of restoring the slide list and relationships.
+    """
+    def __init__(self, label: str, presentation, footer: dict = None):
+        self.label = label
+        self.footer = copy.deepcopy(footer)
+        self.slide_ids = [copy.deepcopy(slide_id) for slide_id in presentation.slides._sldIdLst]
+        self.presentation_rels = dict(presentation.part.rels._rels)
+        # slide part -> (slide XML, relationships of the slide)
+        self.slides = {}
+
+    def add_slide(self, slide_part) -> None:
+        if slide_part not in self.slides:
+            self.slides[slide_part] = (copy.deepcopy(slide_part._element), dict(slide_part.rels._rels))
+
+    def capture_current(self, presentation, footer: dict = None) -> "Snapshot":
+        """Returns a snapshot of the same slides as they are now, so that restoring this snapshot can be reversed."""
+        current = Snapshot(self.label, presentation, footer)
+        for slide_part in self.slides:
+            current.add_slide(slide_part)
+        return current
+
+    def restore(self, presentation) -> list:
+        """Puts the presentation back to this snapshot and returns the slide ids of the slides whose XML was restored."""
+        slide_id_list = presentation.slides._sldIdLst
+        for slide_id in list(slide_id_list):
+            slide_id_list.remove(slide_id)
+        for slide_id in self.slide_ids:
+            slide_id_list.append(slide_id)
+        presentation_rels = presentation.part.rels._rels
+        presentation_rels.clear()
+        presentation_rels.update(self.presentation_rels)
+
+        restored = []
+        for slide_part, (element, rels) in self.slides.items():
+            slide_part._element = element
+            slide_part.rels._rels.clear()
+            slide_part.rels._rels.update(rels)
+            # the Slide object is cached on the part and wraps the old XML
+            slide_part.__dict__.pop("slide", None)
+            restored.append(slide_part.slide.slide_id)
+        # slides may come back under part names which were reused while they were removed
+        presentation.part.rename_slide_parts([slide_id.rId for slide_id in slide_id_list])
+        return restored
+
+
+class OperationHistory:
+    """
+    Per-session log of the changes made by tools, used by the undo and redo tools.
+
+    Before a tool changes the presentation a Snapshot is started, and the slides the tool is about to edit are added
+    to it. When the tool succeeds the snapshot is pushed onto the undo stack; at most max_depth changes are kept.
+    Undoing a change takes a snapshot of the same slides as they are now for redo and restores the stored one, so
+    reverting a change copies about as much XML as the change itself touched.
+    """
+    def __init__(self, max_depth: int = DEFAULT_MAX_DEPTH):
+        self._undo: deque[Snapshot] = deque(maxlen=max_depth)
+        self._redo: list[Snapshot] = []
+        self._pending: Snapshot | None = None
+
+    def begin(self, label: str, presentation, footer: dict = None) -> None:
+        self._pending = Snapshot(label, presentation, footer)
+
+    def snapshot_slide(self, slide) -> None:
+        """Records a slide before it is edited by the change in progress. Does nothing outside a change."""
+        if self._pending is not None:
+            self._pending.add_slide(slide.part)
+
+    def commit(self) -> None:
+        if self._pending is not None:
+            self._undo.append(self._pending)
+            self._redo.clear()
+            self._pending = None
+
+    def discard(self) -> None:
+        self._pending = None
+
+    def undo(self, presentation, footer: dict = None) -> tuple[str, list, dict | None] | None:
+        """
+        Reverts the latest change, given the session's current footer state. Returns its label, the restored slide ids
+        and the footer state to restore, or None if there is nothing to undo.
+        """
+        if not self._undo:
+            return None
+        snapshot = self._undo.pop()
+        self._redo.append(snapshot.capture_current(presentation, footer))
+        logger.info(f"Undoing {snapshot.label}")
+        return snapshot.label, snapshot.restore(presentation), copy.deepcopy(snapshot.footer)
+
+    def redo(self, presentation, footer: dict = None) -> tuple[str, list, dict | None] | None:
+        """
+        Makes the latest undone change again, given the session's current footer state. Returns its label, the restored
+        slide ids and the footer state to restore, or None if there is nothing to redo.
+        """
+        if not self._redo:
+            return None
+        snapshot = self._redo.pop()
+        self._undo.append(snapshot.capture_current(presentation, footer))
+        logger.info(f"Redoing {snapshot.label}")
+        return snapshot.label, snapshot.restore(presentation), copy.deepcopy(snapshot.footer)
+
+    @property
+    def undo_depth(self) -> int:
+        return len(self._undo)
+
+    @property
+    def redo_depth(self) -> int:
+        return len(self._redo)
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+logger = logging.getLogger("OperationJournal")
+
+JOURNAL_DIRECTORY = "journal"
+JOURNAL_EXTENSION = ".jsonl"
+FSYNC_INTERVAL_SECONDS = 0.05
+# journals kept open for appending, the least recently written is closed when another is opened
+MAX_OPEN_JOURNALS = 64
+
+
+class OperationJournal:
+    """
+    Append-only journal of the changes made to each presentation since it was last saved, used to recover sessions
+    after the server process dies.
+
+    Each presentation has its own file of JSON lines in the journal directory: a checkpoint line written when the
+    presentation was created or saved, followed by one line per successful mutating tool call with the tool name,
+    its arguments and the version it left the presentation at. Lines are written to the file as they are appended,
+    so they survive the process dying. A background thread fsyncs every file written to in the last interval
+    together, so a burst of tool calls costs one fsync per file rather than one per call. At most max_open_files
+    journals are kept open; the least recently written is synced and closed when another is opened.
+
+    Saving the presentation makes its journal redundant, so the journal is started again from a new checkpoint.
+    A saving line is written and synced before the presentation is written, so if the process dies after the
+    presentation is written but before the checkpoint, the changes it already holds are not replayed again.
+    Loaded datasets are journaled too, so tools which use them can be replayed.
+    """
+    def __init__(
+            self,
+            directory: str = JOURNAL_DIRECTORY,
+            fsync_interval: float = FSYNC_INTERVAL_SECONDS,
+            max_open_files: int = MAX_OPEN_JOURNALS
+    ):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.max_open_files = max_open_files
+        self._files = OrderedDict()
+        self._unsynced = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._sync_loop, name="journal-fsync", daemon=True).start()
+
+    def _path(self, presentation_filename: str) -> str:
+        return os.path.join(self.directory, quote(presentation_filename, safe="") + JOURNAL_EXTENSION)
+
+    def _open(self, presentation_filename: str, path: str):
+        """Opens a journal for appending, closing the least recently written journals beyond max_open_files. Call with the lock held."""
+        f = open(path, "a", encoding="utf-8")
+        self._files[presentation_filename] = f
+        while len(self._files) > self.max_open_files:
+            filename, idle = self._files.popitem(last=False)
+            if filename in self._unsynced:
+                self._unsynced.discard(filename)
+                os.fsync(idle.fileno())
+            idle.close()
+        return f
+
+    def _write(self, presentation_filename: str, record: dict, mode: str, sync: bool = False) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        path = self._path(presentation_filename)
+        with self._lock:
+            f = self._files.pop(presentation_filename, None)
+            if mode == "w":
+                # the new journal replaces the old one in a single step, so a crash leaves one or the other
+                if f is not None:
+                    f.close()
+                    self._unsynced.discard(presentation_filename)
+                with open(f"{path}.tmp", "w", encoding="utf-8") as new_journal:
+                    new_journal.write(line)
+                    new_journal.flush()
+                    os.fsync(new_journal.fileno())
+                os.replace(f"{path}.tmp", path)
+                self._open(presentation_filename, path)
+                return
+            if f is None:
+                f = self._open(presentation_filename, path)
+            else:
+                # reinserted as the most recently written
+                self._files[presentation_filename] = f
+            f.write(line)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+                return
+            self._unsynced.add(presentation_filename)
+        self._wake.set()
+
+    def append(self, presentation_filename: str, tool_name: str, arguments: dict, version: int) -> None:
+        """Records a successful change made by a tool call."""
+        self._write(presentation_filename, {"tool": tool_name, "arguments": arguments, "version": version}, "a")
+
+    def append_dataset(self, presentation_filename: str, dataset_id: str, file_path: str) -> None:
+        """Records that a dataset was loaded into the session from a stored file."""
+        self._write(presentation_filename, {"dataset": dataset_id, "file_path": file_path}, "a")
+
+    def saving(self, presentation_filename: str, version: int) -> None:
+        """Records, durably, that the presentation is about to be written to disk at the given version."""
+        self._write(presentation_filename, {"saving": True, "version": version, "time": time.time()}, "a", sync=True)
+
+    def preserve(self, presentation_filename: str) -> str | None:
+        """
+        Copies a presentation's journal aside, e.g. when it could not be fully replayed, so the changes it holds are
+        kept when the journal is next started again. Returns the path of the copy.
+        """
+        path = self._path(presentation_filename)
+        if not os.path.exists(path):
+            return None
+        preserved_path = f"{path}.{int(time.time())}.failed"
+        shutil.copyfile(path, preserved_path)
+        return preserved_path
+
+    def checkpoint(self, presentation_filename: str, version: int) -> None:
+        """Starts the journal again after the presentation has been written to disk at the given version."""
+        self._write(presentation_filename, {"checkpoint": True, "version": version}, "w")
+
+    def read(self, presentation_filename: str) -> list[dict]:
+        """
+        Returns the records in a presentation's journal, oldest first. A partly written last line, left by the process
+        dying mid-write, is ignored.
+        """
+        path = self._path(presentation_filename)
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring incomplete journal record for {presentation_filename}")
+                    break
+        return records
+
+    def presentation_filenames(self) -> list[str]:
+        """Returns the filenames of every presentation with a journal."""
+        return [
+            unquote(name[:-len(JOURNAL_EXTENSION)])
+            for name in os.listdir(self.directory)
+            if name.endswith(JOURNAL_EXTENSION)
+        ]
+
+    def sync(self) -> None:
+        """fsyncs every journal written to since the last sync."""
+        with self._lock:
+            files = [self._files[filename] for filename in self._unsynced if filename in self._files]
+            self._unsynced.clear()
+        # appends carry on while the files are synced
+        for f in files:
+            try:
+                os.fsync(f.fileno())
+            except (OSError, ValueError) as e:
+                # a checkpoint may have replaced the file in the meantime
+                logger.warning(f"Unable to fsync journal {f.name}: {e}")
+
+    def _sync_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            # gather the appends made in the next interval into the same fsync
+            time.sleep(self.fsync_interval)
+            self._wake.clear()
+            self.sync()
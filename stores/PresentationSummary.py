@@ -0,0 +1,114 @@
+import logging
+
+from utils.digest_slide import digest_slide
+
+logger = logging.getLogger("PresentationSummary")
+
+
+class PresentationSummary:
+    """
+    Per-session summary of a presentation which is kept up to date as tools change it, rather than rebuilt on request.
+
+    Tools report changes through SessionManager: a changed slide is marked dirty and only dirty slides are digested
+    again when the summary is next read. Each change is recorded with the deck version it was made at, so a caller
+    holding an earlier version can ask for just the slides that changed since then. Slides are tracked by their
+    slide_id, which stays the same when slides are moved.
+    """
+    def __init__(self):
+        self._digests: dict[int, dict] = {}
+        self._dirty: set[int] = set()
+        # slide_id -> version at which the slide last changed / was removed
+        self._changed: dict[int, int] = {}
+        self._removed: dict[int, int] = {}
+        self._order_version = 0
+
+    def slide_changed(self, slide_id: int, version: int) -> None:
+        self._dirty.add(slide_id)
+        self._changed[slide_id] = version
+
+    def structure_changed(self, slide_ids: list[int], version: int) -> None:
+        """Records that slides were added, removed or moved. slide_ids is the new order of the slides."""
+        self._order_version = version
+        current = set(slide_ids)
+        for slide_id in set(self._changed) - current:
+            del self._changed[slide_id]
+            self._digests.pop(slide_id, None)
+            self._dirty.discard(slide_id)
+            self._removed[slide_id] = version
+        for slide_id in current - set(self._changed):
+            self._dirty.add(slide_id)
+            self._changed[slide_id] = version
+
+    def _slide_ids(self, presentation, version: int) -> list:
+        slide_ids = [slide_id.id for slide_id in presentation.slides._sldIdLst]
+        if set(slide_ids) != set(self._changed):
+            # slides added or removed without a tool reporting it
+            self.structure_changed(slide_ids, version)
+        return slide_ids
+
+    def _refresh(self, presentation, version: int) -> list:
+        slide_ids = self._slide_ids(presentation, version)
+        if self._dirty:
+            for slide_id in self._dirty:
+                slide = presentation.slides.get(slide_id)
+                if slide is not None:
+                    self._digests[slide_id] = digest_slide(slide)
+            logger.info(f"Digested {len(self._dirty)} changed slides")
+            self._dirty.clear()
+        return slide_ids
+
+    def iter_slide_information(self, presentation, version: int, from_index: int = 0):
+        """
+        Generator of the summaries of the slides from from_index (0-based) onwards, in slide order. A changed slide is
+        only digested again when it is reached, so a caller which stops early does not digest the slides after it.
+        """
+        slide_ids = self._slide_ids(presentation, version)
+        for slide_index, slide_id in enumerate(slide_ids[from_index:], from_index + 1):
+            if slide_id in self._dirty:
+                self._digests[slide_id] = digest_slide(presentation.slides.get(slide_id))
+                self._dirty.discard(slide_id)
+            yield {"slide_index": slide_index, **self._digests[slide_id]}
+
+    def content_hashes(self) -> set[str]:
+        """Returns the content hashes of the slides as they were when last digested."""
+        return {digest["content_hash"] for digest in self._digests.values()}
+
+    def summary(self, presentation, version: int, since_version: int = None) -> dict:
+        """
+        Returns the summary of every slide at the given deck version, or with since_version only what has changed
+        after that version.
+
+        Example of the Returned Dictionary with since_version:
+        {
+            "version": 12,
+            "since_version": 9,
+            "total_num_slides": 4,
+            "order": [256, 259, 257, 258],
+            "changed": [{"slide_index": 2, "slide_id": 259, "slide_name": "results", ...}],
+            "removed": [260]
+        }
+        "order" is only included if slides were added, removed or moved after since_version.
+        """
+        slide_ids = self._refresh(presentation, version)
+        positions = {slide_id: i + 1 for i, slide_id in enumerate(slide_ids)}
+
+        def slide_information(slide_id: int) -> dict:
+            return {"slide_index": positions[slide_id], **self._digests[slide_id]}
+
+        if since_version is None or since_version > version:
+            return {
+                "version": version,
+                "total_num_slides": len(slide_ids),
+                "slide_information": [slide_information(slide_id) for slide_id in slide_ids],
+            }
+
+        delta = {
+            "version": version,
+            "since_version": since_version,
+            "total_num_slides": len(slide_ids),
+            "changed": [slide_information(slide_id) for slide_id in slide_ids if self._changed[slide_id] > since_version],
+            "removed": [slide_id for slide_id, version in self._removed.items() if version > since_version],
+        }
+        if self._order_version > since_version:
+            delta["order"] = slide_ids
+        return delta
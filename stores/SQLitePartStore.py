@@ -0,0 +1,216 @@
+import functools
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.package import Part, XmlPart, _PackageLoader
+from pptx.opc.packuri import PACKAGE_URI, PackURI
+from pptx.package import Package
+from pptx.parts.chart import ChartPart
+from pptx.parts.presentation import PresentationPart
+from pptx.parts.slide import NotesSlidePart, SlidePart
+
+from errors.SessionStoreConflictException import SessionStoreConflictException
+from stores.SessionBackend import SessionBackend
+from utils.open_presentation import LazySlidePart
+
+logger = logging.getLogger("SQLitePartStore")
+
+SESSION_DATABASE = "sessions.db"
+# XML parts tools edit. Other XML parts, such as layouts, masters and themes, are only stored when first added
+EDITABLE_PART_TYPES = (PresentationPart, SlidePart, NotesSlidePart, ChartPart)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS presentations (
+    presentation_filename TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    package_rels BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parts (
+    presentation_filename TEXT NOT NULL,
+    partname TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    rels_xml BLOB,
+    sha1 TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (presentation_filename, partname)
+);
+"""
+
+
+def _sha1(data: bytes | None) -> str | None:
+    return hashlib.sha1(data).hexdigest() if data is not None else None
+
+
+class _StoredPartReader:
+    """Gives python-pptx's package loader the parts of a presentation read from the parts table."""
+    def __init__(self, rows: dict, package_rels: bytes):
+        self._rows = rows
+        self._package_rels = package_rels
+
+    def __contains__(self, partname) -> bool:
+        return partname in self._rows
+
+    def __getitem__(self, partname) -> bytes:
+        # slide XML is left in the database until the slide is used
+        return self._rows[partname]["blob"] or b""
+
+    def rels_xml_for(self, partname):
+        if partname == PACKAGE_URI:
+            return self._package_rels
+        row = self._rows.get(partname)
+        return row["rels_xml"] if row else None
+
+
+class SQLitePartStore(SessionBackend):
+    """
+    Session backend which stores each presentation in a SQLite database as its individual package parts, so several
+    server workers can share sessions and a session outlives the worker that created it.
+
+    Each part is a row holding its XML or binary content, the XML of its relationships, a hash of both and the
+    presentation version it last changed at. Loading a presentation reads every part except the slides, whose XML
+    is read when a tool first uses the slide. Storing a change writes only the parts which were added or changed and
+    deletes parts no longer in the presentation, in one transaction which fails if another worker stored a change
+    first. Unused slides and binary parts, which python-pptx never changes in place, are skipped without
+    serialising them, as are XML parts which tools do not edit.
+    """
+    shared = True
+
+    def __init__(self, database: str = SESSION_DATABASE):
+        self.database = database
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def stored_version(self, presentation_filename: str) -> int | None:
+        row = self._connection().execute(
+            "SELECT version FROM presentations WHERE presentation_filename = ?", (presentation_filename,)
+        ).fetchone()
+        return row["version"] if row else None
+
+    def load(self, presentation_filename: str):
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            presentation_row = connection.execute(
+                "SELECT version, package_rels FROM presentations WHERE presentation_filename = ?", (presentation_filename,)
+            ).fetchone()
+            if presentation_row is None:
+                return None
+            rows = {
+                PackURI(row["partname"]): row
+                for row in connection.execute(
+                    "SELECT partname, content_type, CASE WHEN content_type = ? THEN NULL ELSE blob END AS blob, "
+                    "rels_xml, sha1 FROM parts WHERE presentation_filename = ?",
+                    (CT.PML_SLIDE, presentation_filename)
+                )
+            }
+        finally:
+            connection.execute("COMMIT")
+
+        package = Package(None)
+        loader = _PackageLoader(None, package)
+        loader.__dict__["_package_reader"] = _StoredPartReader(rows, presentation_row["package_rels"])
+        loader.__dict__["_content_types"] = {partname: row["content_type"] for partname, row in rows.items()}
+        package_rels, parts = loader._load()
+        package._rels.load_from_xml(PACKAGE_URI, package_rels, parts)
+
+        for partname, part in parts.items():
+            row = rows[partname]
+            if isinstance(part, LazySlidePart):
+                part._xml = functools.partial(self._read_blob, presentation_filename, str(partname))
+            part._stored = (str(partname), row["sha1"], _sha1(row["rels_xml"]), part._blob if not isinstance(part, XmlPart) else None)
+        logger.info(f"Loaded {presentation_filename} at version {presentation_row['version']} from {len(rows)} stored parts")
+        return package.presentation_part.presentation, presentation_row["version"]
+
+    def _read_blob(self, presentation_filename: str, partname: str) -> bytes:
+        row = self._connection().execute(
+            "SELECT blob FROM parts WHERE presentation_filename = ? AND partname = ?", (presentation_filename, partname)
+        ).fetchone()
+        return row["blob"]
+
+    def store(self, presentation_filename: str, presentation, base_version: int | None, version: int) -> None:
+        package = presentation.part.package
+        # parts are stored by partname, so slide parts are numbered in slide order first as they are when saved
+        presentation.part.rename_slide_parts([slide_id.rId for slide_id in presentation.slides._sldIdLst])
+        connection = self._connection()
+        # takes the write lock straight away, so the version check and the writes happen together
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            stored_version = connection.execute(
+                "SELECT version FROM presentations WHERE presentation_filename = ?", (presentation_filename,)
+            ).fetchone()
+            stored_version = stored_version["version"] if stored_version else None
+            if stored_version != base_version:
+                raise SessionStoreConflictException(
+                    f"{presentation_filename} is at version {stored_version} in the session store, not {base_version}"
+                )
+
+            stored_partnames = {
+                row["partname"] for row in connection.execute(
+                    "SELECT partname FROM parts WHERE presentation_filename = ?", (presentation_filename,)
+                )
+            }
+            written = []
+            partnames = set()
+            for part in package.iter_parts():
+                partname = str(part.partname)
+                if partname in partnames:
+                    # one part's row would silently replace the other's
+                    raise ValueError(f"{presentation_filename} has more than one part named {partname}")
+                partnames.add(partname)
+                stored = getattr(part, "_stored", None)
+                if stored and stored[0] == partname and partname in stored_partnames and self._unchanged(part, stored):
+                    continue
+                blob = part.blob
+                rels_xml = part.rels.xml if len(part.rels) else None
+                if stored and stored[0] == partname and partname in stored_partnames and (_sha1(blob), _sha1(rels_xml)) == stored[1:3]:
+                    continue
+                written.append((presentation_filename, partname, part.content_type, blob, rels_xml, _sha1(blob), version))
+                if isinstance(part, LazySlidePart) and not part.is_parsed:
+                    # an unused slide which has been renumbered is read from its new row from now on
+                    part._xml = functools.partial(self._read_blob, presentation_filename, partname)
+                part._stored = (partname, _sha1(blob), _sha1(rels_xml), blob if not isinstance(part, XmlPart) else None)
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO parts (presentation_filename, partname, content_type, blob, rels_xml, sha1, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                written
+            )
+            removed = stored_partnames - partnames
+            connection.executemany(
+                "DELETE FROM parts WHERE presentation_filename = ? AND partname = ?",
+                [(presentation_filename, partname) for partname in removed]
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO presentations (presentation_filename, version, package_rels) VALUES (?, ?, ?)",
+                (presentation_filename, version, package._rels.xml)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        logger.info(f"Stored {presentation_filename} at version {version}: {len(written)} parts written, {len(removed)} removed")
+
+    @staticmethod
+    def _unchanged(part: Part, stored: tuple) -> bool:
+        """Whether a part loaded or stored earlier can be skipped without serialising it to compare its hash."""
+        if isinstance(part, LazySlidePart) and not part.is_parsed:
+            return True
+        if not isinstance(part, XmlPart):
+            # binary parts are only ever changed by replacing their bytes. Their relationships are compared anyway
+            return part._blob is stored[3] and _sha1(part.rels.xml if len(part.rels) else None) == stored[2]
+        return not isinstance(part, EDITABLE_PART_TYPES)
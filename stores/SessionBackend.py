@@ -0,0 +1,25 @@
+class SessionBackend:
+    """
+    Where SessionManager keeps the presentations of its sessions between tool calls.
+
+    This default backend keeps nothing outside the SessionManager's own memory, so sessions belong to a single server
+    process. Backends shared by several server workers, such as SQLitePartStore, load a session's presentation when a
+    worker does not have its latest version and store each change made to it.
+    """
+    shared = False
+
+    def stored_version(self, presentation_filename: str) -> int | None:
+        """Returns the version of the presentation in the backend, or None if the backend does not hold it."""
+        return None
+
+    def load(self, presentation_filename: str):
+        """Returns the (presentation, version) pair held by the backend, or None if it does not hold the presentation."""
+        return None
+
+    def store(self, presentation_filename: str, presentation, base_version: int | None, version: int) -> None:
+        """
+        Stores a changed presentation at version. base_version is the version the change was made on, or None for a
+        presentation the backend does not hold yet. Raises SessionStoreConflictException if the backend has moved on
+        from base_version because another worker changed the presentation.
+        """
+        pass
@@ -1,17 +1,128 @@
 from mcp.server import FastMCP
 import logging
+from copy import deepcopy
 
+import numpy as np
 from mcp.server.fastmcp import Context
 from pptx.chart.data import CategoryChartData
 from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import serialize_part_xml
+from pptx.parts.chart import ChartPart
+from pptx.shapes.placeholder import PlaceholderGraphicFrame
 from pptx.util import Pt
 from SessionManager import SessionManager
 from utils.clean_slide_name import clean_slide_name
 from utils.validate_chart_data import validate_chart_data
+from utils.query_dataset import split_rows_by_group, group_and_aggregate, table_data_to_columns, to_json_values
 from errors.ChartDataConverterException import ChartDataConverterException
+from errors.DatasetQueryException import DatasetQueryException
 
 logger = logging.getLogger(__name__)
 
+MAX_SMALL_MULTIPLES = 50
+
+# slide.name uses user_friendly_name property from slide_layouts_full.yaml
+BOTTOM_LEGEND_SLIDE_NAMES = (
+    'Chart and Text - grey background',
+    'Chart Right Hand with Text on Left',
+    'Text Content with Left Hand Graph',
+)
+
+
+def build_category_chart_data(chart_data: dict) -> CategoryChartData:
+    data = CategoryChartData()
+    data.categories = chart_data["categories"]
+    for series in chart_data["series"]:
+        data.add_series(series.get('name', 'Unnamed Series'), series.get('values', []))
+    return data
+
+
+def set_chart_title(chart, chart_title: str) -> None:
+    chart.has_title = True
+    chart.chart_title.text_frame.text = chart_title
+    chart.chart_title.text_frame.paragraphs[0].font.size = Pt(12)
+
+
+def style_chart(
+        chart,
+        slide_name: str,
+        chart_title: str = None,
+        chart_has_legend: bool = False,
+        category_axis_title: str = None,
+        value_axis_title: str = None,
+) -> None:
+    """
+    Applies the house chart styling: title, axis titles and tick label font sizes, and legend position.
+    """
+    if chart_title:
+        set_chart_title(chart, chart_title)
+
+    # set category axis titles and font size
+    category_axis = chart.category_axis
+    if category_axis_title:
+        category_axis.axis_title.text_frame.text = category_axis_title
+        category_axis.axis_title.text_frame.paragraphs[0].font.size = Pt(13)
+
+    # set font size of axis data labels
+    category_axis.tick_labels.font.size = Pt(11)
+    category_axis.visible = True
+
+    # set value axis titles and font size
+    value_axis = chart.value_axis
+    if value_axis_title:
+        value_axis.axis_title.text_frame.text = value_axis_title
+        value_axis.axis_title.text_frame.paragraphs[0].font.size = Pt(13)
+
+    # set font size of axis data labels
+    value_axis.tick_labels.font.size = Pt(11)
+    value_axis.visible = True
+
+    if chart_has_legend:
+        chart.has_legend = True
+        if slide_name in BOTTOM_LEGEND_SLIDE_NAMES:
+            legend_position = XL_LEGEND_POSITION.BOTTOM
+        else:
+            legend_position = XL_LEGEND_POSITION.RIGHT
+        chart.legend.position = legend_position
+        chart.legend.font.size = Pt(11)
+        chart.legend.include_in_layout = False
+
+
+def chart_skeleton_blob(chart_part: ChartPart) -> bytes:
+    """
+    Returns a reusable copy of a styled chart's XML. The link to the chart's embedded workbook is removed
+    so every chart created from the skeleton gets its own workbook.
+    """
+    chart_space = deepcopy(chart_part._element)
+    chart_space._remove_externalData()
+    return serialize_part_xml(chart_space)
+
+
+def insert_chart_from_skeleton(chart_placeholder, skeleton_blob: bytes, data: CategoryChartData) -> PlaceholderGraphicFrame:
+    """
+    Inserts a chart into a chart placeholder by cloning an already styled chart skeleton and replacing its
+    data, rather than generating and styling new chart XML from scratch.
+    """
+    slide_part = chart_placeholder.part
+    package = slide_part.package
+    chart_part = ChartPart.load(
+        package.next_partname(ChartPart.partname_template),
+        CT.DML_CHART,
+        package,
+        skeleton_blob,
+    )
+    chart_part.chart.replace_data(data)
+    rId = slide_part.relate_to(chart_part, RT.CHART)
+    graphic_frame = chart_placeholder._new_chart_graphicFrame(
+        rId, chart_placeholder.left, chart_placeholder.top, chart_placeholder.width, chart_placeholder.height
+    )
+    parent = chart_placeholder._parent
+    chart_placeholder._replace_placeholder_with(graphic_frame)
+    return PlaceholderGraphicFrame(graphic_frame, parent)
+
+
 def register_chart_tools(
         pp_app: FastMCP,
         session_manager: SessionManager
@@ -66,6 +177,7 @@ def register_chart_tools(
             }
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_chart_to_slide(
             presentation_filename: str,
             chart_data: dict,
@@ -74,7 +186,9 @@ def register_chart_tools(
             category_axis_title: str = None,
             value_axis_title: str = None,
             slide_name: str = None,
-            slide_index: int = None
+            slide_index: int = None,
+            expected_version: int = None,
+            idempotency_key: str = None
     ) -> dict:
         """
         IMPORTANT - only use the slide_name or slide_index provided to find the slide. DO NOT USE the get_presentation_summary tool
@@ -94,6 +208,8 @@ def register_chart_tools(
         For example, if the name of the series is 'total spend', do 'total spend (£)'. If the name of the series concerns a percentage, do 'example tile (%)'
         :param slide_name: Optional. The name of the slide to add text to, E.G 'title' or 'main'
         :param slide_index: Optional. The index of the slide to add text to (0-based).
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         :return: a dictionary indicating the success or failure of the tool
 
@@ -149,58 +265,24 @@ def register_chart_tools(
                 chart_placeholder = shape
                 logger.info(f"---- constructing chart object")
 
-                data = CategoryChartData()
-                data.categories = chart_data["categories"]
-                for series in chart_data["series"]:
-                    data.add_series(series.get('name', 'Unnamed Series'), series.get('values', []))
+                data = build_category_chart_data(chart_data)
 
                 chart_graphic_frame = chart_placeholder.insert_chart(
                     XL_CHART_TYPE.COLUMN_CLUSTERED,
                     data
                 )
 
-                chart = chart_graphic_frame.chart
-                if chart_title:
-                    chart.has_title = True
-                    chart.chart_title.text_frame.text = chart_title
-                    chart.chart_title.text_frame.paragraphs[0].font.size = Pt(12)
-
-                # set category axis titles and font size
-                category_axis = chart.category_axis
-                category_axis.axis_title.text_frame.text = category_axis_title
-                category_axis.axis_title.text_frame.paragraphs[0].font.size = Pt(13)
-
-                # set font size of axis data labels
-                category_axis.tick_labels.font.size = Pt(11)
-                category_axis.visible = True
-
-                # set value axis titles and font size
-                value_axis = chart.value_axis
-                value_axis.axis_title.text_frame.text = value_axis_title
-                value_axis.axis_title.text_frame.paragraphs[0].font.size = Pt(13)
-
-                # set font size of axis data labels
-                value_axis.tick_labels.font.size = Pt(11)
-                value_axis.visible = True
-
-
-                if chart_has_legend:
-                    chart.has_legend = True
-                    # slide.name uses user_friendly_name property from slide_layouts_full.yaml
-                    if slide_to_edit.name in (
-                            'Chart and Text - grey background',
-                            'Chart Right Hand with Text on Left',
-                            'Text Content with Left Hand Graph',
-                    ):
-                        legend_position = XL_LEGEND_POSITION.BOTTOM
-                    else:
-                        legend_position = XL_LEGEND_POSITION.RIGHT
-                    chart.legend.position = legend_position
-                    chart.legend.font.size = Pt(11)
-                    chart.legend.include_in_layout = False
-
+                style_chart(
+                    chart_graphic_frame.chart,
+                    slide_to_edit.name,
+                    chart_title=chart_title,
+                    chart_has_legend=chart_has_legend,
+                    category_axis_title=category_axis_title,
+                    value_axis_title=value_axis_title,
+                )
 
                 chart_already_on_slide = False
+                session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
                 return {
                     "status": "success",
                     "message": f"Successfully added chart to slide {slide_to_edit.name}, index: {slide_index}. Remember to save."
@@ -215,4 +297,199 @@ def register_chart_tools(
         return {
             "status": "failure",
             "message": f"Error: This is because no chart placeholder was found on the slide. Please add another slide with a Chart Layout."
-        }
\ No newline at end of file
+        }
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def add_small_multiple_charts(
+            presentation_filename: str,
+            group_by: str,
+            category_column: str,
+            value_columns: list[str],
+            dataset_id: str = None,
+            table_data: dict = None,
+            aggregation: str = "sum",
+            chart_title: str = None,
+            chart_has_legend: bool = False,
+            category_axis_title: str = None,
+            value_axis_title: str = None,
+            group_text: dict = None,
+            slide_layout_name: str = "Chart and Text Slide",
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Creates one new chart slide per group of a dataset in a single call, e.g. one chart per region or per product.
+        Use this instead of calling add_new_slide and add_chart_to_slide repeatedly when the user asks for the same chart for each group.
+
+        Every chart shares the same styling: the first chart is built and styled once and reused as the skeleton for the others.
+        Each slide gets the group name as its title and as its slide name.
+
+        This only modifies the presentation in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation.
+        :param group_by: The column to split the data by. One slide is created for each distinct value, e.g. "Region".
+        :param category_column: The column to use as the chart categories (x-axis), e.g. "Month".
+        :param value_columns: The numeric columns to plot as chart series, e.g. ["Revenue"].
+        :param dataset_id: Optional. The dataset_id returned by load_dataset. Either dataset_id or table_data must be provided.
+        :param table_data: Optional. table_data with "columns" and "values" keys containing the group_by, category and value columns.
+        :param aggregation: Optional. How to combine rows with the same group and category. One of sum, mean, count, min, max. Defaults to sum.
+        :param chart_title: Optional. The chart title. The group name is appended to it on each chart.
+        :param chart_has_legend: Optional. Whether the charts have a legend. Defaults to False.
+        :param category_axis_title: Optional. The category axis title shared by all charts.
+        :param value_axis_title: Optional. The value axis title shared by all charts. Include a unit of measurement.
+        :param group_text: Optional. A dictionary of group name to text to add to the text placeholder of that group's slide.
+        :param slide_layout_name: Optional. The slide_layout_name of the chart layout to use. Defaults to "Chart and Text Slide".
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully added 3 chart slides grouped by Region. Remember to save.",
+            "slides": [{"group": "North", "slide_index": 3}, {"group": "South", "slide_index": 4}, {"group": "West", "slide_index": 5}]
+        }
+        """
+        logger.info(f"---- Attempting to add small multiple charts grouped by {group_by}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+        except KeyError:
+            presentation = None
+        if not presentation:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session in add_small_multiple_charts."
+            }
+
+        first_new_index = len(presentation.slides)
+        try:
+            if dataset_id:
+                dataset_store = session_manager.get_dataset_store(presentation_filename)
+                if dataset_id not in dataset_store:
+                    return {
+                        "status": "failure",
+                        "message": f"Dataset {dataset_id} has not been loaded. Call load_dataset first."
+                    }
+                columns = dataset_store.get(dataset_id)["columns"]
+            elif table_data:
+                columns = table_data_to_columns(table_data, value_columns)
+            else:
+                return {
+                    "status": "failure",
+                    "message": "Either dataset_id or table_data must be provided."
+                }
+
+            for name in [group_by, category_column] + list(value_columns):
+                if name not in columns:
+                    return {
+                        "status": "failure",
+                        "message": f"Column '{name}' does not exist in the data."
+                    }
+            # checked before any slide is added, so a column which cannot be plotted leaves the deck unchanged
+            for name in value_columns:
+                if not np.issubdtype(columns[name].dtype, np.floating):
+                    return {
+                        "status": "failure",
+                        "message": f"Column '{name}' is not numeric and cannot be plotted."
+                    }
+
+            layout_metadata = next(
+                (l for l in session_manager.slide_layouts_metadata['layouts'] if l['slide_layout_name'] == slide_layout_name),
+                None
+            )
+            if not layout_metadata:
+                return {
+                    "status": "failure",
+                    "message": f"Tool failed: Layout template '{slide_layout_name}' could not be found."
+                }
+            slide_layout = presentation.slide_layouts[layout_metadata['slide_layout_index']]
+            # checked before any slide is added, so a layout without a chart leaves the deck unchanged
+            if not any(placeholder.placeholder_format.type == PP_PLACEHOLDER.CHART for placeholder in slide_layout.placeholders):
+                return {
+                    "status": "failure",
+                    "message": f"Error: No chart placeholder was found on layout '{slide_layout_name}'. Use a layout with a Chart."
+                }
+
+            groups = split_rows_by_group(columns[group_by])
+            if len(groups) > MAX_SMALL_MULTIPLES:
+                return {
+                    "status": "failure",
+                    "message": f"The data has {len(groups)} groups in column '{group_by}'. At most {MAX_SMALL_MULTIPLES} charts can be added in one call. Filter the data first."
+                }
+            group_labels = [str(label) for label in to_json_values(columns[group_by][[rows[0] for _, rows in groups]])]
+
+            skeleton_blob = None
+            added_slides = []
+            for label, (_, rows) in zip(group_labels, groups):
+                categories = None
+                series = []
+                for value_column in value_columns:
+                    category_keys, values = group_and_aggregate(
+                        columns[category_column][rows], columns[value_column][rows], aggregation
+                    )
+                    categories = categories or [str(c) for c in to_json_values(category_keys)]
+                    series.append({
+                        "name": value_column,
+                        # groups with no values are left as gaps rather than plotted as 0
+                        "values": to_json_values(values)
+                    })
+                data = build_category_chart_data({"categories": categories, "series": series})
+
+                slide = presentation.slides.add_slide(slide_layout)
+                slide.name = clean_slide_name(label)
+                group_chart_title = f"{chart_title} - {label}" if chart_title else None
+
+                chart_placeholder = None
+                for shape in slide.placeholders:
+                    placeholder_type = shape.placeholder_format.type.name
+                    if placeholder_type == 'TITLE' and shape.has_text_frame:
+                        shape.text_frame.text = label
+                    elif placeholder_type == 'CHART' and chart_placeholder is None:
+                        chart_placeholder = shape
+                    elif placeholder_type == 'BODY' and group_text and group_text.get(label) and shape.has_text_frame:
+                        shape.text_frame.text = group_text[label]
+                        for paragraph in shape.text_frame.paragraphs:
+                            for run in paragraph.runs:
+                                run.font.size = Pt(12)
+
+                if skeleton_blob is None:
+                    chart_graphic_frame = chart_placeholder.insert_chart(XL_CHART_TYPE.COLUMN_CLUSTERED, data)
+                    # the slide is named after its group, so the layout's name decides the legend position
+                    style_chart(
+                        chart_graphic_frame.chart,
+                        layout_metadata.get('user_friendly_name', slide_layout_name),
+                        chart_title=group_chart_title,
+                        chart_has_legend=chart_has_legend,
+                        category_axis_title=category_axis_title,
+                        value_axis_title=value_axis_title,
+                    )
+                    skeleton_blob = chart_skeleton_blob(chart_graphic_frame.chart_part)
+                else:
+                    chart_graphic_frame = insert_chart_from_skeleton(chart_placeholder, skeleton_blob, data)
+                    if group_chart_title:
+                        set_chart_title(chart_graphic_frame.chart, group_chart_title)
+
+                added_slides.append({"group": label, "slide_index": len(presentation.slides) - 1})
+
+            logger.info(f"---- Successfully added {len(added_slides)} small multiple chart slides grouped by {group_by}")
+            return {
+                "status": "success",
+                "message": f"Successfully added {len(added_slides)} chart slides grouped by {group_by}. Remember to save.",
+                "slides": added_slides
+            }
+        except DatasetQueryException as e:
+            logger.error(f"---- Unable to build small multiple charts: {e}")
+            return {
+                "status": "failure",
+                "message": f"Unable to build small multiple charts: {e}"
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while adding small multiple charts: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+        finally:
+            if len(presentation.slides) > first_new_index:
+                session_manager.mark_structure_changed(presentation_filename, first_new_index)
@@ -0,0 +1,279 @@
+from mcp.server import FastMCP
+import logging
+
+from SessionManager import SessionManager
+from stores.FileStore import shared_file_store
+from utils.query_dataset import query_dataset, table_data_to_chart_data
+from utils.summarise_data import summarise_chart_data
+from utils.validate_chart_data import validate_chart_data
+from errors.DataFileIngestionException import DataFileIngestionException
+from errors.DatasetQueryException import DatasetQueryException
+
+logger = logging.getLogger(__name__)
+
+FILE_STORAGE_DIRECTORY = "file_storage"
+
+
+def register_dataset_tools(
+        pp_app: FastMCP,
+        session_manager: SessionManager
+):
+    # uploads are written by the agent, the server only resolves logical filenames to stored objects
+    file_store = shared_file_store(FILE_STORAGE_DIRECTORY)
+
+    @pp_app.tool()
+    def load_dataset(presentation_filename: str, filename: str) -> dict:
+        """
+        Parses an uploaded CSV or XLSX file from file storage into the session dataset cache.
+        Loading the same file again is free: datasets are cached by a hash of the file content.
+
+        Call this once after the handle_files_tool has returned a successful response for a data file, then use
+        query_uploaded_dataset to get chart or table data from it instead of copying values out of the file yourself.
+
+        :param presentation_filename: The filename of the presentation.
+        :param filename: The filename returned by the handle_files_tool.
+        :return: a dictionary indicating the success or failure of the tool. If successful, the dataset_id and schema are included.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "dataset_id": "3f2a9c0d41b7e865",
+            "schema": {
+                "columns": [{"name": "Date", "type": "date", "missing": 0}, {"name": "Revenue", "type": "integer", "missing": 0}],
+                "row_count": 16,
+                "sample_rows": [["01/01/2023", "15200"], ["01/02/2023", "14850"]]
+            }
+        }
+        """
+        logger.info(f"---- Loading dataset {filename} for presentation {presentation_filename}")
+        try:
+            dataset_store = session_manager.get_dataset_store(presentation_filename)
+            file_path = file_store.resolve(filename)
+            if not file_path:
+                return {
+                    "status": "failure",
+                    "message": f"File not found: {filename}"
+                }
+            dataset_id = session_manager.load_dataset(presentation_filename, file_path)
+            return {
+                "status": "success",
+                "dataset_id": dataset_id,
+                "schema": dataset_store.get(dataset_id)["schema"]
+            }
+        except KeyError:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        except OSError as e:
+            # the stored object has gone, e.g. it was swept after the file store's TTL
+            logger.error(f"---- Unable to read dataset {filename}: {e}")
+            return {
+                "status": "failure",
+                "message": f"File not found: {filename}"
+            }
+        except DataFileIngestionException as e:
+            logger.error(f"---- Unable to load dataset {filename}: {e}")
+            return {
+                "status": "failure",
+                "message": f"Unable to load dataset {filename}: {e}"
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while loading dataset {filename}: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+
+    @pp_app.tool()
+    def query_uploaded_dataset(
+            presentation_filename: str,
+            dataset_id: str,
+            columns: list[str] = None,
+            filters: list[dict] = None,
+            group_by: str = None,
+            aggregation: str = "sum",
+            output_format: str = "table_data",
+            limit: int = None
+    ) -> dict:
+        """
+        Runs a query against a dataset previously loaded with load_dataset and returns the result as table_data or chart_data.
+        The query runs against the cached columnar data, so repeated queries against the same upload do not re-read the file.
+
+        :param presentation_filename: The filename of the presentation.
+        :param dataset_id: The dataset_id returned by load_dataset.
+        :param columns: Optional. The columns to return. Defaults to all columns. When grouping, these are the numeric columns to aggregate.
+        :param filters: Optional. A list of row filters which must all match, e.g. [{"column": "Region", "op": "eq", "value": "North"}].
+        Supported operators: eq, ne, gt, gte, lt, lte, in (value is a list), contains (case-insensitive substring).
+        :param group_by: Optional. A column to group rows by. Each selected numeric column is aggregated per group.
+        :param aggregation: Optional. One of sum, mean, count, min, max. Used with group_by. Defaults to sum.
+        :param output_format: Optional. "table_data" (for add_table_to_slide) or "chart_data" (for add_chart_to_slide).
+        With chart_data the first column becomes the categories and the remaining columns the series.
+        :param limit: Optional. The maximum number of rows to return.
+        :return: a dictionary indicating the success or failure of the tool. If successful, the data is included under the output_format key.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "chart_data": {
+                "categories": ["North", "South"],
+                "series": [{"name": "Revenue", "values": [31500, 14850]}]
+            }
+        }
+        """
+        logger.info(f"---- Querying dataset {dataset_id} for presentation {presentation_filename}")
+        try:
+            dataset_store = session_manager.get_dataset_store(presentation_filename)
+            if dataset_id not in dataset_store:
+                return {
+                    "status": "failure",
+                    "message": f"Dataset {dataset_id} has not been loaded. Call load_dataset first."
+                }
+            dataset = dataset_store.get(dataset_id)
+            table_data = query_dataset(
+                dataset["columns"],
+                select=columns,
+                filters=filters,
+                group_by=group_by,
+                aggregation=aggregation,
+                limit=limit,
+            )
+            if output_format == "chart_data":
+                return {
+                    "status": "success",
+                    "chart_data": table_data_to_chart_data(table_data)
+                }
+            return {
+                "status": "success",
+                "table_data": table_data
+            }
+        except KeyError:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        except DatasetQueryException as e:
+            logger.error(f"---- Unable to query dataset {dataset_id}: {e}")
+            return {
+                "status": "failure",
+                "message": f"Unable to query dataset {dataset_id}: {e}"
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while querying dataset {dataset_id}: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+
+    @pp_app.tool()
+    def summarise_data(
+            presentation_filename: str,
+            dataset_id: str = None,
+            chart_data: dict = None,
+            category_column: str = None,
+            value_columns: list[str] = None,
+            aggregation: str = "sum",
+            filters: list[dict] = None
+    ) -> dict:
+        """
+        Computes summary statistics server side so that you do not have to do any arithmetic yourself.
+        Use the returned facts when writing a summary or analysis of chart or table data.
+
+        Works on EITHER a dataset loaded with load_dataset OR a chart_data dictionary:
+        - With dataset_id, rows are grouped by category_column and each of the value_columns is aggregated per group
+          with the given aggregation. The grouped result is returned as chart_data, ready for chart_handler and add_chart_to_slide.
+        - With chart_data, the summary is computed for each series of the chart_data provided.
+
+        For every series the summary includes: count, total, mean, min and max (with their categories),
+        the overall change from the first to the last category, the largest period-over-period increase and decrease,
+        the period-over-period percentage changes and the trend direction.
+
+        :param presentation_filename: The filename of the presentation.
+        :param dataset_id: Optional. The dataset_id returned by load_dataset.
+        :param chart_data: Optional. A chart_data dictionary with "categories" and "series" keys.
+        :param category_column: Required with dataset_id. The column to group rows by, e.g. "Date" or "Region".
+        :param value_columns: Optional with dataset_id. The numeric columns to aggregate. Defaults to every numeric column.
+        :param aggregation: Optional. One of sum, mean, count, min, max. Defaults to sum.
+        :param filters: Optional with dataset_id. Row filters, as for query_uploaded_dataset.
+        :return: a dictionary indicating the success or failure of the tool. If successful, the chart_data and summary are included.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "chart_data": {"categories": ["Jan", "Feb", "Mar"], "series": [{"name": "Revenue", "values": [15200, 14850, 16300]}]},
+            "summary": {
+                "Revenue": {
+                    "count": 3, "total": 46350, "mean": 15450,
+                    "min": {"category": "Feb", "value": 14850}, "max": {"category": "Mar", "value": 16300},
+                    "change": {"from": "Jan", "to": "Mar", "value": 1100, "pct": 7.24},
+                    "largest_increase": {"to": "Mar", "value": 1450, "pct": 9.76},
+                    "largest_decrease": {"to": "Feb", "value": -350, "pct": -2.3},
+                    "period_over_period_pct": [-2.3, 9.76],
+                    "trend": {"direction": "increasing", "slope_per_period": 550}
+                }
+            }
+        }
+        """
+        logger.info(f"---- Summarising data for presentation {presentation_filename}")
+        try:
+            if dataset_id:
+                if not category_column:
+                    return {
+                        "status": "failure",
+                        "message": "category_column must be provided when summarising a dataset."
+                    }
+                dataset_store = session_manager.get_dataset_store(presentation_filename)
+                if dataset_id not in dataset_store:
+                    return {
+                        "status": "failure",
+                        "message": f"Dataset {dataset_id} has not been loaded. Call load_dataset first."
+                    }
+                dataset = dataset_store.get(dataset_id)
+                if not value_columns:
+                    value_columns = [
+                        column["name"] for column in dataset["schema"]["columns"]
+                        if column["type"] in ("integer", "float") and column["name"] != category_column
+                    ]
+                table_data = query_dataset(
+                    dataset["columns"],
+                    select=[category_column] + list(value_columns),
+                    filters=filters,
+                    group_by=category_column,
+                    aggregation=aggregation,
+                )
+                chart_data = table_data_to_chart_data(table_data)
+            elif chart_data:
+                validated, message = validate_chart_data(chart_data)
+                if not validated:
+                    return {
+                        "status": "failure",
+                        "message": f"Unable to summarise chart_data: {message}"
+                    }
+            else:
+                return {
+                    "status": "failure",
+                    "message": "Either dataset_id or chart_data must be provided."
+                }
+
+            return {
+                "status": "success",
+                "chart_data": chart_data,
+                "summary": summarise_chart_data(chart_data)
+            }
+        except KeyError:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        except DatasetQueryException as e:
+            logger.error(f"---- Unable to summarise dataset {dataset_id}: {e}")
+            return {
+                "status": "failure",
+                "message": f"Unable to summarise dataset {dataset_id}: {e}"
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while summarising data: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
@@ -0,0 +1,129 @@
+from mcp.server import FastMCP
+import logging
+from SessionManager import SessionManager
+
+
+logger = logging.getLogger(__name__)
+
+def register_history_tools(
+        pp_app: FastMCP,
+        session_manager: SessionManager
+):
+    def step_through_history(presentation_filename: str, steps: int, redo: bool) -> dict:
+        action = "redo" if redo else "undo"
+        logger.info(f"---- Attempting to {action} {steps} changes to {presentation_filename}")
+        if presentation_filename not in session_manager.active_sessions:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        if steps < 1:
+            return {
+                "status": "failure",
+                "message": "steps must be 1 or more."
+            }
+
+        reverted = []
+        try:
+            for _ in range(steps):
+                label = session_manager.undo(presentation_filename, redo=redo)
+                if label is None:
+                    break
+                reverted.append(label)
+        except Exception as e:
+            logger.error(f"---- Unable to {action} changes: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+
+        if not reverted:
+            return {
+                "status": "failure",
+                "message": f"There are no changes to {action}."
+            }
+        history = session_manager.get_history(presentation_filename)
+        logger.info(f"---- {action} of {reverted} on {presentation_filename} complete")
+        return {
+            "status": "success",
+            "message": f"Successfully {'redid' if redo else 'undid'} {len(reverted)} changes made by: {', '.join(reverted)}. "
+                       f"Remember to save the presentation with the save_presentation tool.",
+            "changes_to_undo": history.undo_depth,
+            "changes_to_redo": history.redo_depth
+        }
+
+    @pp_app.tool()
+    @session_manager.mutating_tool(record_history=False)
+    def undo(
+            presentation_filename: str,
+            steps: int = 1,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Reverts the most recent changes made to the presentation by other tools, e.g. content added to the wrong slide,
+        or a slide added or deleted by mistake. Use this instead of deleting and rebuilding slides.
+
+        The last 20 changes can be undone. Undone changes can be made again with the redo tool, until another change is made.
+
+        This only modifies the presentation in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation.
+        :param steps: Optional. The number of changes to undo, most recent first. Defaults to 1.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully undid 1 changes made by: add_text_to_slide. Remember to save the presentation with the save_presentation tool.",
+            "changes_to_undo": 3,
+            "changes_to_redo": 1,
+            "version": 12
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "There are no changes to undo."
+        }
+        """
+        return step_through_history(presentation_filename, steps, redo=False)
+
+    @pp_app.tool()
+    @session_manager.mutating_tool(record_history=False)
+    def redo(
+            presentation_filename: str,
+            steps: int = 1,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Makes changes reverted by the undo tool again, most recently undone first.
+        Changes can only be redone until another change is made to the presentation.
+
+        This only modifies the presentation in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation.
+        :param steps: Optional. The number of changes to redo. Defaults to 1.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully redid 1 changes made by: add_text_to_slide. Remember to save the presentation with the save_presentation tool.",
+            "changes_to_undo": 4,
+            "changes_to_redo": 0,
+            "version": 13
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "There are no changes to redo."
+        }
+        """
+        return step_through_history(presentation_filename, steps, redo=True)
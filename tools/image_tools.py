@@ -0,0 +1,199 @@
+from mcp.server import FastMCP
+import hashlib
+import logging
+
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.shapes.picture import CT_Picture
+from pptx.parts.image import Image, ImagePart
+from pptx.shapes.placeholder import PlaceholderPicture
+from SessionManager import SessionManager
+from stores.FileStore import shared_file_store
+from stores.ImageDerivativeStore import ImageDerivativeStore
+from utils.clean_slide_name import clean_slide_name
+from utils.fit_image import target_pixel_size
+from errors.ImageProcessingException import ImageProcessingException
+
+logger = logging.getLogger(__name__)
+
+FILE_STORAGE_DIRECTORY = "file_storage"
+IMAGE_PLACEHOLDER_TYPES = (PP_PLACEHOLDER.PICTURE, PP_PLACEHOLDER.OBJECT, PP_PLACEHOLDER.BODY)
+
+
+def find_image_placeholder(slide):
+    """
+    Returns the first empty placeholder an image can go into. Picture placeholders are preferred, otherwise an
+    empty content or body placeholder is used.
+    """
+    candidates = []
+    for shape in slide.placeholders:
+        placeholder_type = shape.placeholder_format.type
+        if placeholder_type not in IMAGE_PLACEHOLDER_TYPES:
+            continue
+        if placeholder_type != PP_PLACEHOLDER.PICTURE and shape.has_text_frame and shape.text_frame.text.strip():
+            continue
+        if isinstance(shape, PlaceholderPicture) or getattr(shape, 'has_chart', False) or getattr(shape, 'has_table', False):
+            continue
+        candidates.append(shape)
+    candidates.sort(key=lambda shape: shape.placeholder_format.type != PP_PLACEHOLDER.PICTURE)
+    return candidates[0] if candidates else None
+
+
+def get_or_add_shared_image_part(slide, data: bytes, image_parts: dict) -> tuple[ImagePart, str]:
+    """
+    Relates the slide to an image part containing data and returns the (image_part, rId) pair.
+
+    python-pptx finds a repeated image by hashing every image part in the package on each insert. Image parts
+    created here are remembered per session by the SHA1 of their content, so repeated images are matched
+    without rehashing the deck. New parts are built around the cached derivative bytes themselves, so decks
+    placing the same derivative share one copy of it in memory.
+    """
+    slide_part = slide.part
+    package = slide_part.package
+    sha1 = hashlib.sha1(data).hexdigest()
+    image_part = image_parts.get(sha1)
+    if image_part is None or image_part.package is not package:
+        image_part = package._image_parts._find_by_sha1(sha1) or ImagePart.new(package, Image.from_blob(data))
+        image_parts[sha1] = image_part
+    rId = slide_part.relate_to(image_part, RT.IMAGE)
+    return image_part, rId
+
+
+def register_image_tools(
+        pp_app: FastMCP,
+        session_manager: SessionManager
+):
+    # shared by every session so an image placed in several decks is only resized once
+    derivative_store = ImageDerivativeStore()
+    file_store = shared_file_store(FILE_STORAGE_DIRECTORY)
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def add_image_to_slide(
+            presentation_filename: str,
+            filename: str,
+            image_description: str = None,
+            slide_name: str = None,
+            slide_index: int = None,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        IMPORTANT - only use the slide_name or slide_index provided to find the slide. DO NOT USE the get_presentation_summary tool
+
+        This tool finds a slide by its index or name and places an uploaded JPEG or PNG image in the first empty picture placeholder,
+        or if the slide has none, in the first empty content placeholder.
+
+        The image is resized and recompressed to the size of the placeholder before it is added, so large photos do not bloat the presentation.
+        In a picture placeholder the image fills the placeholder and is cropped to its shape. In a content placeholder the whole image is shown,
+        centred in the placeholder. Adding the same image more than once only stores it once in the presentation.
+
+        This only modifies the slide in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation.
+        :param filename: The filename of the image returned by the handle_files_tool.
+        :param image_description: Optional. A short description of the image, used as its alternative text for screen readers.
+        :param slide_name: Optional. The name of the slide to add the image to, E.G 'title' or 'main'
+        :param slide_index: Optional. The index of the slide to add the image to (0-based).
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully added image to slide results, index: 2. Remember to save."
+        }
+        """
+        logger.info(f"---- Attempting to add image {filename} to slide name: {slide_name}, index: {slide_index}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+        except KeyError:
+            presentation = None
+        if not presentation:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+
+        slide_to_edit = None
+        if slide_name:
+            cleaned_name = clean_slide_name(slide_name)
+            for named_slide in presentation.slides:
+                if named_slide.name == cleaned_name:
+                    slide_to_edit = named_slide
+                    break
+        elif slide_index is not None:
+            if slide_index >= len(presentation.slides):
+                return {
+                    "status": "failure",
+                    "message": f"Error: Invalid slide index. The presentation only has {len(presentation.slides)} slides."
+                }
+            slide_to_edit = presentation.slides[slide_index]
+        if not slide_to_edit:
+            return {
+                "status": "failure",
+                "message": "Error: Unable to find slide to add image to."
+            }
+
+        placeholder = find_image_placeholder(slide_to_edit)
+        if not placeholder:
+            return {
+                "status": "failure",
+                "message": "Error: No empty picture or content placeholder was found on the slide. Please add another slide with an Image layout."
+            }
+
+        file_path = file_store.resolve(filename)
+        if not file_path:
+            return {
+                "status": "failure",
+                "message": f"File not found: {filename}"
+            }
+
+        is_picture_placeholder = placeholder.placeholder_format.type == PP_PLACEHOLDER.PICTURE
+        fit_mode = "cover" if is_picture_placeholder else "contain"
+        box_width, box_height = placeholder.width, placeholder.height
+        try:
+            with open(file_path, "rb") as f:
+                source_data = f.read()
+        except OSError as e:
+            # the stored object has gone, e.g. it was swept after the file store's TTL
+            logger.error(f"---- Unable to read image {filename}: {e}")
+            return {
+                "status": "failure",
+                "message": f"File not found: {filename}"
+            }
+        try:
+            data, _ = derivative_store.get(source_data, *target_pixel_size(box_width, box_height), fit_mode)
+        except ImageProcessingException as e:
+            logger.error(f"---- Unable to process image {filename}: {e}")
+            return {
+                "status": "failure",
+                "message": f"Unable to process image {filename}: {e}"
+            }
+
+        image_part, rId = get_or_add_shared_image_part(slide_to_edit, data, session_manager.get_image_parts(presentation_filename))
+        description = image_description or image_part.desc
+        if is_picture_placeholder:
+            # same as PicturePlaceholder.insert_picture, but with the shared image part
+            pic = CT_Picture.new_ph_pic(placeholder.shape_id, placeholder.name, description, rId)
+            pic.crop_to_fit(image_part._px_size, (box_width, box_height))
+            placeholder._replace_placeholder_with(pic)
+            PlaceholderPicture(pic, placeholder._parent)
+        else:
+            # the whole image is shown at the largest size that fits the placeholder, keeping its aspect ratio
+            image_width, image_height = image_part._px_size
+            scale = min(box_width / image_width, box_height / image_height)
+            width, height = int(image_width * scale), int(image_height * scale)
+            left = placeholder.left + (box_width - width) // 2
+            top = placeholder.top + (box_height - height) // 2
+            pic = slide_to_edit.shapes._add_pic_from_image_part(image_part, rId, left, top, width, height)
+            pic.nvPicPr.cNvPr.descr = description
+            placeholder._element.getparent().remove(placeholder._element)
+
+        session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
+        logger.info(f"---- Added image {filename} to slide {slide_to_edit.name}")
+        return {
+            "status": "success",
+            "message": f"Successfully added image to slide {slide_to_edit.name}, index: {presentation.slides.index(slide_to_edit)}. Remember to save."
+        }
@@ -0,0 +1,205 @@
+from mcp.server import FastMCP
+import logging
+from SessionManager import SessionManager
+from utils.import_slides import SlideImporter
+from utils.remove_slide import remove_slide
+
+
+logger = logging.getLogger(__name__)
+
+# how long to wait for another tool to finish with a source presentation before giving up
+SOURCE_LOCK_TIMEOUT_SECONDS = 30
+
+
+def register_import_tools(
+        pp_app: FastMCP,
+        session_manager: SessionManager
+):
+    def import_from(importer: SlideImporter, source_filename: str, user_slide_numbers: list[int] = None, source_version: int = None) -> tuple[int, int]:
+        """
+        Appends slides of a source presentation to the presentation and returns the number imported and the version of
+        the source they were copied from. Raises ValueError if they cannot be, or if source_version is given and the
+        source is no longer at that version.
+        """
+        if not session_manager.open_session(source_filename):
+            raise ValueError(f"Presentation {source_filename} was not found.")
+        source_lock = session_manager.session_lock(source_filename)
+        if not source_lock.acquire(timeout=SOURCE_LOCK_TIMEOUT_SECONDS):
+            raise ValueError(f"Presentation {source_filename} is busy. Please try again.")
+        try:
+            source = session_manager.get_presentation(source_filename)
+            version = session_manager.get_version(source_filename)
+            if source_version is not None and source_version != version:
+                raise ValueError(f"Presentation {source_filename} has changed since the slides were copied from version {source_version}, it is at version {version}.")
+            total_source_slides = len(source.slides)
+            if user_slide_numbers:
+                invalid = [number for number in user_slide_numbers if not 1 <= number <= total_source_slides]
+                if invalid:
+                    raise ValueError(f"Invalid slide numbers {invalid}. {source_filename} has {total_source_slides} slides.")
+                slide_indexes = [number - 1 for number in user_slide_numbers]
+            else:
+                slide_indexes = list(range(total_source_slides))
+            importer.import_slides(source, slide_indexes)
+            return len(slide_indexes), version
+        finally:
+            source_lock.release()
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def import_slides(
+            presentation_filename: str,
+            source_filename: str,
+            user_slide_numbers: list[int] = None,
+            insert_at_slide_number: int = None,
+            source_versions: dict[str, int] = None,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Copies slides from another presentation into this presentation, with their charts, tables, images and notes.
+        The source presentation is not changed. Copied slides use this presentation's slide layout with the same name.
+
+        This only modifies the presentation in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation to copy the slides into.
+        :param source_filename: The filename of the presentation to copy the slides from.
+        :param user_slide_numbers: Optional. The slide numbers (1-indexed) of the slides to copy, in the order they should be added. Defaults to every slide.
+        :param insert_at_slide_number: Optional. The slide number (1-indexed) the first copied slide should have. Defaults to adding the slides at the end.
+        :param source_versions: Optional. Leave unset. The version of the source presentation to copy from, recorded so a replayed change copies the same slides.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully copied 3 slides from section_two-123456.pptx as slides 5 to 7. Remember to save the presentation with the save_presentation tool.",
+            "version": 14
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "Invalid slide numbers [9]. section_two-123456.pptx has 8 slides."
+        }
+        """
+        logger.info(f"---- Attempting to import slides {user_slide_numbers} from {source_filename} into {presentation_filename}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+        except KeyError:
+            presentation = None
+        if not presentation:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        total_slides = len(presentation.slides)
+        if insert_at_slide_number is not None and not 1 <= insert_at_slide_number <= total_slides + 1:
+            return {
+                "status": "failure",
+                "message": f"Invalid insert_at_slide_number. The presentation has {total_slides} slides."
+            }
+
+        importer = SlideImporter(presentation, session_manager.get_image_parts(presentation_filename))
+        try:
+            imported, source_version = import_from(importer, source_filename, user_slide_numbers, (source_versions or {}).get(source_filename))
+        except ValueError as e:
+            return {
+                "status": "failure",
+                "message": str(e)
+            }
+
+        first_index = total_slides
+        if insert_at_slide_number is not None and insert_at_slide_number - 1 < total_slides:
+            # slides are imported at the end and then moved into place
+            first_index = insert_at_slide_number - 1
+            slide_id_list = presentation.slides._sldIdLst
+            slide_ids = list(slide_id_list)
+            for offset, slide_id in enumerate(slide_ids[total_slides:]):
+                slide_id_list.remove(slide_id)
+                slide_id_list.insert(first_index + offset, slide_id)
+        session_manager.mark_structure_changed(presentation_filename, first_index)
+
+        logger.info(f"---- Imported {imported} slides from {source_filename} into {presentation_filename}")
+        return {
+            "status": "success",
+            "message": f"Successfully copied {imported} slides from {source_filename} as slides {first_index + 1} to {first_index + imported}. "
+                       f"Remember to save the presentation with the save_presentation tool.",
+            # the source may change later, so the change is journaled with the version it was copied from
+            "journal_arguments": {"source_versions": {source_filename: source_version}}
+        }
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def merge_presentations(
+            presentation_filename: str,
+            source_filenames: list[str],
+            source_versions: dict[str, int] = None,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Adds every slide of one or more other presentations to the end of this presentation, in the order the presentations
+        are listed, e.g. to assemble a final presentation from sections built separately. Slides keep their charts, tables,
+        images and notes. Images used in several presentations are only stored once. The source presentations are not changed.
+
+        This only modifies the presentation in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation to add the slides to.
+        :param source_filenames: The filenames of the presentations to add the slides of, in order.
+        :param source_versions: Optional. Leave unset. The versions of the source presentations to copy from, recorded so a replayed change copies the same slides.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully added 42 slides from 3 presentations. The presentation now has 45 slides. Remember to save the presentation with the save_presentation tool.",
+            "version": 15
+        }
+        """
+        logger.info(f"---- Attempting to merge {source_filenames} into {presentation_filename}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+        except KeyError:
+            presentation = None
+        if not presentation:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        missing = [filename for filename in source_filenames if not session_manager.open_session(filename)]
+        if missing:
+            return {
+                "status": "failure",
+                "message": f"Presentations not found: {', '.join(missing)}. No slides were added."
+            }
+
+        total_slides = len(presentation.slides)
+        importer = SlideImporter(presentation, session_manager.get_image_parts(presentation_filename))
+        imported = 0
+        copied_versions = {}
+        try:
+            for source_filename in source_filenames:
+                count, copied_versions[source_filename] = import_from(importer, source_filename, source_version=(source_versions or {}).get(source_filename))
+                imported += count
+        except Exception as e:
+            # failed tools make no changes, so slides added from earlier presentations are removed again
+            logger.error(f"---- Merge stopped: {e}")
+            for slide_index in reversed(range(total_slides, len(presentation.slides))):
+                remove_slide(presentation, slide_index)
+            message = str(e) if isinstance(e, ValueError) else f"Unable to merge the presentations: {e}."
+            return {
+                "status": "failure",
+                "message": f"{message} No slides were added."
+            }
+        session_manager.mark_structure_changed(presentation_filename, total_slides)
+
+        logger.info(f"---- Merged {imported} slides into {presentation_filename}")
+        return {
+            "status": "success",
+            "message": f"Successfully added {imported} slides from {len(source_filenames)} presentations. "
+                       f"The presentation now has {len(presentation.slides)} slides. Remember to save the presentation with the save_presentation tool.",
+            "journal_arguments": {"source_versions": copied_versions}
+        }
@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 import dotenv
 from datetime import datetime
@@ -7,9 +8,17 @@ from mcp.server import FastMCP
 from SessionManager import SessionManager
 from utils.presentations.create_new_presentation_from_template import create_new_presentation_from_template
 from utils.presentations.save_presentation_to_presentations_directory import save_presentation_to_directory
+from utils.remove_slide import remove_slide
+from utils.compact_presentation import compact_presentation
+from utils.update_footers import footer_text
+from utils.clean_slide_name import clean_slide_name
+from utils.export_outline import iter_outline, outline_to_markdown
 
 logger = logging.getLogger(__name__)
 
+# characters of outline export_outline returns by default, about 5000 tokens
+DEFAULT_OUTLINE_CHARACTERS = 20000
+
 def register_presentation_tools(
         pp_app: FastMCP,
         session_manager: SessionManager
@@ -28,7 +37,9 @@ def register_presentation_tools(
         try:
             prs = create_new_presentation_from_template()
             logger.info(f"Setting '{presentation_filename}' as presentation on session manager at id:")
-            session_manager.active_sessions[presentation_filename] = {}
+            # a recreated presentation carries on from the previous version so earlier versions are never matched again
+            previous_version = session_manager.get_version(presentation_filename) if presentation_filename in session_manager.active_sessions else 0
+            session_manager.active_sessions[presentation_filename] = {'version': previous_version + 1}
             session_manager.active_sessions[presentation_filename]['presentation'] = prs
             # set name on title slide and add title to slide
             slides = prs.slides
@@ -37,6 +48,7 @@ def register_presentation_tools(
             title = presentation_filename.split("-")[0]
             add_content_to_title_slide(title_slide, title)
             save_presentation_to_directory(prs, f"{presentation_filename}")
+            session_manager.checkpoint(presentation_filename)
             return {
                 "status": "success"
             }
@@ -66,12 +78,120 @@ def register_presentation_tools(
                 return "Error: Failed to save presentation. Details: Presentation not found for session."
             
             logger.info(f"---- Saving presentation to presentations directory as: {presentation_filename}")
-            save_presentation_to_directory(presentation, presentation_filename)
+            # held so no change is made between saving and starting the journal again
+            with session_manager.session_lock(presentation_filename):
+                # stop parts which are no longer used by any slide from being written with the presentation
+                compact_presentation(presentation)
+                session_manager.saving(presentation_filename)
+                save_presentation_to_directory(presentation, presentation_filename)
+                session_manager.checkpoint(presentation_filename)
             return f"Successfully saved presentation to presentations directory as {presentation_filename}"
         except Exception as e:
             logger.error(f"---- Failed to save presentation: {e}")
             return f"Error: Failed to save presentation. Details: {e}"
 
+    @pp_app.tool()
+    def open_presentation(presentation_filename: str) -> dict:
+        """
+        Opens a presentation saved in the presentations directory so work on it can carry on, e.g. in a new session or
+        after the server has restarted. Changes which were made but not saved before a restart are restored.
+
+        You do not need to call this tool for the presentation you have been editing in this session.
+
+        :param presentation_filename: The full filename of the saved presentation, e.g. quarterly_review-123456.pptx
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Opened presentation quarterly_review-123456.pptx with 12 slides.",
+            "total_num_slides": 12,
+            "version": 0
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "No saved presentation named quarterly_review.pptx was found."
+        }
+        """
+        logger.info(f"---- Opening presentation {presentation_filename}")
+        if not session_manager.open_session(presentation_filename):
+            return {
+                "status": "failure",
+                "message": f"No saved presentation named {presentation_filename} was found."
+            }
+        total_num_slides = len(session_manager.get_presentation(presentation_filename).slides)
+        return {
+            "status": "success",
+            "message": f"Opened presentation {presentation_filename} with {total_num_slides} slides.",
+            "total_num_slides": total_num_slides,
+            "version": session_manager.get_version(presentation_filename)
+        }
+
+    @pp_app.tool()
+    def fork_presentation(presentation_filename: str, variant_name: str) -> dict:
+        """
+        Creates a variant of the presentation as a new presentation, e.g. a version for another client or with different wording.
+        The variant starts as an exact copy and can then be changed without changing the original, and the original can be
+        changed without changing the variant. Creating a variant takes little memory however large the presentation is.
+
+        The variant is saved to the presentations directory when it is created. Call 'save_presentation' with the
+        variant's filename to save the changes you make to it.
+
+        :param presentation_filename: The filename of the presentation to create a variant of.
+        :param variant_name: A short name for the variant, e.g. "acme" or "short version". It is added to the filename of the variant.
+        :return: a dictionary indicating the success or failure of the tool. If successful, the filename of the variant is included.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Created variant quarterly_review-123456-acme.pptx of quarterly_review-123456.pptx. Remember to save changes to the variant with the save_presentation tool.",
+            "variant_filename": "quarterly_review-123456-acme.pptx",
+            "version": 0
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "A presentation named quarterly_review-123456-acme.pptx already exists. Choose another variant_name."
+        }
+        """
+        logger.info(f"---- Forking presentation {presentation_filename} as variant {variant_name}")
+        if not session_manager.open_session(presentation_filename):
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        stem = presentation_filename[:-len(".pptx")] if presentation_filename.endswith(".pptx") else presentation_filename
+        variant_filename = f"{stem}-{clean_slide_name(variant_name)}.pptx"
+        if session_manager.open_session(variant_filename):
+            return {
+                "status": "failure",
+                "message": f"A presentation named {variant_filename} already exists. Choose another variant_name."
+            }
+        try:
+            with session_manager.session_lock(variant_filename):
+                session_manager.fork_session(presentation_filename, variant_filename)
+                # the variant is written straight away, so the journal of changes made to it has a saved presentation
+                # to be replayed on top of after a restart
+                save_presentation_to_directory(session_manager.get_presentation(variant_filename), variant_filename)
+                session_manager.checkpoint(variant_filename)
+        except Exception as e:
+            logger.error(f"---- Failed to fork presentation: {e}")
+            session_manager.active_sessions.pop(variant_filename, None)
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+        return {
+            "status": "success",
+            "message": f"Created variant {variant_filename} of {presentation_filename}. "
+                       f"Remember to save changes to the variant with the save_presentation tool.",
+            "variant_filename": variant_filename,
+            "version": session_manager.get_version(variant_filename)
+        }
+
     def add_content_to_title_slide(
             title_slide,
             title: str,
@@ -86,11 +206,14 @@ def register_presentation_tools(
                     title_placeholder.text_frame.text = title
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_title_slide_to_presentation(
             presentation_filename: str,
             title: str,
             sub_title: str = "",
-            slide_layout: str = None
+            slide_layout: str = None,
+            expected_version: int = None,
+            idempotency_key: str = None
     ) -> dict:
         """
         Adds or updates a Title Slide at the 0th index of the presentation.
@@ -105,6 +228,8 @@ def register_presentation_tools(
         :param title: The title for the presentation. This MUST be provided.
         :param sub_title: Optional. The subtitle for the presentation.
         :param slide_layout: Optional. The user-friendly name of the title slide layout to use (e.g., "Title Slide - Black").
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
         :return: A dictionary indicating the success or failure of the tool.
 
         Example of Successful Return Dictionary when title slide already exists:
@@ -141,11 +266,15 @@ def register_presentation_tools(
                 new_title_slide = prs.slides.add_slide(new_layout)
                 add_content_to_title_slide(new_title_slide, title, sub_title)
 
-                # 2. Delete the current slide at 0th index
-                xml_slides = prs.slides._sldIdLst
-                slides = list(xml_slides)
-                xml_slides.remove(slides[0])
+                # 2. Delete the current slide at 0th index, along with its relationship and parts
+                remove_slide(prs, 0)
 
+                # 3. Move the new title slide to the 0th index
+                xml_slides = prs.slides._sldIdLst
+                new_slide_xml = list(xml_slides)[-1]
+                xml_slides.remove(new_slide_xml)
+                xml_slides.insert(0, new_slide_xml)
+                session_manager.mark_structure_changed(presentation_filename, 0)
 
                 return {
                     "status": "success",
@@ -155,7 +284,9 @@ def register_presentation_tools(
             # Scenario 2: A title slide exists, but no new layout is requested.
             elif layout_type.startswith('Jaywing Cover'):
                 # Just overwrite its content
+                session_manager.snapshot_slide(presentation_filename, zero_index_slide)
                 add_content_to_title_slide(zero_index_slide, title, sub_title)
+                session_manager.mark_slide_changed(presentation_filename, zero_index_slide)
                 return {
                     "status": "success",
                     "title_slide_exists": "True",
@@ -175,7 +306,8 @@ def register_presentation_tools(
                 new_slide_xml = slides[-1]
                 xml_slides.remove(new_slide_xml)
                 xml_slides.insert(0, new_slide_xml)
-                
+                session_manager.mark_structure_changed(presentation_filename, 0)
+
                 return {
                     "status": "success",
                     "title_slide_exists": "False",
@@ -203,11 +335,14 @@ def register_presentation_tools(
 
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_thank_you_slide_to_presentation(
             presentation_filename: str,
             name: str,
             job_role: str = "",
             email_address: str = "",
+            expected_version: int = None,
+            idempotency_key: str = None
     ) -> dict:
         """
         Adds a Thank You Slide to the end of the working presentation with name, job role and email address.
@@ -219,6 +354,8 @@ def register_presentation_tools(
         :param name: String. The name of the author of the presentation.
         :param job_role: String. Optional. The job_role of the author of the presentation.
         :param email_address: String. Optional. The email address of the author of the presentation.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         :return: a dictionary indicating the success or failure of the tool.
 
@@ -239,7 +376,9 @@ def register_presentation_tools(
             slides = prs.slides
             # Check if last slide is thankyou slide
             if slides[-1].slide_layout.name == '4_Jaywing Thank you Slide':
+                session_manager.snapshot_slide(presentation_filename, slides[-1])
                 add_content_to_thank_you_slide(slides[-1], name, job_role, email_address)
+                session_manager.mark_slide_changed(presentation_filename, slides[-1])
                 return {
                     "status": "success",
                     "message": f"Successfully added name: {name}, job role: {job_role} and email address: {email_address} to placeholders on the Thank You slide.",
@@ -252,6 +391,7 @@ def register_presentation_tools(
             if thank_you_slide:
                 slide = prs.slides.add_slide(thank_you_slide)
                 add_content_to_thank_you_slide(slide, name, job_role, email_address)
+                session_manager.mark_structure_changed(presentation_filename, len(slides) - 1)
                 return {
                     "status": "success",
                     "message": f"Successfully added new Thank You Slide and added name: {name}, job role: {job_role} and email address: {email_address} to placeholders.",
@@ -267,19 +407,26 @@ def register_presentation_tools(
                     "message": f"Unable to add Thank You slide to presentation: {e}"
                 }
 
+    @pp_app.tool()
+    @session_manager.mutating_tool
     def add_client_x_project_title_and_pagination_to_footers(
             presentation_filename: str,
             client_name: str = "",
-            project_title: str = ""
+            project_title: str = "",
+            expected_version: int = None,
+            idempotency_key: str = None
     ) -> dict:
         """
-        Adds client and project details to all available footers in the Presentation
+        Adds client and project details to all available footers in the Presentation, and slide numbers to every slide.
+        Slides added, removed or moved afterwards keep their footers and slide numbers up to date.
 
         This only modifies the slide in memory. Call 'save_presentation' to persist changes.
 
         :param presentation_filename: The filename of the presentation.
         :param client_name: String. The name of the client
         :param project_title: String. Optional. The project title
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         :return: a dictionary indicating the success or failure of the tool.
         """
@@ -290,21 +437,11 @@ def register_presentation_tools(
                     "status": "failure",
                     "message": "Presentation not found for the current session."
                 }
-            # get all slides
-            slides = prs.slides
-            # for all slides, get placeholders
-            for index, slide in enumerate(slides):
-                placeholders = slide.placeholders
-                #   find footer placeholders
-                for placeholder in placeholders:
-                    if placeholder.placeholder_format.type.name == 'FOOTER' and placeholder.text == "Client x Jaywing Project Title":
-                        if client_name and project_title:
-                            placeholder.text_frame.text = f'{client_name} x {project_title}'
-                        else:
-                            placeholder.text_frame.text = ""
-                    if placeholder.placeholder_format.type.name == 'SLIDE_NUMBER':
-                        slide_number = str(index + 1)
-                        placeholder.text = slide_number
+            # every slide's footer and slide number may change, so every slide is snapshotted for undo
+            for slide in prs.slides:
+                session_manager.snapshot_slide(presentation_filename, slide)
+            # the footer is stored on the session and kept up to date on new, removed and moved slides from now on
+            session_manager.set_footer(presentation_filename, footer_text(client_name, project_title))
             return {
                 "status": "success",
                 "message": "Successfully added Client Name x Jaywing Project Title and pagination to footers"
@@ -315,8 +452,6 @@ def register_presentation_tools(
                 "message": f"Unable to add Client Name x Jaywing Project Title and pagination to presentation: {e}"
             }
 
-
-
     @pp_app.tool()
     def get_slide_to_edit_from_user_slide_number(presentation_filename: str, user_slide_number: int) -> dict:
         """
@@ -348,7 +483,8 @@ def register_presentation_tools(
                     }
 
     @pp_app.tool()
-    def delete_slide(presentation_filename: str, user_slide_number: int) -> dict:
+    @session_manager.mutating_tool
+    def delete_slide(presentation_filename: str, user_slide_number: int, expected_version: int = None, idempotency_key: str = None) -> dict:
         """
         Deletes a slide at a given index from the presentation
         ONLY EVER use this tool when instructed to by the user
@@ -358,6 +494,8 @@ def register_presentation_tools(
 
         :param presentation_filename:
         :param user_slide_number:
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
         :return:
         """
         try:
@@ -375,11 +513,9 @@ def register_presentation_tools(
                     "message": f"Invalid slide index. The presentation has {len(presentation.slides)} slides."
                 }
 
-            # Get the internal list of slides
-            xml_slides = presentation.slides._sldIdLst
-            slides = list(xml_slides)
-
-            xml_slides.remove(slides[slide_index])
+            # removes the slide and drops its relationship so its parts are not kept or saved
+            remove_slide(presentation, slide_index)
+            session_manager.mark_structure_changed(presentation_filename, slide_index)
 
             return {
                 "status": "success",
@@ -393,35 +529,52 @@ def register_presentation_tools(
             }
 
     @pp_app.tool()
-    def show_presentation_summary(presentation_filename: str) -> dict:
+    def show_presentation_summary(presentation_filename: str, since_version: int = None, if_version: int = None) -> dict:
         """
         CRITICAL INSTRUCTION: NEVER call this tool unless you have EXPLICITLY been asked to by the user
         IMPORTANT: This information is ONLY useful to the user. You MUST NEVER call this tool unprompted.
 
         This tool returns a dictionary of summary information about the presentation currently being edited
         The presentation summary includes:
+         - the version of the presentation. The version increases every time the presentation is changed.
          - the total number of slides in the presentation
-         - the index number of the slide in the presentation. Slide numbers are 1-indexed
-         - the slide layout name of the slide in the presentation.
+         - for each slide: its index in the presentation (slide numbers are 1-indexed), its name and layout, its title,
+           a short excerpt of its text, whether it has a chart, table or image, and a hash of its content which changes when the slide changes.
 
+        If you have already received a summary, pass its version as since_version to receive only the slides which have
+        changed since then, the ids of any removed slides and, if slides were added, removed or moved, the new order of slide ids.
+
+        :param presentation_filename: The filename of the presentation.
+        :param since_version: Optional. The version of a summary you have already received.
+        :param if_version: Optional. The version of a summary you have already received. If the presentation has not changed since,
+        only {"status": "not_modified", "version": ...} is returned.
         :return: presentation_summary dictionary
 
          Example of Return dictionary
          {
-            "total_num_slides": 3,
-            "slide_information":
-            {
-                "slide_index": 1,
-                "slide_name": "title",
-            },
-            {
-                "slide_index": 2,
-                "slide_name": "summary",
-            },
-            {
-                "slide_index": 3,
-                "slide_name": "main_finding",
-            }
+            "version": 7,
+            "total_num_slides": 2,
+            "slide_information": [
+                {
+                    "slide_index": 1, "slide_id": 256, "slide_name": "title", "layout": "Jaywing Cover",
+                    "title": "Quarterly Review", "excerpt": "", "has_chart": false, "has_table": false, "has_image": false,
+                    "content_hash": "1f3870be274f6c49"
+                },
+                {
+                    "slide_index": 2, "slide_id": 257, "slide_name": "results", "layout": "Chart and Text Slide",
+                    "title": "Revenue", "excerpt": "Revenue grew in every region...", "has_chart": true, "has_table": false,
+                    "has_image": false, "content_hash": "5d41402abc4b2a76"
+                }
+            ]
+         }
+
+         Example of Return dictionary with since_version
+         {
+            "version": 9,
+            "since_version": 7,
+            "total_num_slides": 2,
+            "changed": [{"slide_index": 2, "slide_id": 257, "slide_name": "results", ...}],
+            "removed": []
          }
         """
         try:
@@ -432,18 +585,13 @@ def register_presentation_tools(
                     "status": "failure",
                     "message": "Presentation not found for the current session."
                 }
-            summary = {
-                "total_num_slides": len(presentation.slides),
-                "slide_information": []
-            }
-            slides = presentation.slides
-            for slide in slides:
-                slide_info = {
-                    "slide_index": presentation.slides.index(slide) + 1,
-                    "slide_name": slide.name,
-                }
-                summary["slide_information"].append(slide_info)
-            return summary
+            not_modified = session_manager.not_modified(presentation_filename, if_version)
+            if not_modified:
+                return not_modified
+            # the summary is maintained as tools change the presentation, so only changed slides are looked at here
+            return session_manager.get_summary(presentation_filename).summary(
+                presentation, session_manager.get_version(presentation_filename), since_version
+            )
         except Exception as e:
             logger.error(f"---- Failed to get presentation summary: {e}")
             return {
@@ -451,3 +599,108 @@ def register_presentation_tools(
                 "message": f"Failed to get presentation summary. Details: {e}"
             }
 
+    @pp_app.tool()
+    def export_outline(
+            presentation_filename: str,
+            output_format: str = "markdown",
+            from_slide_number: int = 1,
+            max_characters: int = DEFAULT_OUTLINE_CHARACTERS,
+            if_version: int = None
+    ) -> dict:
+        """
+        Returns the content of the presentation as a compact outline, to read an existing presentation without looking
+        at each slide. For each slide the outline has its title and the rest of its text, the first rows of each table
+        and, for each chart, its type and title and the number of points and range of values of each series.
+
+        The outline stops before it would exceed max_characters. If it does, "next_slide_number" is the first slide
+        which was left out: call this tool again with it as from_slide_number to read on.
+
+        :param presentation_filename: The filename of the presentation.
+        :param output_format: Optional. "markdown" (the default) or "json".
+        :param from_slide_number: Optional. The slide number (1-indexed) to start the outline from. Defaults to 1.
+        :param max_characters: Optional. The most characters of outline to return. Defaults to 20000.
+        :param if_version: Optional. The version of an outline you have already received. If the presentation has not changed since,
+        only {"status": "not_modified", "version": ...} is returned.
+        :return: a dictionary with the outline
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "version": 12,
+            "total_num_slides": 40,
+            "from_slide_number": 1,
+            "to_slide_number": 25,
+            "next_slide_number": 26,
+            "outline": "## 1. Quarterly Review\\n- Prepared for Acme\\n## 2. Revenue\\n- Revenue grew in every region\\n- Chart 'Chart 4' \\"Revenue by region\\" (COLUMN_CLUSTERED, 4 categories):\\n  - Q3: 4 points, 0.8 to 1.9\\n..."
+        }
+        "next_slide_number" is null when the outline reaches the last slide. With output_format "json", "outline" is a list
+        with a dictionary for each slide.
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "Invalid from_slide_number. The presentation has 40 slides."
+        }
+        """
+        logger.info(f"---- Exporting outline of {presentation_filename} from slide {from_slide_number}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+            if not presentation:
+                return {
+                    "status": "failure",
+                    "message": "Presentation not found for the current session."
+                }
+            if output_format not in ("markdown", "json"):
+                return {
+                    "status": "failure",
+                    "message": f"Invalid output_format '{output_format}'. Use 'markdown' or 'json'."
+                }
+            not_modified = session_manager.not_modified(presentation_filename, if_version)
+            if not_modified:
+                return not_modified
+
+            with session_manager.session_lock(presentation_filename):
+                version = session_manager.get_version(presentation_filename)
+                total_slides = len(presentation.slides)
+                if not 1 <= from_slide_number <= max(total_slides, 1):
+                    return {
+                        "status": "failure",
+                        "message": f"Invalid from_slide_number. The presentation has {total_slides} slides."
+                    }
+                summary = session_manager.get_summary(presentation_filename)
+                cache = session_manager.get_outline_cache(presentation_filename)
+                if len(cache) > 2 * total_slides:
+                    # drops the outlines of slides which have since changed or been removed
+                    for content_hash in set(cache) - summary.content_hashes():
+                        del cache[content_hash]
+                # slides are digested as the outline reaches them, so slides past max_characters are not read
+                digests = summary.iter_slide_information(presentation, version, from_slide_number - 1)
+
+                outline = []
+                characters = 0
+                next_slide_number = None
+                for slide_outline in iter_outline(presentation, digests, cache):
+                    chunk = outline_to_markdown(slide_outline) if output_format == "markdown" else slide_outline
+                    size = len(chunk) if output_format == "markdown" else len(json.dumps(chunk, default=str))
+                    # the first slide is always included, so a very long slide cannot stop the outline moving on
+                    if outline and characters + size > max_characters:
+                        next_slide_number = slide_outline["slide_index"]
+                        break
+                    outline.append(chunk)
+                    characters += size
+
+            return {
+                "status": "success",
+                "version": version,
+                "total_num_slides": total_slides,
+                "from_slide_number": from_slide_number,
+                "to_slide_number": from_slide_number + len(outline) - 1,
+                "next_slide_number": next_slide_number,
+                "outline": "".join(outline) if output_format == "markdown" else outline
+            }
+        except Exception as e:
+            logger.error(f"---- Failed to export outline: {e}")
+            return {
+                "status": "failure",
+                "message": f"Failed to export outline. Details: {e}"
+            }
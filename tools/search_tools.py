@@ -0,0 +1,228 @@
+from mcp.server import FastMCP
+import logging
+import re
+from SessionManager import SessionManager
+from stores.ContentIndex import iter_text_frames
+
+
+logger = logging.getLogger(__name__)
+
+# most matches search_presentation returns, so a common word does not return the whole presentation
+MAX_SEARCH_RESULTS = 50
+# most slide numbers listed in the find_and_replace message, beyond which only the number of slides is given
+MAX_LISTED_SLIDES = 20
+# text a regular expression is tried against to find patterns which match empty text, e.g. "x*" or "\b"
+EMPTY_MATCH_SAMPLES = ("", "Q3 revenue, up 12% (North).")
+
+
+def register_search_tools(
+        pp_app: FastMCP,
+        session_manager: SessionManager
+):
+    def compile_pattern(find_text: str, use_regex: bool, match_case: bool) -> tuple[re.Pattern, str | None]:
+        """
+        Returns the compiled pattern for find_text and the literal words a match must contain, which narrow the
+        search through the content index. Raises re.error for an invalid regular expression, or one which matches
+        empty text.
+        """
+        flags = 0 if match_case else re.IGNORECASE
+        if use_regex:
+            pattern = re.compile(find_text, flags)
+            if any(not match.group(0) for sample in EMPTY_MATCH_SAMPLES for match in pattern.finditer(sample)):
+                raise re.error("the pattern matches empty text, so it would match everywhere")
+            return pattern, None
+        # whole words only, so every word of find_text is also a word of the matching text and can be looked up
+        return re.compile(rf"(?<!\w){re.escape(find_text)}(?!\w)", flags), find_text
+
+    @pp_app.tool()
+    def search_presentation(
+            presentation_filename: str,
+            find_text: str,
+            use_regex: bool = False,
+            match_case: bool = False
+    ) -> dict:
+        """
+        Finds the slides which mention some text, e.g. "which slide mentions Q3 revenue?", without reading every slide.
+        Searches the text of text boxes and placeholders, table cells and chart titles.
+
+        :param presentation_filename: The filename of the presentation.
+        :param find_text: The text to find. Plain text is matched as whole words, e.g. "rev" does not match "revenue".
+        :param use_regex: Optional. Whether find_text is a Python regular expression rather than plain text. Defaults to False.
+        :param match_case: Optional. Whether upper and lower case must match. Defaults to False.
+        :return: a dictionary of the matching paragraphs
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "version": 12,
+            "total_matches": 2,
+            "matches": [
+                {"slide_index": 3, "slide_id": 258, "location": "'Content Placeholder 2'", "text": "Q3 revenue grew by 12%"},
+                {"slide_index": 5, "slide_id": 260, "location": "table 'Table 4' row 2 column 1", "text": "Q3 revenue"}
+            ]
+        }
+        "slide_index" is the 1-indexed slide number. If there are more than 50 matches, only the first 50 are returned.
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "Invalid regular expression: missing ), unterminated subpattern at position 0"
+        }
+        """
+        logger.info(f"---- Searching {presentation_filename} for '{find_text}'")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+        except KeyError:
+            presentation = None
+        if not presentation:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        if not find_text:
+            return {
+                "status": "failure",
+                "message": "find_text must not be empty."
+            }
+        try:
+            pattern, words = compile_pattern(find_text, use_regex, match_case)
+        except re.error as e:
+            return {
+                "status": "failure",
+                "message": f"Invalid regular expression: {e}"
+            }
+
+        with session_manager.session_lock(presentation_filename):
+            matches = session_manager.get_content_index(presentation_filename).search(presentation, pattern, words)
+            version = session_manager.get_version(presentation_filename)
+        logger.info(f"---- Found {len(matches)} matches for '{find_text}'")
+        return {
+            "status": "success",
+            "version": version,
+            "total_matches": len(matches),
+            "matches": matches[:MAX_SEARCH_RESULTS]
+        }
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def find_and_replace(
+            presentation_filename: str,
+            find_text: str,
+            replace_text: str,
+            use_regex: bool = False,
+            match_case: bool = False,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Replaces text everywhere in the presentation, e.g. to apply a change of terminology, in a single change.
+        Replaces text in text boxes and placeholders, table cells and chart titles. The formatting of the text is kept.
+
+        Text is only replaced where it has the same formatting throughout. Text which is partly formatted differently,
+        e.g. with one word in bold, is listed in "not_replaced" so it can be changed with the text tools.
+
+        This only modifies the presentation in memory. Call 'save_presentation' to persist changes.
+
+        :param presentation_filename: The filename of the presentation.
+        :param find_text: The text to replace. Plain text is matched as whole words, e.g. "rev" does not match "revenue".
+        :param replace_text: The text to replace it with. With use_regex, groups can be referred to as \\1, \\2 etc.
+        :param use_regex: Optional. Whether find_text is a Python regular expression rather than plain text. Defaults to False.
+        :param match_case: Optional. Whether upper and lower case must match. Defaults to False.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+        :return: a dictionary indicating the success or failure of the tool
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Replaced 7 occurrences on slides [2, 3, 6]. Remember to save the presentation with the save_presentation tool.",
+            "not_replaced": [{"slide_index": 4, "slide_id": 259, "location": "'Title 1'", "text": "Customer Churn Rate"}],
+            "version": 13
+        }
+        """
+        logger.info(f"---- Attempting to replace '{find_text}' with '{replace_text}' in {presentation_filename}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+        except KeyError:
+            presentation = None
+        if not presentation:
+            return {
+                "status": "failure",
+                "message": "Presentation not found for the current session."
+            }
+        if not find_text:
+            return {
+                "status": "failure",
+                "message": "find_text must not be empty."
+            }
+        try:
+            pattern, words = compile_pattern(find_text, use_regex, match_case)
+
+            def replacement(match: re.Match) -> str:
+                # an empty match of a pattern the samples did not catch, e.g. a lookahead, is left as it is
+                if not match.group(0):
+                    return ""
+                # plain replacement text is inserted as it is, rather than read as a template with group references
+                return match.expand(replace_text) if use_regex else replace_text
+            if use_regex:
+                # checks the group references in replace_text before any text is changed, against a pattern with the
+                # same groups which also matches the empty string
+                re.compile(f"{find_text}|", pattern.flags).sub(replace_text, "", count=1)
+        except re.error as e:
+            return {
+                "status": "failure",
+                "message": f"Invalid regular expression: {e}"
+            }
+
+        matches = session_manager.get_content_index(presentation_filename).search(presentation, pattern, words)
+        replaced = 0
+        changed_slide_indexes = []
+        not_replaced = []
+        slides = presentation.slides
+        for slide_index, slide_matches in _by_slide_index(matches).items():
+            slide = slides[slide_index - 1]
+            session_manager.snapshot_slide(presentation_filename, slide)
+            locations = {match["location"] for match in slide_matches}
+            slide_replaced = 0
+            for location, text_frame in iter_text_frames(slide):
+                if location not in locations:
+                    continue
+                for paragraph in text_frame.paragraphs:
+                    if not pattern.search(paragraph.text):
+                        continue
+                    # only runs containing a whole match are changed, which keeps each run's formatting
+                    paragraph_replaced = 0
+                    for run in paragraph.runs:
+                        count = sum(1 for match in pattern.finditer(run.text) if match.group(0))
+                        if count:
+                            run.text = pattern.sub(replacement, run.text)
+                            paragraph_replaced += count
+                    if not paragraph_replaced:
+                        not_replaced.append({"slide_index": slide_index, "slide_id": slide.slide_id, "location": location, "text": paragraph.text})
+                    slide_replaced += paragraph_replaced
+            if slide_replaced:
+                replaced += slide_replaced
+                changed_slide_indexes.append(slide_index)
+                session_manager.mark_slide_changed(presentation_filename, slide)
+
+        logger.info(f"---- Replaced {replaced} occurrences of '{find_text}' on {len(changed_slide_indexes)} slides")
+        if not replaced and not not_replaced:
+            return {
+                "status": "failure",
+                "message": f"'{find_text}' was not found in the presentation."
+            }
+        slides_changed = f"slides {changed_slide_indexes}" if len(changed_slide_indexes) <= MAX_LISTED_SLIDES else f"{len(changed_slide_indexes)} slides"
+        return {
+            "status": "success",
+            "message": f"Replaced {replaced} occurrences on {slides_changed}. "
+                       f"Remember to save the presentation with the save_presentation tool.",
+            "not_replaced": not_replaced,
+            "changed": bool(replaced)
+        }
+
+
+def _by_slide_index(matches: list[dict]) -> dict[int, list[dict]]:
+    by_slide_index = {}
+    for match in matches:
+        by_slide_index.setdefault(match["slide_index"], []).append(match)
+    return by_slide_index
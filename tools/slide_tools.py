@@ -1,6 +1,9 @@
+from collections import Counter
 from mcp.server import FastMCP
 import logging
 from SessionManager import SessionManager
+from utils.import_slides import SlideImporter
+from utils.recommend_layout import CONTENT_KINDS
 
 
 logger = logging.getLogger(__name__)
@@ -10,22 +13,34 @@ def register_slide_tools(
         session_manager: SessionManager
 ):
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_new_slide(
             presentation_filename: str,
             slide_layout_name: str,
-            user_friendly_name: str = None) -> dict:
+            user_friendly_name: str = None,
+            content_type: str = None,
+            text: str = None,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
         """
         Adds a new slide to the current presentation
 
         Determines a matching slide layout from the session manager slide_layouts_metadata and adds the layout as a new
         slide with a slide name to the current presentation for editing.
 
+        If slide_layout_name is "auto", the layout is chosen as by the recommend_layout tool from content_type and text.
+
         This tool only adds the slide. it does not save the presentation file.
         Call the 'save_presentation' tool to persist changes.
 
         @param presentation_filename: The filename of the presentation.
         @param slide_layout_name: The name of the slide layout. A required parameter. This corresponds to the slide_layout_name property in slide_layouts_metadata. You must generate this value yourself. It is not user provided.
         @param user_friendly_name: The user friendly name of the slide layout in the slide_layouts_metadata dictionary. This optional parameter may be provided by the user and corresponds to the user_friendly_name property in slide_layouts_metadata
+        @param content_type: Optional. Only used when slide_layout_name is "auto". The kind of content for the slide: "title", "text", "chart", "table" or "image". Defaults to "text".
+        @param text: Optional. Only used when slide_layout_name is "auto". The text that will be added to the slide, so the layout chosen has room for it.
+        @param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        @param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         Example of Successful Return Dictionary:
         {
@@ -48,6 +63,7 @@ def register_slide_tools(
 
         """
         logger.info(f"---- Attempting to add new slide with layout")
+        journal_arguments = None
         try:
             presentation = session_manager.get_presentation(presentation_filename)
             if not presentation:
@@ -55,6 +71,17 @@ def register_slide_tools(
                     "status": "failure",
                     "message": "Presentation not found for the current session in add_new_slide_tool."
                 }
+            if slide_layout_name == "auto":
+                recommendation = session_manager.recommend_layout(presentation_filename, content_type or "text", text)
+                if recommendation is None:
+                    return {
+                        "status": "failure",
+                        "message": f"No slide layout takes {content_type} content."
+                    }
+                slide_layout_name = recommendation["slide_layout_name"]
+                # journaled with the layout chosen, so a replay adds the same layout whatever it would recommend then
+                journal_arguments = {"slide_layout_name": slide_layout_name}
+                logger.info(f"---- Recommended layout {slide_layout_name}")
             # loop gets the matching template dictionary from session_manager.slide_layouts_metadata
             for slide_layout in session_manager.slide_layouts_metadata['layouts']:
                 if slide_layout['slide_layout_name'] == slide_layout_name:
@@ -74,14 +101,17 @@ def register_slide_tools(
             }
 
         try:
-            slide_index = presentation.slides.index(new_slide)
+            # add_slide always appends, so the new slide is the last one
+            slide_index = len(presentation.slides) - 1
+            session_manager.mark_structure_changed(presentation_filename, slide_index)
 
             logger.info(
                 f"---- Successfully added new slide '{new_slide.name}' from template {slide_layout_name} to presentation at slide index {slide_index}. Total slides: {len(presentation.slides)}")
             return {
                 "status": "success",
-                "message": f"Successfully added new slide '{new_slide.name}' to presentation at slide index {slide_index}. "
-                           f"Remember to save the presentation with the save_presentation tool."
+                "message": f"Successfully added new slide '{new_slide.name}' with layout {slide_layout_name} to presentation at slide index {slide_index}. "
+                           f"Remember to save the presentation with the save_presentation tool.",
+                "journal_arguments": journal_arguments
             }
         except KeyError:
             logger.warning(f"---- No slide layout found for template '{slide_layout_name}'.")
@@ -99,15 +129,85 @@ def register_slide_tools(
 
 
     @pp_app.tool()
-    def get_slide_layouts_metadata(presentation_filename: str) -> dict:
+    def recommend_layout(presentation_filename: str, content_type: str = "text", text: str = None) -> dict:
+        """
+        Recommends the slide layout for new content, instead of reading get_slide_layouts_metadata and counting words.
+
+        The layout takes the kind of content and has room for the text, if text is given. When several layouts suit
+        the content equally well, each slide added with one of them moves the recommendation on to the next, so the
+        presentation uses a variety of layouts.
+        If "fits" is false, no layout has room for all the text: add it with add_text_to_slide with split_overflow set to true.
+
+        @param presentation_filename: The filename of the presentation.
+        @param content_type: Optional. The kind of content for the slide: "title", "text", "chart", "table" or "image". Defaults to "text".
+        @param text: Optional. The text that will be added to the slide.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "slide_layout_name": "Text Slide",
+            "user_friendly_name": "Text Slide",
+            "fits": true,
+            "lines_needed": 14,
+            "lines_available": 24,
+            "alternatives": ["Large Text Slide"]
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "No slide layout takes image content."
+        }
+        """
+        logger.info(f"---- Recommending layout for {content_type} content")
+        try:
+            if content_type not in CONTENT_KINDS:
+                return {
+                    "status": "failure",
+                    "message": f"Invalid content_type '{content_type}'. Use one of {', '.join(CONTENT_KINDS)}."
+                }
+            if not session_manager.get_presentation(presentation_filename):
+                return {
+                    "status": "failure",
+                    "message": "Presentation not found for the current session."
+                }
+            recommendation = session_manager.recommend_layout(presentation_filename, content_type, text)
+            if recommendation is None:
+                return {
+                    "status": "failure",
+                    "message": f"No slide layout takes {content_type} content."
+                }
+            return {
+                "status": "success",
+                **recommendation
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while recommending a layout: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+
+    @pp_app.tool()
+    def get_slide_layouts_metadata(presentation_filename: str, if_version: str = None) -> dict:
         """
         Returns a dictionary of slide layouts metadata for all the slide layouts that can be used in the presentation.
+
+        The result includes a "version". If you pass the version of a result you have already received as if_version and the
+        metadata has not changed, only {"status": "not_modified", "version": ...} is returned.
         """
         try:
             logger.info(f"---- Getting slide layout metadata")
+            version = session_manager.slide_layouts_metadata_version
+            if if_version == version:
+                return {
+                    "status": "not_modified",
+                    "version": version
+                }
             layouts = [layout for layout in session_manager.slide_layouts_metadata['layouts'] if layout['active'] == True]
             return {
                 "status": "success",
+                "version": version,
                 "slide_layout_metadata": layouts
             }
         except Exception as e:
@@ -115,3 +215,163 @@ def register_slide_tools(
                 "status": "failure",
                 "error": str(e)
             }
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def duplicate_slide(
+            presentation_filename: str,
+            user_slide_number: int,
+            new_slide_name: str = None,
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Duplicates a slide, adding the copy directly after the original slide.
+
+        The copy has the same layout and content as the original, including its charts, tables, images and notes.
+        Charts and notes are copied, so changing the copy does not change the original.
+        As users will provide 1-indexed slide numbers, this tool removes 1 from the user_slide_number to return the 0-indexed slide
+
+        This tool only changes the presentation in memory. Call the 'save_presentation' tool to persist changes.
+
+        @param presentation_filename: The filename of the presentation.
+        @param user_slide_number: The slide number (1-indexed) of the slide to duplicate.
+        @param new_slide_name: Optional. The name of the copy. Defaults to the name of the original slide followed by _copy.
+        @param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        @param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully duplicated slide 3 as slide 4 'weekly_report_copy'. Remember to save the presentation with the save_presentation tool.",
+            "version": 9
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "Invalid slide number. The presentation has 6 slides."
+        }
+        """
+        logger.info(f"---- Attempting to duplicate slide {user_slide_number}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+            if not presentation:
+                return {
+                    "status": "failure",
+                    "message": "Presentation not found for the current session."
+                }
+            slide_index = user_slide_number - 1
+            if slide_index < 0 or slide_index >= len(presentation.slides):
+                return {
+                    "status": "failure",
+                    "message": f"Invalid slide number. The presentation has {len(presentation.slides)} slides."
+                }
+
+            slide = presentation.slides[slide_index]
+            importer = SlideImporter(presentation, session_manager.get_image_parts(presentation_filename))
+            importer.import_slides(presentation, [slide_index])
+            # the copy is appended, so it is moved to follow the original
+            slide_id_list = presentation.slides._sldIdLst
+            slide_id_list.insert(slide_index + 1, slide_id_list[-1])
+            slide_copy = presentation.slides[slide_index + 1]
+            slide_copy.name = new_slide_name or (f"{slide.name}_copy" if slide.name else "")
+            session_manager.mark_structure_changed(presentation_filename, slide_index + 1)
+
+            logger.info(f"---- Successfully duplicated slide {user_slide_number} as '{slide_copy.name}'")
+            return {
+                "status": "success",
+                "message": f"Successfully duplicated slide {user_slide_number} as slide {user_slide_number + 1} '{slide_copy.name}'. "
+                           f"Remember to save the presentation with the save_presentation tool."
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while duplicating a slide: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
+
+    @pp_app.tool()
+    @session_manager.mutating_tool
+    def reorder_slides(
+            presentation_filename: str,
+            user_slide_numbers: list[int],
+            expected_version: int = None,
+            idempotency_key: str = None
+    ) -> dict:
+        """
+        Moves the slides of the presentation into a new order in a single change.
+
+        user_slide_numbers lists the current slide number of every slide in the order the slides should have, e.g. for a
+        presentation with 4 slides, [1, 3, 4, 2] moves slide 2 to the end. Every slide number must be listed exactly once.
+        Slide numbers in footers are updated.
+
+        This tool only changes the presentation in memory. Call the 'save_presentation' tool to persist changes.
+
+        @param presentation_filename: The filename of the presentation.
+        @param user_slide_numbers: The current slide numbers (1-indexed) of all the slides, in their new order.
+        @param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        @param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
+
+        Example of Successful Return Dictionary:
+        {
+            "status": "success",
+            "message": "Successfully reordered slides 2 to 4. Remember to save the presentation with the save_presentation tool.",
+            "version": 10
+        }
+
+        Example of Failure Return Dictionary:
+        {
+            "status": "failure",
+            "message": "user_slide_numbers must list each of the slide numbers 1 to 4 exactly once. Missing: [2]. Repeated: [3]."
+        }
+        """
+        logger.info(f"---- Attempting to reorder slides to {user_slide_numbers}")
+        try:
+            presentation = session_manager.get_presentation(presentation_filename)
+            if not presentation:
+                return {
+                    "status": "failure",
+                    "message": "Presentation not found for the current session."
+                }
+            slide_id_list = presentation.slides._sldIdLst
+            slide_ids = list(slide_id_list)
+            total_slides = len(slide_ids)
+            if len(user_slide_numbers) != total_slides:
+                return {
+                    "status": "failure",
+                    "message": f"user_slide_numbers must list all {total_slides} slide numbers, but {len(user_slide_numbers)} were given."
+                }
+            if sorted(user_slide_numbers) != list(range(1, total_slides + 1)):
+                counts = Counter(user_slide_numbers)
+                missing = [number for number in range(1, total_slides + 1) if number not in counts]
+                repeated = sorted(number for number, count in counts.items() if count > 1)
+                return {
+                    "status": "failure",
+                    "message": f"user_slide_numbers must list each of the slide numbers 1 to {total_slides} exactly once. "
+                               f"Missing: {missing}. Repeated: {repeated}."
+                }
+
+            moved = [index for index, number in enumerate(user_slide_numbers) if number != index + 1]
+            if not moved:
+                return {
+                    "status": "success",
+                    "message": "The slides are already in this order.",
+                    "changed": False
+                }
+            # replaces the slide id list's children in one go, rather than moving the slides one at a time
+            slide_id_list[:] = [slide_ids[number - 1] for number in user_slide_numbers]
+            session_manager.mark_structure_changed(presentation_filename, moved[0])
+
+            logger.info(f"---- Successfully reordered slides {moved[0] + 1} to {moved[-1] + 1}")
+            return {
+                "status": "success",
+                "message": f"Successfully reordered slides {moved[0] + 1} to {moved[-1] + 1}. "
+                           f"Remember to save the presentation with the save_presentation tool."
+            }
+        except Exception as e:
+            logger.error(f"---- An unexpected error occurred while reordering slides: {e}")
+            return {
+                "status": "failure",
+                "message": f"Tool failed with an unexpected error: {e}"
+            }
@@ -95,11 +95,14 @@ def register_table_tools(
 
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_table_to_slide(
             presentation_filename: str,
             table_data: dict,
             slide_name: str = None,
-            slide_index: int = None
+            slide_index: int = None,
+            expected_version: int = None,
+            idempotency_key: str = None
     )-> dict:
         """
         IMPORTANT - only use the slide_name or slide_index provided to find the slide. DO NOT USE the get_presentation_summary tool
@@ -112,6 +115,8 @@ def register_table_tools(
         :param table_data: The json data which will be used for the table
         :param slide_name: Optional. The name of the slide to add text to, E.G 'title' or 'main'
         :param slide_index: Optional. The index of the slide to add text to (0-based).
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         CRITICAL INSTRUCTION: The table_data you receive will already have been validated by the table_handler method.
         table_data MUST BE json structured with keys for 'columns' and 'values'.
@@ -197,6 +202,7 @@ def register_table_tools(
                         "message": f"add_data_to_table raised an error adding table data to slide: {slide_to_edit.name}"
                     }
 
+                session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
                 return {
                     "status": "success",
                     "message": f"Successfully added table to slide {slide_to_edit.name}, index: {slide_index}. Remember to save."
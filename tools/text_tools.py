@@ -4,6 +4,7 @@ import logging
 from pptx.util import Pt
 from SessionManager import SessionManager
 from utils.clean_slide_name import clean_slide_name
+from utils.fit_text import BODY_TEXT_SIZE_PT, split_text
 
 logger = logging.getLogger(__name__)
 
@@ -15,31 +16,68 @@ def register_text_tools(
     def count_words(text: str)-> int:
         return len(text.split())
 
-    def placeholder_has_space_for_text(text: str, layout_name: str) -> bool:
+    def placeholder_has_space_for_text(text: str, placeholder, size_pt: float = BODY_TEXT_SIZE_PT) -> tuple[bool, str]:
+        """
+        Checks text against the space in the placeholder at the font size, using the text capacity table of the
+        placeholder's layout. Returns whether the text fits and a description of the space it needs.
+        """
         try:
-            text_length = len(text.split())
-            logger.info(f'Text length: {text_length}')
-            text_limit = 0
-            for layout in session_manager.slide_layouts_metadata['layouts']:
-                if layout["slide_layout_name"] == layout_name:
-                    logger.info(f'Found slide layout from metadata with name: {layout_name}')
-                    text_limit = 200
-                    logger.info(f'Text Limit is {text_limit}')
-                    break
-            if text_limit:
-                return True if text_length <= text_limit else False
-            return False
+            fit = session_manager.text_capacities.fit(text, placeholder, size_pt)
+            if fit is None:
+                logger.info(f'No text capacity for placeholder {placeholder.name}')
+                return False, f"Placeholder {placeholder.name} has no space for text."
+            lines_needed, lines_available = fit
+            logger.info(f'Text needs {lines_needed} of {lines_available} lines in placeholder {placeholder.name}')
+            return lines_needed <= lines_available, f"The text needs {lines_needed} lines but the placeholder has room for {lines_available}."
         except Exception as e:
             logger.error(e)
+            return False, f"Unable to measure the text: {e}"
+
+    def set_body_text(placeholder, text: str) -> None:
+        text_frame = placeholder.text_frame
+        text_frame.text = text
+        for paragraph in text_frame.paragraphs:
+            for run in paragraph.runs:
+                run.font.size = Pt(BODY_TEXT_SIZE_PT)
+
+    def add_continuation_slides(presentation, slide, placeholder, parts: list[str]) -> list[int]:
+        """
+        Adds the first part of the text to the placeholder and each other part to a new slide with the same layout and
+        title, placed directly after the slide. Returns the 0-based indexes of the slide and the new slides.
+        """
+        set_body_text(placeholder, parts[0])
+        slide_id_list = presentation.slides._sldIdLst
+        slide_index = slide_id_list.index(next(slide_id for slide_id in slide_id_list if slide_id.id == slide.slide_id))
+        title = slide.shapes.title.text_frame.text if slide.shapes.title is not None else ""
+        # slides are found by name, so each continuation takes the next suffix which no slide uses yet
+        names = {existing.name for existing in presentation.slides} if slide.name else set()
+        suffix = 1
+        for number, part in enumerate(parts[1:], start=1):
+            continuation = presentation.slides.add_slide(slide.slide_layout)
+            # add_slide appends, so the slide is moved to follow the previous part
+            slide_id_list.insert(slide_index + number, slide_id_list[-1])
+            if slide.name:
+                suffix += 1
+                while f"{slide.name}_{suffix}" in names:
+                    suffix += 1
+                continuation.name = f"{slide.name}_{suffix}"
+                names.add(continuation.name)
+            if title and continuation.shapes.title is not None:
+                continuation.shapes.title.text_frame.text = title
+            set_body_text(continuation.placeholders[placeholder.placeholder_format.idx], part)
+        return list(range(slide_index, slide_index + len(parts)))
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_text_to_slide(
             presentation_filename: str,
             text: str,
-            layout_name: str,
+            layout_name: str = None,
             slide_name: str = None,
             slide_index: int = None,
-
+            split_overflow: bool = False,
+            expected_version: int = None,
+            idempotency_key: str = None
     ) -> dict:
         """
         IMPORTANT - only use the slide_name or slide_index provided to find the slide. DO NOT USE the get_presentation_summary tool
@@ -51,13 +89,19 @@ def register_text_tools(
         3. Checks to see if the text placeholder can fit the text provided
         4. If the text placeholder can fit the text, adds the text. If the text placeholder cannot fit the text,
         returns a message stating this.
+        5. With split_overflow, text which does not fit is split between paragraphs or sentences instead. The slide is
+        filled and the rest of the text is added to new continuation slides with the same layout and title, directly
+        after the slide. "slide_indexes" in the result lists the (0-based) indexes of all the slides the text was added to.
 
         This only modifies the slide in memory. Call 'save_presentation' to persist changes.
         :param presentation_filename: string. The filename of the presentation
         :param text: string. The string of text to add to the slide.
-        :param layout_name: string. The name of the slide layout template taken from the dictionary returned from get_slide_layouts_metadata,
+        :param layout_name: Optional. Not used: the space for text is measured on the slide's own placeholders.
         :param slide_name: string or None. The name of the slide to add text to, E.G 'title' or 'main'
         :param slide_index: integer or None. The index of the slide to add text to (0-based).
+        :param split_overflow: Optional. If True, text which does not fit the slide is continued on new slides. Defaults to False.
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
 
         :return: a dictionary indicating the success or failure of the tool with an accompanying message
@@ -68,6 +112,13 @@ def register_text_tools(
             "message": "Successfully added text to slide results slide, index: 5. Remember to save."
         }
 
+        Example of Successful Return Dictionary with split_overflow:
+        {
+            "status": "success",
+            "message": "Successfully added text to slide results slide, index: 5, continued on 2 new slides at indexes 6 to 7. Remember to save.",
+            "slide_indexes": [5, 6, 7]
+        }
+
 
         Example of Failure Return Dictionary:
         {
@@ -84,7 +135,7 @@ def register_text_tools(
         Example of Failure Return Dictionary:
         {
             "status": "failure",
-            "message": "Error: This is either because no placeholder for text was found on the slide. Or no empty content placeholder was found on slide results_slide, index: 4. Please add another slide."
+            "message": "Error: This is either because no placeholder for text was found on the slide. Or no empty content placeholder was found on slide results_slide, index: 4. The text needs 31 lines but the placeholder has room for 24. Please add another slide."
         }
         """
         logger.info(f"---- Attempting to add text to slide")
@@ -120,6 +171,8 @@ def register_text_tools(
 
         # Find the first empty placeholder suitable for body or content text
         text_placeholder = None
+        overflow_placeholder = None
+        fit_message = ""
         logger.info(f"---- finding placeholders on slide: {slide_to_edit.name}")
         logger.info(f"---- There are {len(slide_to_edit.placeholders)} placeholders on slide")
         for shape in slide_to_edit.placeholders:
@@ -128,37 +181,53 @@ def register_text_tools(
                 logger.info(f"---- Found object placeholders on slide: {slide_to_edit.name}")
                 if shape.has_text_frame and not shape.text_frame.text:
                     logger.info(f"---- Checking if placeholder_has_space_for_text")
-                    if placeholder_has_space_for_text(text, layout_name):
+                    has_space, fit_message = placeholder_has_space_for_text(text, shape)
+                    if has_space:
                         text_placeholder = shape
                         break
+                    overflow_placeholder = overflow_placeholder or shape
                     logger.info(f"---- No room for text in the available placeholders")
         if text_placeholder:
-            text_frame = text_placeholder.text_frame
-            text_frame.text = text
-            for paragraph in text_frame.paragraphs:
-                for run in paragraph.runs:
-                    run.font.size = Pt(12)
+            set_body_text(text_placeholder, text)
+            session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
             logger.info(f"---- Successfully added text to slide {slide_to_edit.name}, index: {slide_index}.")
             return {
                 "status": "success",
                 "message": f"Successfully added text to slide {slide_to_edit.name}, index: {slide_index}. Remember to save."
             }
-        else:
-            logger.warning(
-                f"---- No empty content placeholder was found on slide {slide_to_edit.name}, index: {slide_index}. Please add another slide"
-            )
-            return {
-                "status": "failure",
-                "message": f"Error: This is either because no placeholder for text was found on the slide. "
-                    f"Or no empty content placeholder was found on slide {slide_to_edit.name}, index: {slide_index}. Please add another slide."
-            }
+        if split_overflow and overflow_placeholder is not None:
+            capacity = session_manager.text_capacities.capacity(overflow_placeholder)
+            parts = split_text(text, capacity, BODY_TEXT_SIZE_PT) if capacity else []
+            # a single part is text which cannot be split to fit, e.g. one very long word, so nothing is changed
+            if len(parts) > 1:
+                slide_indexes = add_continuation_slides(presentation, slide_to_edit, overflow_placeholder, parts)
+                session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
+                session_manager.mark_structure_changed(presentation_filename, slide_indexes[0] + 1)
+                logger.info(f"---- Successfully split text across slides {slide_indexes}")
+                return {
+                    "status": "success",
+                    "message": f"Successfully added text to slide {slide_to_edit.name}, index: {slide_indexes[0]}, continued on "
+                               f"{len(slide_indexes) - 1} new slides at indexes {slide_indexes[1]} to {slide_indexes[-1]}. Remember to save.",
+                    "slide_indexes": slide_indexes
+                }
+        logger.warning(
+            f"---- No empty content placeholder was found on slide {slide_to_edit.name}, index: {slide_index}. Please add another slide"
+        )
+        return {
+            "status": "failure",
+            "message": f"Error: This is either because no placeholder for text was found on the slide. "
+                f"Or no empty content placeholder was found on slide {slide_to_edit.name}, index: {slide_index}. {fit_message} Please add another slide."
+        }
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_title_to_slide(
             presentation_filename: str,
             title: str,
             slide_name: str = None,
-            slide_index: int = None
+            slide_index: int = None,
+            expected_version: int = None,
+            idempotency_key: str = None
     )-> dict:
         """
         IMPORTANT - only use the slide_name or slide_index provided to find the slide. DO NOT USE the get_presentation_summary tool
@@ -170,6 +239,8 @@ def register_text_tools(
         :param text: string. The string of text to add to the slide.
         :param slide_name: string or None. The name of the slide to add text to, E.G 'title' or 'main'
         :param slide_index: integer or None. The index of the slide to add text to (0-based).
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         :return: a dictionary indicating the success or failure of the tool with an accompanying message
 
@@ -242,6 +313,7 @@ def register_text_tools(
                     break
         if text_placeholder:
             text_placeholder.text_frame.text = title
+            session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
             logger.info(f"---- Successfully added text to slide {slide_to_edit.name}, index: {slide_index}.")
             return {
                 "status": "success",
@@ -258,11 +330,14 @@ def register_text_tools(
             }
 
     @pp_app.tool()
+    @session_manager.mutating_tool
     def add_subtitle_to_slide(
             presentation_filename: str,
             subtitle: str,
             slide_name: str = None,
-            slide_index: int = None
+            slide_index: int = None,
+            expected_version: int = None,
+            idempotency_key: str = None
     ) -> dict:
         """
         IMPORTANT - only use the slide_name or slide_index provided to find the slide. DO NOT USE the get_presentation_summary tool
@@ -274,6 +349,8 @@ def register_text_tools(
         :param text: string. The string of text to add to the slide.
         :param slide_name: string or None. The name of the slide to add text to, E.G 'title' or 'main'
         :param slide_index: integer or None. The index of the slide to add text to (0-based).
+        :param expected_version: Optional. The presentation "version" from your last tool result. If the presentation has changed since that version, the tool fails without making changes.
+        :param idempotency_key: Optional. A unique key for this change, e.g. a random string. If you repeat a call with the same key, the original result is returned and the change is not made twice.
 
         :return: a dictionary indicating the success or failure of the tool with an accompanying message
 
@@ -346,6 +423,7 @@ def register_text_tools(
                     break
         if text_placeholder:
             text_placeholder.text_frame.text = subtitle
+            session_manager.mark_slide_changed(presentation_filename, slide_to_edit)
             logger.info(f"---- Successfully added text to slide {slide_to_edit.name}, index: {slide_index}.")
             return {
                 "status": "success",
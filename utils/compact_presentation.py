@@ -0,0 +1,42 @@
+import logging
+
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+logger = logging.getLogger('Presentation Compactor')
+
+# Relationships a slide only needs while its XML refers to them. Others, such as the slide layout and notes
+# slide relationships, are implicit and must never be dropped.
+EXPLICIT_SLIDE_RELTYPES = (RT.CHART, RT.IMAGE, RT.MEDIA, RT.VIDEO, RT.OLE_OBJECT, RT.PACKAGE, RT.HYPERLINK)
+REFERENCED_RIDS_XPATH = "//@r:id | //@r:embed | //@r:link | //@r:pict"
+
+
+def compact_presentation(presentation) -> int:
+    """
+    Drops relationships which nothing in the presentation refers to any more, so the parts behind them are
+    no longer written when the presentation is saved.
+
+    This covers slides removed from the slide list without dropping their relationship, and charts or images
+    whose shape has been removed or replaced on a slide. Returns the number of relationships dropped.
+    """
+    dropped = 0
+    presentation_part = presentation.part
+    slide_rIds = {slide_id.rId for slide_id in presentation.slides._sldIdLst}
+    for rId, rel in list(presentation_part.rels.items()):
+        if rel.reltype == RT.SLIDE and rId not in slide_rIds:
+            presentation_part.rels.pop(rId)
+            dropped += 1
+
+    for slide_id in presentation.slides._sldIdLst:
+        slide_part = presentation_part.related_part(slide_id.rId)
+        if not getattr(slide_part, 'is_parsed', True):
+            # no tool has used the slide since the presentation was opened, so its relationships have not changed
+            continue
+        referenced = set(slide_part._element.xpath(REFERENCED_RIDS_XPATH))
+        for rId, rel in list(slide_part.rels.items()):
+            if rel.reltype in EXPLICIT_SLIDE_RELTYPES and rId not in referenced:
+                slide_part.rels.pop(rId)
+                dropped += 1
+
+    if dropped:
+        logger.info(f"Compacted presentation, dropped {dropped} unreferenced relationships")
+    return dropped
@@ -0,0 +1,68 @@
+import hashlib
+import logging
+
+from lxml import etree
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.shapes.picture import Picture
+
+logger = logging.getLogger('Slide Digest')
+
+EXCERPT_CHARACTERS = 120
+# Placeholders maintained by update_footers, left out of the digest so renumbering does not change it
+FOOTER_PLACEHOLDER_TYPES = (PP_PLACEHOLDER.FOOTER, PP_PLACEHOLDER.SLIDE_NUMBER, PP_PLACEHOLDER.DATE)
+TITLE_PLACEHOLDER_TYPES = (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE)
+
+
+def digest_slide(slide) -> dict:
+    """
+    Returns a compact description of a slide's content for the presentation summary.
+
+    Example of the Returned Dictionary:
+    {
+        "slide_id": 257,
+        "slide_name": "results",
+        "layout": "Chart and Text Slide",
+        "title": "Quarterly Revenue",
+        "excerpt": "Revenue grew in every region apart from the North, where...",
+        "has_chart": true,
+        "has_table": false,
+        "has_image": false,
+        "content_hash": "5d41402abc4b2a76"
+    }
+    """
+    title = ""
+    text = []
+    has_chart = has_table = has_image = False
+    content_hash = hashlib.sha1()
+    for shape in slide.shapes:
+        placeholder_type = shape.placeholder_format.type if shape.is_placeholder else None
+        if placeholder_type in FOOTER_PLACEHOLDER_TYPES:
+            continue
+        content_hash.update(etree.tostring(shape._element))
+        if getattr(shape, 'has_chart', False) and shape.has_chart:
+            has_chart = True
+            content_hash.update(shape.chart_part.blob)
+        elif getattr(shape, 'has_table', False) and shape.has_table:
+            has_table = True
+        elif isinstance(shape, Picture):
+            has_image = True
+        if shape.has_text_frame and shape.text_frame.text.strip():
+            if placeholder_type in TITLE_PLACEHOLDER_TYPES and not title:
+                title = shape.text_frame.text.strip()
+            else:
+                text.append(shape.text_frame.text.strip())
+
+    excerpt = " ".join(" ".join(text).split())
+    if len(excerpt) > EXCERPT_CHARACTERS:
+        excerpt = excerpt[:EXCERPT_CHARACTERS].rsplit(" ", 1)[0] + "..."
+    return {
+        "slide_id": slide.slide_id,
+        "slide_name": slide.name,
+        "layout": slide.slide_layout.name,
+        "title": title,
+        "excerpt": excerpt,
+        "has_chart": has_chart,
+        "has_table": has_table,
+        "has_image": has_image,
+        "content_hash": content_hash.hexdigest()[:16],
+    }
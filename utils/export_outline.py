@@ -0,0 +1,116 @@
+import logging
+
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+from utils.digest_slide import FOOTER_PLACEHOLDER_TYPES, TITLE_PLACEHOLDER_TYPES
+
+logger = logging.getLogger('Outline Exporter')
+
+# rows of each table included in the outline, the header row first
+TABLE_PREVIEW_ROWS = 3
+
+
+def _series_summary(series) -> dict:
+    values = [value for value in series.values if value is not None]
+    summary = {"name": series.name, "points": len(series.values)}
+    if values:
+        summary["min"] = min(values)
+        summary["max"] = max(values)
+    return summary
+
+
+def outline_slide(slide) -> dict:
+    """
+    Returns the content of a slide as a compact outline: its title, the paragraphs of its other text, a preview of
+    each table and a summary of each chart's series rather than all of its data.
+
+    Example of the Returned Dictionary:
+    {
+        "title": "Quarterly Revenue",
+        "text": ["Revenue grew in every region", "The North fell by 2%"],
+        "tables": [{"name": "Table 3", "rows": 12, "columns": 3, "preview": [["Region", "Q3", "Q4"], ["North", "1.2", "1.1"]]}],
+        "charts": [{"name": "Chart 4", "chart_type": "COLUMN_CLUSTERED", "title": "Revenue by region", "categories": 4,
+                    "series": [{"name": "Q3", "points": 4, "min": 0.8, "max": 1.9}]}]
+    }
+    """
+    outline = {"title": "", "text": [], "tables": [], "charts": []}
+
+    def outline_shapes(shapes):
+        for shape in shapes:
+            if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+                outline_shapes(shape.shapes)
+                continue
+            placeholder_type = shape.placeholder_format.type if shape.is_placeholder else None
+            if placeholder_type in FOOTER_PLACEHOLDER_TYPES:
+                continue
+            if shape.has_text_frame:
+                paragraphs = [paragraph.text.strip() for paragraph in shape.text_frame.paragraphs if paragraph.text.strip()]
+                if placeholder_type in TITLE_PLACEHOLDER_TYPES and not outline["title"]:
+                    outline["title"] = " ".join(paragraphs)
+                else:
+                    outline["text"].extend(paragraphs)
+            elif getattr(shape, 'has_table', False) and shape.has_table:
+                rows = shape.table.rows
+                outline["tables"].append({
+                    "name": shape.name,
+                    "rows": len(rows),
+                    "columns": len(shape.table.columns),
+                    "preview": [[cell.text.strip() for cell in rows[i].cells] for i in range(min(TABLE_PREVIEW_ROWS, len(rows)))]
+                })
+            elif getattr(shape, 'has_chart', False) and shape.has_chart:
+                chart = shape.chart
+                plot = chart.plots[0] if len(chart.plots) else None
+                outline["charts"].append({
+                    "name": shape.name,
+                    "chart_type": chart.chart_type.name if chart.chart_type is not None else None,
+                    "title": chart.chart_title.text_frame.text.strip() if chart.has_title else "",
+                    "categories": len(plot.categories) if plot is not None else 0,
+                    "series": [_series_summary(series) for series in chart.series]
+                })
+
+    outline_shapes(slide.shapes)
+    return outline
+
+
+def outline_to_markdown(slide_outline: dict) -> str:
+    """Returns a slide outline from iter_outline as Markdown, a heading for the slide followed by its content."""
+    lines = [f"## {slide_outline['slide_index']}. {slide_outline['title'] or slide_outline['slide_name'] or 'Untitled'}"]
+    lines.extend(f"- {text}" for text in slide_outline["text"])
+    for table in slide_outline["tables"]:
+        lines.append(f"- Table '{table['name']}' ({table['rows']} rows x {table['columns']} columns):")
+        lines.extend(f"  | {' | '.join(row)} |" for row in table["preview"])
+    for chart in slide_outline["charts"]:
+        title = f" \"{chart['title']}\"" if chart["title"] else ""
+        lines.append(f"- Chart '{chart['name']}'{title} ({chart['chart_type']}, {chart['categories']} categories):")
+        for series in chart["series"]:
+            value_range = f", {series['min']} to {series['max']}" if "min" in series else ""
+            lines.append(f"  - {series['name']}: {series['points']} points{value_range}")
+    return "\n".join(lines) + "\n"
+
+
+def iter_outline(presentation, digests, cache: dict):
+    """
+    Generator of the outlines of the slides whose digests are given, one at a time, so a caller can stop as soon as
+    it has as much as it needs.
+
+    digests are slide digests of the presentation summary in slide order, e.g. from its iter_slide_information, so
+    that slides after the point the caller stops are not digested either. Outlines are cached by the digest's
+    content_hash, so only slides which have changed since they were last exported are read again.
+    """
+    slides = presentation.slides
+    walked = 0
+    try:
+        for digest in digests:
+            content_hash = digest["content_hash"]
+            if content_hash not in cache:
+                cache[content_hash] = outline_slide(slides[digest["slide_index"] - 1])
+                walked += 1
+            yield {
+                "slide_index": digest["slide_index"],
+                "slide_id": digest["slide_id"],
+                "slide_name": digest["slide_name"],
+                "layout": digest["layout"],
+                **cache[content_hash]
+            }
+    finally:
+        logger.info(f"Exported outline, {walked} changed slides read")
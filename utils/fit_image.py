@@ -0,0 +1,84 @@
+import io
+import logging
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from errors.ImageProcessingException import ImageProcessingException
+
+logger = logging.getLogger('Image Fitter')
+
+EMU_PER_INCH = 914400
+# Resolution images are rendered at on the slide. High enough for projection and print, far below camera resolution
+TARGET_DPI = 150
+JPEG_QUALITY = 85
+FIT_MODES = ('contain', 'cover')
+SOURCE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png'}
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def target_pixel_size(width_emu: int, height_emu: int, dpi: int = TARGET_DPI) -> tuple[int, int]:
+    """Converts the size of a shape in EMU into the pixel size it needs at the given resolution."""
+    return (
+        max(1, round(width_emu * dpi / EMU_PER_INCH)),
+        max(1, round(height_emu * dpi / EMU_PER_INCH)),
+    )
+
+
+def fitted_size(image_size: tuple[int, int], box_size: tuple[int, int], mode: str) -> tuple[int, int]:
+    """
+    Returns the size an image should be scaled to for a box, keeping its aspect ratio. With contain the
+    whole image fits inside the box, with cover the image fills the box. Images are never scaled up.
+    """
+    width, height = image_size
+    scales = (box_size[0] / width, box_size[1] / height)
+    scale = min(1.0, min(scales) if mode == 'contain' else max(scales))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def fit_image(data: bytes, box_width_px: int, box_height_px: int, mode: str = 'contain') -> tuple[bytes, str]:
+    """
+    Downscales and recompresses an image for a box of the given pixel size.
+
+    Args:
+        data (bytes): The original JPEG or PNG file content.
+        box_width_px (int): The width of the target box in pixels.
+        box_height_px (int): The height of the target box in pixels.
+        mode (str): contain to fit the whole image inside the box, cover to fill the box.
+
+    Returns:
+        tuple: The derivative file content and its file extension. Images with transparency stay PNG,
+        everything else is written as a progressive JPEG.
+    """
+    if mode not in FIT_MODES:
+        raise ImageProcessingException(f"Error: Unsupported fit mode '{mode}'. Use one of {', '.join(FIT_MODES)}.")
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format, source_size = image.format, image.size
+        upright = image.getexif().get(EXIF_ORIENTATION_TAG, 1) == 1
+        target_size = fitted_size(image.size, (box_width_px, box_height_px), mode)
+        # lets the JPEG decoder skip detail that would be thrown away by the resize
+        image.draft('RGB', target_size)
+        image = ImageOps.exif_transpose(image)
+        # exif_transpose may swap the axes, so the size is worked out again from the decoded image
+        target_size = fitted_size(image.size, (box_width_px, box_height_px), mode)
+
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        if image.size != target_size:
+            image = image.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        output = io.BytesIO()
+        if has_alpha:
+            image.save(output, format='PNG', optimize=True)
+            extension = 'png'
+        else:
+            image.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            extension = 'jpg'
+        # an image that is already small enough may not get smaller by recompressing it
+        if target_size == source_size and upright and source_format in SOURCE_EXTENSIONS and output.tell() >= len(data):
+            return data, SOURCE_EXTENSIONS[source_format]
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageProcessingException(f"Error: Unable to read image: {e}")
+
+    logger.info(f"Fitted image to {target_size[0]}x{target_size[1]}px, {len(data)} bytes -> {output.tell()} bytes")
+    return output.getvalue(), extension
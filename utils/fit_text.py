@@ -0,0 +1,268 @@
+import functools
+import hashlib
+import logging
+import math
+import re
+import string
+import weakref
+from typing import NamedTuple
+
+from lxml import etree
+from PIL import ImageFont
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+logger = logging.getLogger('Text Fitter')
+
+EMU_PER_POINT = 12700
+# Font size glyph widths are measured at. Widths scale linearly, so one table serves every font size
+GLYPH_TABLE_SIZE = 100
+# Height of a line of text as a multiple of the font size, PowerPoint's single line spacing
+LINE_SPACING = 1.2
+# Used when the theme's font is not installed. It is wider than most presentation fonts, so text is never
+# wrongly judged to fit
+FALLBACK_FONT = "DejaVuSans.ttf"
+DEFAULT_TYPEFACE = "Calibri"
+# font size of text added to content placeholders
+BODY_TEXT_SIZE_PT = 12
+# Text frame insets PowerPoint uses when a placeholder does not set its own
+DEFAULT_INSETS = {"lIns": 91440, "tIns": 45720, "rIns": 91440, "bIns": 45720}
+TEXT_PLACEHOLDER_TYPES = (PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.OBJECT, PP_PLACEHOLDER.SUBTITLE)
+# where a sentence ends and the next begins
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+NAMESPACES = {"a": "http://schemas.openxmlformats.org/drawingml/2006/main"}
+
+
+class GlyphWidths:
+    """
+    Advance widths of a font's characters, measured once with Pillow at GLYPH_TABLE_SIZE. Printable ASCII is
+    measured up front and any other character the first time it is seen, so measuring text is a dictionary lookup
+    per character rather than a call into FreeType.
+    """
+    def __init__(self, font: ImageFont.FreeTypeFont):
+        self._font = font
+        self._widths = {character: font.getlength(character) for character in string.printable}
+
+    def width(self, text: str, size_pt: float) -> float:
+        """Returns the width of text in points at a font size."""
+        widths = self._widths
+        total = 0.0
+        for character in text:
+            width = widths.get(character)
+            if width is None:
+                width = widths[character] = self._font.getlength(character)
+            total += width
+        return total * size_pt / GLYPH_TABLE_SIZE
+
+
+@functools.lru_cache(maxsize=None)
+def glyph_widths(typeface: str) -> GlyphWidths:
+    """Returns the glyph width table of an installed font, falling back to FALLBACK_FONT if it is not installed."""
+    compact = typeface.replace(" ", "")
+    for font_file in dict.fromkeys((f"{typeface}.ttf", f"{typeface.lower()}.ttf", f"{compact}.ttf", f"{compact.lower()}.ttf", FALLBACK_FONT)):
+        try:
+            font = ImageFont.truetype(font_file, GLYPH_TABLE_SIZE)
+        except OSError:
+            continue
+        logger.info(f"Measuring {typeface} text with {font_file}")
+        return GlyphWidths(font)
+    logger.warning(f"No font file found for {typeface}, measuring text with Pillow's default font")
+    return GlyphWidths(ImageFont.load_default(GLYPH_TABLE_SIZE))
+
+
+def count_lines(text: str, widths: GlyphWidths, size_pt: float, line_width_pt: float) -> int:
+    """Returns the number of lines text wraps onto at a font size, breaking lines between words as PowerPoint does."""
+    space = widths.width(" ", size_pt)
+    lines = 0
+    for paragraph in text.split("\n"):
+        lines += 1
+        used = 0.0
+        for word in paragraph.split():
+            word_width = widths.width(word, size_pt)
+            if used and used + space + word_width <= line_width_pt:
+                used += space + word_width
+                continue
+            if used:
+                lines += 1
+            # a word wider than the line is broken across lines
+            extra_lines = max(0, math.ceil(word_width / line_width_pt) - 1)
+            lines += extra_lines
+            used = word_width - extra_lines * line_width_pt
+    return lines
+
+
+class PlaceholderCapacity(NamedTuple):
+    """The space for text in a placeholder of a layout, in points."""
+    width_pt: float
+    height_pt: float
+    paragraph_spacing_pt: float
+    typeface: str
+
+    def max_lines(self, size_pt: float) -> int:
+        return int(self.height_pt // (size_pt * LINE_SPACING))
+
+    def lines_needed(self, text: str, size_pt: float) -> int:
+        """Returns the lines text needs, counting the space before each paragraph as part of a line."""
+        lines = count_lines(text, glyph_widths(self.typeface), size_pt, self.width_pt)
+        paragraphs = len(text.split("\n"))
+        return lines + math.ceil((paragraphs - 1) * self.paragraph_spacing_pt / (size_pt * LINE_SPACING))
+
+
+def split_text(text: str, capacity: PlaceholderCapacity, size_pt: float) -> list[str]:
+    """
+    Splits text into parts which each fit a placeholder of the given capacity, filling each part before starting
+    the next. Text is split between paragraphs where it can be, otherwise between sentences, and only between words
+    for a sentence too long for a whole placeholder. Returns an empty list if the placeholder has no room for text.
+    """
+    max_lines = capacity.max_lines(size_pt)
+    if not max_lines:
+        return []
+
+    def fits(part: str) -> bool:
+        return capacity.lines_needed(part, size_pt) <= max_lines
+
+    parts = []
+    current = ""
+
+    def add(unit: str, separator: str) -> bool:
+        """Adds a unit of text to the current part, or starts the next part with it. Returns False if it is too long for any part."""
+        nonlocal current
+        candidate = f"{current}{separator}{unit}" if current else unit
+        if fits(candidate):
+            current = candidate
+            return True
+        if not fits(unit):
+            return False
+        parts.append(current)
+        current = unit
+        return True
+
+    for paragraph in text.split("\n"):
+        if add(paragraph, "\n"):
+            continue
+        separator = "\n"
+        for sentence in SENTENCE_END.split(paragraph):
+            if add(sentence, separator):
+                separator = " "
+                continue
+            for word in sentence.split():
+                if not add(word, separator):
+                    # a single word too long for a placeholder cannot be split further, so it has a part to itself
+                    if current:
+                        parts.append(current)
+                    current = word
+                separator = " "
+    parts.append(current)
+    # empty paragraphs where the text was split would only leave blank lines at the top or bottom of a placeholder
+    parts = [part.strip("\n") for part in parts]
+    return [part for part in parts if part] or [""]
+
+
+def _theme_typeface(slide_master) -> str:
+    """Returns the body (minor) typeface of a slide master's theme."""
+    try:
+        theme = etree.fromstring(slide_master.part.part_related_by(RT.THEME).blob)
+        typeface = theme.xpath("//a:minorFont/a:latin/@typeface", namespaces=NAMESPACES)
+        return typeface[0] if typeface and not typeface[0].startswith("+") else DEFAULT_TYPEFACE
+    except (KeyError, etree.XMLSyntaxError):
+        return DEFAULT_TYPEFACE
+
+
+def _placeholder_capacity(placeholder, master_style: tuple[float, float], typeface: str) -> PlaceholderCapacity:
+    body_pr = placeholder._element.xpath("./p:txBody/a:bodyPr")
+    insets = {
+        name: int(body_pr[0].get(name)) if body_pr and body_pr[0].get(name) is not None else default
+        for name, default in DEFAULT_INSETS.items()
+    }
+    indent_pt, paragraph_spacing_pt = master_style
+    width = placeholder.width - insets["lIns"] - insets["rIns"]
+    height = placeholder.height - insets["tIns"] - insets["bIns"]
+    return PlaceholderCapacity(
+        max(0.0, width / EMU_PER_POINT - indent_pt), max(0.0, height / EMU_PER_POINT), paragraph_spacing_pt, typeface
+    )
+
+
+def _master_body_style(slide_master) -> tuple[float, float]:
+    """Returns the indent and the space before paragraphs of first level body text of a slide master, in points."""
+    level_1 = slide_master._element.xpath("./p:txStyles/p:bodyStyle/a:lvl1pPr")
+    if not level_1:
+        return 0.0, 0.0
+    indent = int(level_1[0].get("marL", 0)) / EMU_PER_POINT
+    spacing = level_1[0].find(f"{qn('a:spcBef')}/{qn('a:spcPts')}")
+    return indent, int(spacing.get("val")) / 100 if spacing is not None else 0.0
+
+
+class TextCapacities:
+    """
+    Per-layout tables of the space for text in each text placeholder of a template, used to check whether text
+    will fit a placeholder before it is added.
+
+    A table holds each placeholder's usable width and height after its insets and the master's body indent, and
+    the theme font its text is set in. Tables are built from a template's layouts once, with precompute at start
+    up or otherwise the first time a layout is checked. They are keyed by a hash of the layout, its master and theme,
+    so presentations created from the same template share them while a same-named layout of another template, e.g.
+    in an opened or imported presentation, gets its own. A check then wraps the text using the font's cached glyph
+    widths and compares the lines it needs with the lines the placeholder has room for at the font size.
+    """
+    def __init__(self):
+        # layout key -> (master body style, typeface, placeholder idx -> capacity)
+        self._layouts: dict[str, tuple[tuple[float, float], str, dict[int, PlaceholderCapacity]]] = {}
+        # layout part -> layout key, so each layout part is hashed once
+        self._keys = weakref.WeakKeyDictionary()
+
+    def precompute(self, presentation) -> None:
+        """Builds the capacity tables of every layout of a presentation, e.g. one freshly created from the template."""
+        for layout in presentation.slide_layouts:
+            self._layout_capacities(layout)
+        logger.info(f"Text capacities of {len(self._layouts)} layouts precomputed")
+
+    def _layout_key(self, layout) -> str:
+        key = self._keys.get(layout.part)
+        if key is None:
+            master_part = layout.slide_master.part
+            sha = hashlib.sha1(layout.part.blob)
+            sha.update(master_part.blob)
+            try:
+                sha.update(master_part.part_related_by(RT.THEME).blob)
+            except KeyError:
+                pass
+            key = self._keys[layout.part] = f"{layout.name}:{sha.hexdigest()}"
+        return key
+
+    def _layout_capacities(self, layout) -> tuple[tuple[float, float], str, dict[int, PlaceholderCapacity]]:
+        key = self._layout_key(layout)
+        table = self._layouts.get(key)
+        if table is None:
+            master = layout.slide_master
+            master_style, typeface = _master_body_style(master), _theme_typeface(master)
+            table = self._layouts[key] = master_style, typeface, {
+                placeholder.placeholder_format.idx: _placeholder_capacity(placeholder, master_style, typeface)
+                for placeholder in layout.placeholders
+                if placeholder.placeholder_format.type in TEXT_PLACEHOLDER_TYPES and placeholder.width and placeholder.height
+            }
+            glyph_widths(typeface)
+        return table
+
+    def layout_capacities(self, layout) -> dict[int, PlaceholderCapacity]:
+        """Returns the capacities of a layout's text placeholders by placeholder idx."""
+        return self._layout_capacities(layout)[2]
+
+    def capacity(self, placeholder) -> PlaceholderCapacity | None:
+        """Returns the capacity of a slide placeholder from its layout's table, or None for a placeholder without one."""
+        master_style, typeface, capacities = self._layout_capacities(placeholder.part.slide_layout)
+        capacity = capacities.get(placeholder.placeholder_format.idx)
+        if capacity is not None and placeholder._element.xpath("./p:spPr/a:xfrm"):
+            # the placeholder has been resized on the slide, so its own size is used
+            return _placeholder_capacity(placeholder, master_style, typeface)
+        return capacity
+
+    def fit(self, text: str, placeholder, size_pt: float) -> tuple[int, int] | None:
+        """
+        Returns the (lines needed, lines available) of text in a slide placeholder at a font size, or None if the
+        placeholder's layout has no capacity for it. The text fits if it needs no more lines than are available.
+        """
+        capacity = self.capacity(placeholder)
+        if capacity is None:
+            return None
+        return capacity.lines_needed(text, size_pt), capacity.max_lines(size_pt)
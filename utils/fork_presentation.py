@@ -0,0 +1,62 @@
+import logging
+
+from pptx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from pptx.opc.package import XmlPart, _Relationship
+from pptx.package import Package
+from pptx.parts.chart import ChartPart
+from pptx.parts.coreprops import CorePropertiesPart
+from pptx.parts.embeddedpackage import EmbeddedPackagePart
+from pptx.parts.presentation import PresentationPart
+from pptx.parts.slide import NotesSlidePart, SlidePart
+
+from utils.open_presentation import LazySlidePart
+
+logger = logging.getLogger('Presentation Forker')
+
+# parts tools change, which each fork needs its own copy of. Every other part (masters, layouts, themes, images
+# and media) is never changed once it is in a presentation, so forks share the same part objects.
+FORKED_PART_TYPES = (PresentationPart, SlidePart, NotesSlidePart, ChartPart, EmbeddedPackagePart, CorePropertiesPart)
+
+
+def fork_presentation(presentation):
+    """
+    Returns a copy of the presentation which shares every part it can with the original.
+
+    Slides are copied as LazySlidePart holding the original's XML bytes: a slide which has not been used since it
+    was loaded shares the very bytes it was loaded from, and either copy only parses its own version of a slide
+    when a tool first uses it. The presentation, notes, chart and embedded workbook parts are copied, binary parts
+    sharing their bytes with the original. Layouts, masters, themes, images and media are not copied at all.
+    """
+    source_package = presentation.part.package
+    package = Package(None)
+    forked = {}
+
+    def fork_part(part):
+        if part in forked:
+            return forked[part]
+        if not isinstance(part, FORKED_PART_TYPES):
+            forked[part] = part
+            return part
+
+        if isinstance(part, SlidePart):
+            part_copy = LazySlidePart.load(part.partname, part.content_type, package, part.blob)
+        elif isinstance(part, XmlPart):
+            part_copy = type(part).load(part.partname, part.content_type, package, part.blob)
+        else:
+            part_copy = type(part).load(part.partname, part.content_type, package, part._blob)
+        # recorded before following the part's relationships, as notes slides relate back to their slide
+        forked[part] = part_copy
+        copy_rels(part.rels, part_copy.rels)
+        return part_copy
+
+    def copy_rels(rels, rels_copy):
+        for rId, rel in rels.items():
+            if rel.is_external:
+                rels_copy._rels[rId] = _Relationship(rels_copy._base_uri, rId, rel.reltype, RTM.EXTERNAL, rel.target_ref)
+            else:
+                rels_copy._rels[rId] = _Relationship(rels_copy._base_uri, rId, rel.reltype, RTM.INTERNAL, fork_part(rel.target_part))
+
+    copy_rels(source_package._rels, package._rels)
+    copied = sum(part is not source_part for source_part, part in forked.items())
+    logger.info(f"Forked presentation, copied {copied} of {len(forked)} parts")
+    return package.presentation_part.presentation
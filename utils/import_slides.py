@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import re
+
+from pptx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.package import XmlPart, _Relationship
+from pptx.opc.packuri import PackURI
+from pptx.oxml.ns import qn
+from pptx.parts.slide import SlidePart
+
+from utils.open_presentation import LazySlidePart
+
+logger = logging.getLogger('Slide Importer')
+
+# binary parts which are identical whichever deck they come from, so a copy is only made if the target lacks them
+MEDIA_RELTYPES = (RT.IMAGE, RT.MEDIA, RT.VIDEO, RT.AUDIO)
+PARTNAME_NUMBER = re.compile(r"\d*(\.\w+)$")
+
+
+class SlideImporter:
+    """
+    Copies slides from one presentation into another in a single pass over their relationships.
+
+    Each slide is copied with everything it uses: its notes, charts with their embedded workbooks and any other parts
+    particular to it are copied under new part names, keeping the relationship ids so the copied XML needs no
+    changes. The exception is a link to a slide which is not imported with it, which is removed. Slide XML is copied as bytes and only parsed when a tool uses the copied slide. Images and media are
+    matched by the SHA1 of their content against the target's, so media already in the target, or imported once
+    already, is not copied again. Slides use the target's layout with the same name, so they take on its theme.
+
+    Slides can also be copied within the same presentation, to duplicate them. The copies then share the
+    original's layout, images and media and keep its links to other slides, while charts and notes are copied.
+
+    Part names and media hashes of the target are read once, so importing many slides does not rescan the deck
+    for each one.
+    """
+    def __init__(self, presentation, image_parts: dict = None):
+        self.presentation = presentation
+        self.presentation_part = presentation.part
+        self.package = presentation.part.package
+        self._image_parts = image_parts or {}
+        self._media = None
+        self._partnames = {str(part.partname) for part in self.package.iter_parts()}
+        self._layouts = {layout.name: layout.part for layout in presentation.slide_layouts}
+        self._copies = {}
+
+    def import_slides(self, source_presentation, slide_indexes: list[int]) -> list[int]:
+        """Appends copies of the source slides at slide_indexes (0-based) and returns the slide_ids of the copies."""
+        source_slide_ids = list(source_presentation.slides._sldIdLst)
+        source_presentation_part = source_presentation.part
+        source_slide_parts = [source_presentation_part.related_part(source_slide_ids[index].rId) for index in slide_indexes]
+        # links between imported slides are kept, links to slides which are not imported are dropped
+        self._imported_slides = set(source_slide_parts)
+        # every import makes new copies, so importing the same slides twice adds them twice rather than relating the first copies again
+        self._copies = {}
+
+        slide_ids = []
+        slide_id_list = self.presentation.slides._sldIdLst
+        for slide_part in source_slide_parts:
+            slide_part_copy = self._copy_part(slide_part)
+            rId = self.presentation_part.relate_to(slide_part_copy, RT.SLIDE)
+            slide_ids.append(slide_id_list.add_sldId(rId).id)
+        logger.info(f"Imported {len(slide_ids)} slides")
+        return slide_ids
+
+    def _new_partname(self, partname: str) -> PackURI:
+        template = PARTNAME_NUMBER.sub(r"%d\1", partname)
+        number = 1
+        while template % number in self._partnames:
+            number += 1
+        self._partnames.add(template % number)
+        return PackURI(template % number)
+
+    def _target_media(self) -> dict:
+        """Target media by the SHA1 of its content, including the image parts tools have added to the session."""
+        if self._media is None:
+            self._media = dict(self._image_parts)
+            for part in self.package.iter_parts():
+                if not isinstance(part, XmlPart) and str(part.partname).startswith("/ppt/media/"):
+                    self._media.setdefault(hashlib.sha1(part.blob).hexdigest(), part)
+        return self._media
+
+    def _copy_part(self, part):
+        if part in self._copies:
+            return self._copies[part]
+        if isinstance(part, SlidePart):
+            part_copy = LazySlidePart.load(self._new_partname(str(part.partname)), part.content_type, self.package, part.blob)
+        else:
+            part_copy = type(part).load(self._new_partname(str(part.partname)), part.content_type, self.package, part.blob)
+        # recorded before following the part's relationships, as notes slides relate back to their slide
+        self._copies[part] = part_copy
+
+        rels_copy = part_copy.rels
+        dropped = []
+        for rId, rel in part.rels.items():
+            if rel.is_external:
+                target, target_mode = rel.target_ref, RTM.EXTERNAL
+            else:
+                target, target_mode = self._copy_target(rel.reltype, rel.target_part), RTM.INTERNAL
+                if target is None:
+                    dropped.append(rId)
+                    continue
+            rels_copy._rels[rId] = _Relationship(rels_copy._base_uri, rId, rel.reltype, target_mode, target)
+        if dropped and isinstance(part_copy, XmlPart):
+            _remove_links(part_copy, dropped)
+        return part_copy
+
+    def _copy_target(self, reltype: str, part):
+        if part.package is self.package:
+            if reltype == RT.SLIDE:
+                return self._copy_part(part) if part in self._imported_slides else part
+            if reltype in (RT.SLIDE_LAYOUT, RT.NOTES_MASTER) or reltype in MEDIA_RELTYPES:
+                return part
+            return self._copy_part(part)
+        if reltype == RT.SLIDE_LAYOUT:
+            layout_name = part.slide_layout.name
+            return self._layouts.get(layout_name) or self.presentation.slide_layouts[0].part
+        if reltype == RT.NOTES_MASTER:
+            return self.presentation_part.notes_master_part
+        if reltype == RT.SLIDE:
+            return self._copy_part(part) if part in self._imported_slides else None
+        if reltype in MEDIA_RELTYPES and not isinstance(part, XmlPart):
+            sha1 = hashlib.sha1(part.blob).hexdigest()
+            media = self._target_media()
+            if sha1 not in media:
+                media[sha1] = type(part).load(self._new_partname(str(part.partname)), part.content_type, self.package, part.blob)
+            return media[sha1]
+        return self._copy_part(part)
+
+
+def _remove_links(part, rIds: list[str]) -> None:
+    """
+    Removes the hyperlinks of a copied part which use relationships that were not copied, e.g. links to slides which
+    were not imported, so the part does not refer to relationships it does not have. The linked text is kept.
+    """
+    for link in part._element.xpath("//a:hlinkClick | //a:hlinkHover"):
+        if link.get(qn("r:id")) in rIds:
+            link.getparent().remove(link)
+    logger.info(f"Removed links to {len(rIds)} parts which were not imported from {part.partname}")
@@ -0,0 +1,360 @@
+import csv
+import logging
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from itertools import islice
+from typing import Iterator
+
+import numpy as np
+
+from errors.DataFileIngestionException import DataFileIngestionException
+
+logger = logging.getLogger('Data File Ingestion')
+
+MAX_DATA_SIZE = 10 * 1024 * 1024  # 10MB, matches file_type_checker_callback
+CHUNK_ROWS = 2000
+SAMPLE_ROWS = 5
+CSV_SNIFF_BYTES = 16 * 1024
+
+# Column types in order of generality. A column is widened as chunks are read but never narrowed.
+# 'date' only merges with itself, anything else widens it to 'string'.
+TYPE_ORDER = ('empty', 'integer', 'float', 'string')
+
+NUMBER_DECORATIONS = (',', '£', '$', '€', '%')
+
+XLSX_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+OPC_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+XLSX_MAGIC = b'PK\x03\x04'
+XLS_MAGIC = b'\xd0\xcf\x11\xe0'
+
+
+def iter_csv_rows(file_path: str) -> Iterator[list[str]]:
+    """
+    Lazily yields the rows of a CSV (or tab separated) file as lists of strings.
+    The delimiter is sniffed from the start of the file so pasted spreadsheet data also parses.
+    """
+    with open(file_path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',\t;|')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _xlsx_first_sheet_path(zf: zipfile.ZipFile) -> str:
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    sheet = workbook.find(f'{XLSX_MAIN_NS}sheets/{XLSX_MAIN_NS}sheet')
+    if sheet is None:
+        raise DataFileIngestionException('Error: The workbook does not contain any worksheets.')
+    rel_id = sheet.get(f'{XLSX_REL_NS}id')
+
+    rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{OPC_REL_NS}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+    raise DataFileIngestionException('Error: Unable to locate the first worksheet in the workbook.')
+
+
+def _xlsx_shared_strings(zf: zipfile.ZipFile) -> list[str]:
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return []
+    shared_strings = []
+    with zf.open('xl/sharedStrings.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f'{XLSX_MAIN_NS}si':
+                shared_strings.append(''.join(t.text or '' for t in elem.iter(f'{XLSX_MAIN_NS}t')))
+                elem.clear()
+    return shared_strings
+
+
+def _xlsx_column_index(cell_ref: str) -> int:
+    index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - ord('A') + 1)
+    return index - 1
+
+
+def iter_xlsx_rows(file_path: str) -> Iterator[list[str]]:
+    """
+    Lazily yields the rows of the first worksheet of an .xlsx workbook as lists of strings.
+
+    The worksheet XML is read with iterparse and each row element is cleared once yielded, so only
+    one row (plus the shared strings table) is held in memory at a time.
+    """
+    try:
+        zf = zipfile.ZipFile(file_path)
+    except zipfile.BadZipFile:
+        raise DataFileIngestionException('Error: Only .xlsx workbooks are supported. Legacy .xls files cannot be read.')
+
+    with zf:
+        sheet_path = _xlsx_first_sheet_path(zf)
+        shared_strings = _xlsx_shared_strings(zf)
+        with zf.open(sheet_path) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag != f'{XLSX_MAIN_NS}row':
+                    continue
+                row = []
+                for cell in elem.iter(f'{XLSX_MAIN_NS}c'):
+                    column_index = _xlsx_column_index(cell.get('r', ''))
+                    if column_index < 0:
+                        column_index = len(row)
+                    row.extend([''] * (column_index - len(row)))
+                    cell_type = cell.get('t')
+                    value = cell.find(f'{XLSX_MAIN_NS}v')
+                    if cell_type == 's' and value is not None:
+                        row.append(shared_strings[int(value.text)])
+                    elif cell_type == 'inlineStr':
+                        row.append(''.join(t.text or '' for t in cell.iter(f'{XLSX_MAIN_NS}t')))
+                    else:
+                        row.append(value.text or '' if value is not None else '')
+                elem.clear()
+                yield row
+
+
+def iter_data_file_rows(file_path: str) -> Iterator[list[str]]:
+    """
+    Returns a lazy row iterator for a CSV or XLSX upload.
+    Stored uploads are named after their mime type, so the format is sniffed from the leading bytes.
+    """
+    if not os.path.exists(file_path):
+        raise DataFileIngestionException(f'Error: File not found: {file_path}')
+    if os.path.getsize(file_path) > MAX_DATA_SIZE:
+        raise DataFileIngestionException('Error: Data file size exceeds the limit of 10MB.')
+
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+    if head.startswith(XLSX_MAGIC):
+        return iter_xlsx_rows(file_path)
+    if head.startswith(XLS_MAGIC):
+        raise DataFileIngestionException('Error: Only .xlsx workbooks are supported. Legacy .xls files cannot be read.')
+    return iter_csv_rows(file_path)
+
+
+def iter_row_chunks(rows: Iterator[list[str]], num_columns: int, chunk_rows: int = CHUNK_ROWS) -> Iterator[list[list[str]]]:
+    """
+    Groups rows into chunks of at most chunk_rows rows, padding or truncating every row to num_columns.
+    Blank rows are skipped.
+    """
+    while True:
+        chunk = []
+        read = 0
+        for row in islice(rows, chunk_rows):
+            read += 1
+            if not any(cell.strip() for cell in row):
+                continue
+            if len(row) < num_columns:
+                row = row + [''] * (num_columns - len(row))
+            chunk.append(row[:num_columns])
+        if not read:
+            return
+        # a chunk of only blank rows is skipped, rows after a long blank gap are still read
+        if chunk:
+            yield chunk
+
+
+def clean_column_names(header: list[str]) -> list[str]:
+    """
+    Fills in blank column names and de-duplicates repeated ones so columns can be addressed by name.
+    """
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        name = name.strip() or f'column_{i + 1}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}_{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def strip_number_decorations(values: np.ndarray) -> np.ndarray:
+    """
+    Removes currency symbols, percent signs and thousands separators so '£1,200' and '8.9%' parse as numbers.
+    """
+    for decoration in NUMBER_DECORATIONS:
+        values = np.char.replace(values, decoration, '')
+    return np.char.strip(values)
+
+
+def parse_dates(values: np.ndarray) -> np.ndarray:
+    """
+    Parses an array of ISO (yyyy-mm-dd) or UK (dd/mm/yyyy) date strings into datetime64[D].
+    Raises ValueError if any value is not a date.
+    """
+    if values.size and np.all(np.char.str_len(values) == 10):
+        chars = values.astype('U10').view('U1').reshape(-1, 10)
+        if np.all(chars[:, 2] == '/') and np.all(chars[:, 5] == '/'):
+            # reorder dd/mm/yyyy characters into yyyy-mm-dd without leaving NumPy
+            iso = chars[:, [6, 7, 8, 9, 5, 3, 4, 2, 0, 1]].copy()
+            iso[:, 4] = '-'
+            iso[:, 7] = '-'
+            values = iso.view('U10').ravel()
+    return values.astype('datetime64[D]')
+
+
+def infer_values_type(values: np.ndarray) -> str:
+    """
+    Infers the narrowest column type ('empty', 'integer', 'float', 'date' or 'string') that fits every
+    non-blank value in the array.
+    """
+    present = values[values != '']
+    if not present.size:
+        return 'empty'
+    try:
+        numbers = strip_number_decorations(present).astype(np.float64)
+        return 'integer' if np.all(np.mod(numbers, 1) == 0) else 'float'
+    except ValueError:
+        pass
+    try:
+        parse_dates(present)
+        return 'date'
+    except ValueError:
+        return 'string'
+
+
+def merge_types(current: str, new: str) -> str:
+    """
+    Widens a column type to accommodate a type inferred from a later chunk.
+    """
+    if current == new or new == 'empty':
+        return current
+    if current == 'empty':
+        return new
+    if 'date' in (current, new):
+        return 'string'
+    return max(current, new, key=TYPE_ORDER.index)
+
+
+def ingest_data_file(file_path: str, sample_rows: int = SAMPLE_ROWS) -> dict:
+    """
+    Streams a CSV or XLSX upload in fixed size chunks and builds a compact schema of the data.
+    Only one chunk of rows is held in memory at a time regardless of file size.
+
+    Args:
+        file_path (str): Path of the uploaded file in file storage.
+        sample_rows (int): Number of leading rows to include in the schema.
+
+    Returns:
+        dict: The schema of the file.
+        {
+            "columns": [{"name": "Revenue (£)", "type": "integer", "missing": 0}, ...],
+            "row_count": 16,
+            "sample_rows": [["01/01/2023", "15200", "750"], ...]
+        }
+    """
+    rows = iter_data_file_rows(file_path)
+    header = next(rows, None)
+    if not header:
+        raise DataFileIngestionException('Error: The data file is empty.')
+
+    columns = clean_column_names(header)
+    column_types = ['empty'] * len(columns)
+    missing = [0] * len(columns)
+    samples = []
+    row_count = 0
+
+    for chunk in iter_row_chunks(rows, len(columns)):
+        if len(samples) < sample_rows:
+            samples.extend(chunk[:sample_rows - len(samples)])
+        row_count += len(chunk)
+        # transpose the chunk into one fixed-width string array per column
+        cells = np.char.strip(np.array(chunk, dtype=str))
+        for i in range(len(columns)):
+            column_values = cells[:, i]
+            missing[i] += int(np.count_nonzero(column_values == ''))
+            if column_types[i] != 'string':
+                column_types[i] = merge_types(column_types[i], infer_values_type(column_values))
+
+    logger.info(f"Ingested {row_count} rows and {len(columns)} columns from {file_path}")
+    return {
+        "columns": [
+            {"name": name, "type": column_type, "missing": num_missing}
+            for name, column_type, num_missing in zip(columns, column_types, missing)
+        ],
+        "row_count": row_count,
+        "sample_rows": samples,
+    }
+
+
+def parse_column(values: np.ndarray, column_type: str) -> np.ndarray:
+    """
+    Converts a column of stripped strings into a typed NumPy array.
+    Numeric columns become float64 with NaN for blanks, date columns datetime64[D] with NaT for blanks
+    and everything else a fixed-width unicode array so it can be memory-mapped.
+    """
+    if column_type in ('integer', 'float'):
+        numbers = strip_number_decorations(values)
+        return np.where(numbers == '', 'nan', numbers).astype(np.float64)
+    if column_type == 'date':
+        dates = np.full(values.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        present = values != ''
+        dates[present] = parse_dates(values[present])
+        return dates
+    return values.astype(str)
+
+
+def load_data_file_columns(file_path: str) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Streams a CSV or XLSX upload into typed columnar NumPy arrays.
+
+    Rows are read chunk by chunk as in ingest_data_file. Each chunk is transposed into per-column string
+    arrays immediately, so the row lists are released as the file is read and the column types are
+    only applied once the whole file has been seen.
+
+    Args:
+        file_path (str): Path of the uploaded file in file storage.
+
+    Returns:
+        tuple: A tuple containing:
+               - dict: The schema of the file, as returned by ingest_data_file.
+               - dict: Column name to typed NumPy array, in file column order.
+    """
+    rows = iter_data_file_rows(file_path)
+    header = next(rows, None)
+    if not header:
+        raise DataFileIngestionException('Error: The data file is empty.')
+
+    columns = clean_column_names(header)
+    column_types = ['empty'] * len(columns)
+    missing = [0] * len(columns)
+    column_chunks = [[] for _ in columns]
+    samples = []
+    row_count = 0
+
+    for chunk in iter_row_chunks(rows, len(columns)):
+        if len(samples) < SAMPLE_ROWS:
+            samples.extend(chunk[:SAMPLE_ROWS - len(samples)])
+        row_count += len(chunk)
+        cells = np.char.strip(np.array(chunk, dtype=str))
+        for i in range(len(columns)):
+            column_values = cells[:, i].copy()
+            column_chunks[i].append(column_values)
+            missing[i] += int(np.count_nonzero(column_values == ''))
+            if column_types[i] != 'string':
+                column_types[i] = merge_types(column_types[i], infer_values_type(column_values))
+
+    data = {}
+    for name, column_type, chunks in zip(columns, column_types, column_chunks):
+        values = np.concatenate(chunks) if chunks else np.array([], dtype=str)
+        data[name] = parse_column(values, column_type)
+
+    schema = {
+        "columns": [
+            {"name": name, "type": column_type, "missing": num_missing}
+            for name, column_type, num_missing in zip(columns, column_types, missing)
+        ],
+        "row_count": row_count,
+        "sample_rows": samples,
+    }
+    logger.info(f"Loaded {row_count} rows and {len(columns)} columns from {file_path} into columnar arrays")
+    return schema, data
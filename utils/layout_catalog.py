@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import yaml
+from pptx.enum.shapes import PP_PLACEHOLDER
+
+from utils.digest_slide import FOOTER_PLACEHOLDER_TYPES, TITLE_PLACEHOLDER_TYPES
+from utils.fit_text import BODY_TEXT_SIZE_PT, TextCapacities, glyph_widths
+
+logger = logging.getLogger('Layout Catalog')
+
+LAYOUT_CACHE_DIRECTORY = "layout_cache"
+# the compact catalog written for the agent's instruction, which is loaded in a separate process
+CATALOG_PROMPT_FILENAME = "layout_catalog.txt"
+# hand-written names, descriptions and active flags, merged into the generated catalog by layout name
+LAYOUT_OVERRIDES_PATH = "indexes/slide_layouts_full.yaml"
+# the only fields of a layout the overrides can set, everything else is read from the template
+OVERRIDE_FIELDS = ("user_friendly_name", "description", "active")
+# part of the cache key, so a change to what the catalog holds is not hidden by catalogs cached before it
+CATALOG_FORMAT_VERSION = 2
+# text whose average word width estimates how many words a placeholder holds
+SAMPLE_TEXT = "The quarterly results show that revenue grew in every region while costs stayed broadly flat"
+# placeholder types -> the name of the content they take, in the order they are named in a layout's content-type
+CONTENT_PLACEHOLDER_TYPES = (
+    ((PP_PLACEHOLDER.CHART,), "Chart"),
+    ((PP_PLACEHOLDER.TABLE,), "Table"),
+    ((PP_PLACEHOLDER.PICTURE,), "Image"),
+    ((PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.OBJECT), "Text"),
+)
+
+
+def template_hash(presentation, overrides_path: str = LAYOUT_OVERRIDES_PATH) -> str:
+    """
+    Returns a hash of the layouts, masters and themes of a presentation created from the template, together with
+    the layout overrides file, which changes whenever either would change the catalog.
+    """
+    sha = hashlib.sha1(f"catalog-{CATALOG_FORMAT_VERSION}".encode())
+    parts = {}
+    for master in presentation.slide_masters:
+        parts[master.part.partname] = master.part
+        for rel in master.part.rels.values():
+            if not rel.is_external:
+                parts.setdefault(rel.target_part.partname, rel.target_part)
+    for partname in sorted(parts):
+        sha.update(partname.encode())
+        sha.update(parts[partname].blob)
+    if os.path.exists(overrides_path):
+        with open(overrides_path, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def _words_per_line(capacity, size_pt: float) -> float:
+    widths = glyph_widths(capacity.typeface)
+    words = SAMPLE_TEXT.split()
+    average_word = (widths.width(SAMPLE_TEXT, size_pt) + widths.width(" ", size_pt)) / len(words)
+    return capacity.width_pt / average_word
+
+
+def _describe_layout(index: int, layout, text_capacities: TextCapacities) -> dict:
+    """Returns the catalog entry of a layout as read from the template, before any overrides."""
+    placeholders = []
+    placeholder_types = set()
+    for placeholder in layout.placeholders:
+        placeholder_type = placeholder.placeholder_format.type
+        if placeholder_type in FOOTER_PLACEHOLDER_TYPES:
+            continue
+        placeholder_types.add(placeholder_type)
+        placeholders.append({
+            "idx": placeholder.placeholder_format.idx,
+            "type": placeholder_type.name if placeholder_type is not None else None,
+            "left": placeholder.left,
+            "top": placeholder.top,
+            "width": placeholder.width,
+            "height": placeholder.height
+        })
+
+    content_types = [name for types, name in CONTENT_PLACEHOLDER_TYPES if placeholder_types.intersection(types)]
+    if PP_PLACEHOLDER.CENTER_TITLE in placeholder_types or (not content_types and placeholder_types & {PP_PLACEHOLDER.SUBTITLE}):
+        layout_type, content_types = "TITLE", ["Title"]
+    elif content_types:
+        layout_type = "CONTENT"
+    elif placeholder_types.intersection(TITLE_PLACEHOLDER_TYPES):
+        layout_type, content_types = "SECTION_HEADER", ["Title"]
+    else:
+        layout_type = "BLANK"
+
+    capacities = text_capacities.layout_capacities(layout)
+    body_capacities = [
+        capacities[placeholder["idx"]] for placeholder in placeholders
+        if placeholder["type"] in ("BODY", "OBJECT") and placeholder["idx"] in capacities
+    ]
+    word_capacity = sum(
+        int(capacity.max_lines(BODY_TEXT_SIZE_PT) * _words_per_line(capacity, BODY_TEXT_SIZE_PT))
+        for capacity in body_capacities
+    )
+    named = [placeholder["type"].lower().replace("_", " ") for placeholder in placeholders if placeholder["type"]]
+    return {
+        "slide_layout_index": index,
+        "slide_layout_name": layout.name,
+        # a layout with nothing to add content to is not offered
+        "active": layout_type != "BLANK",
+        "user_friendly_name": layout.name,
+        "type": layout_type,
+        "content-type": " and ".join(content_types),
+        "description": f"A {layout_type.lower().replace('_', ' ')} slide with {', '.join(named) or 'no'} placeholders.",
+        "word_capacity": word_capacity,
+        "placeholders": placeholders
+    }
+
+
+def build_layout_catalog(presentation, text_capacities: TextCapacities, overrides: dict = None) -> dict:
+    """
+    Returns the slide layout metadata of a presentation created from the template, read from its layouts: each
+    layout's index, placeholders and their geometry in EMU, the kinds of content it takes and how many words of
+    body text it holds at BODY_TEXT_SIZE_PT.
+
+    overrides is metadata in the same shape, e.g. indexes/slide_layouts_full.yaml. Of the layout with the same
+    slide_layout_name, only the OVERRIDE_FIELDS it gives replace the generated ones: a layout's index, type,
+    content-type, capacity and placeholders always come from the template, and layouts it does not list are kept.
+
+    Example of the Returned Dictionary:
+    {
+        "layouts": [{
+            "slide_layout_index": 1,
+            "slide_layout_name": "Text Slide",
+            "active": true,
+            "user_friendly_name": "Text Slide",
+            "type": "CONTENT",
+            "content-type": "Text",
+            "description": "A content slide with a title, subtitle, and text placeholder.",
+            "word_capacity": 176,
+            "placeholders": [{"idx": 0, "type": "TITLE", "left": 457200, "top": 274638, "width": 8229600, "height": 1143000}]
+        }]
+    }
+    """
+    overrides_by_name = {layout['slide_layout_name']: layout for layout in (overrides or {}).get('layouts', [])}
+    layouts = []
+    for index, layout in enumerate(presentation.slide_layouts):
+        entry = _describe_layout(index, layout, text_capacities)
+        override = overrides_by_name.get(layout.name, {})
+        entry.update({field: override[field] for field in OVERRIDE_FIELDS if field in override})
+        layouts.append(entry)
+    missing = overrides_by_name.keys() - {layout["slide_layout_name"] for layout in layouts}
+    if missing:
+        logger.warning(f"Layout overrides name layouts which are not in the template: {sorted(missing)}")
+    return {"layouts": layouts}
+
+
+def catalog_prompt(slide_layouts_metadata: dict) -> str:
+    """Returns the active layouts of slide layout metadata in a compact form for the agent's instruction, one line per layout."""
+    lines = ["slide_layout_index | slide_layout_name | user_friendly_name | type | content-type | word_capacity | description"]
+    for layout in slide_layouts_metadata['layouts']:
+        if layout.get('active'):
+            lines.append(
+                f"{layout['slide_layout_index']} | {layout['slide_layout_name']} | {layout.get('user_friendly_name', layout['slide_layout_name'])} | "
+                f"{layout.get('type', '')} | {layout.get('content-type', '')} | {layout.get('word_capacity', 0)} | {layout.get('description', '')}"
+            )
+    return "\n".join(lines)
+
+
+def load_layout_catalog(
+        presentation,
+        text_capacities: TextCapacities,
+        overrides_path: str = LAYOUT_OVERRIDES_PATH,
+        cache_directory: str = LAYOUT_CACHE_DIRECTORY
+) -> dict:
+    """
+    Returns the slide layout metadata of a presentation created from the template from the cache, building and
+    caching it first if the template or the overrides have changed since it was cached. The compact catalog for
+    the agent's instruction is written alongside it.
+    """
+    key = template_hash(presentation, overrides_path)
+    cached_path = os.path.join(cache_directory, f"{key}.json")
+    if os.path.exists(cached_path):
+        try:
+            with open(cached_path) as f:
+                catalog = json.load(f)
+            logger.info(f"Loaded the layout catalog {key} from {cache_directory}")
+            _write_prompt(catalog, cache_directory)
+            return catalog
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Rebuilding the layout catalog, the cached catalog could not be read: {e}")
+
+    overrides = None
+    if os.path.exists(overrides_path):
+        with open(overrides_path) as f:
+            overrides = yaml.safe_load(f)
+    catalog = build_layout_catalog(presentation, text_capacities, overrides)
+    os.makedirs(cache_directory, exist_ok=True)
+    temp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(catalog, f)
+    os.replace(temp_path, cached_path)
+    logger.info(f"Built the layout catalog {key} of {len(catalog['layouts'])} layouts")
+    _write_prompt(catalog, cache_directory)
+    return catalog
+
+
+def _write_prompt(catalog: dict, cache_directory: str) -> None:
+    prompt_path = os.path.join(cache_directory, CATALOG_PROMPT_FILENAME)
+    prompt = catalog_prompt(catalog)
+    if os.path.exists(prompt_path):
+        with open(prompt_path) as f:
+            if f.read() == prompt:
+                return
+    temp_path = f"{prompt_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(prompt)
+    os.replace(temp_path, prompt_path)
+
+
+def load_catalog_prompt(cache_directory: str = LAYOUT_CACHE_DIRECTORY, overrides_path: str = LAYOUT_OVERRIDES_PATH) -> str:
+    """
+    Returns the compact catalog the server generated from the template, or if the server has not generated one yet,
+    the compact form of the hand-written layout metadata.
+    """
+    prompt_path = os.path.join(cache_directory, CATALOG_PROMPT_FILENAME)
+    if os.path.exists(prompt_path):
+        with open(prompt_path) as f:
+            return f.read()
+    logger.warning(f"No generated layout catalog in {cache_directory}, using {overrides_path}")
+    with open(overrides_path) as f:
+        return catalog_prompt(yaml.safe_load(f))
@@ -0,0 +1,77 @@
+import logging
+import mmap
+
+from pptx import Presentation
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.package import PartFactory
+from pptx.oxml import parse_xml
+from pptx.parts.slide import SlidePart
+
+logger = logging.getLogger('Presentation Opener')
+
+
+class LazySlidePart(SlidePart):
+    """
+    SlidePart which keeps the slide's XML as bytes until the slide is first used.
+
+    Opening a presentation only needs the slide list and the relationships between parts, so the XML of each slide
+    is parsed when a tool first reads or edits that slide. A slide which is never used is saved from the bytes it
+    was loaded from, without being parsed or serialised.
+
+    _xml is the slide's XML, or a function which reads it, when the presentation's parts are stored individually
+    and a slide is only read when it is used.
+    """
+    _xml = None
+
+    @classmethod
+    def load(cls, partname, content_type, package, blob):
+        slide_part = cls(partname, content_type, package, element=None)
+        slide_part._xml = blob
+        return slide_part
+
+    @property
+    def _element(self):
+        if self._parsed_element is None and self._xml is not None:
+            self._parsed_element = parse_xml(self._unparsed_xml())
+            self._xml = None
+        return self._parsed_element
+
+    @_element.setter
+    def _element(self, element):
+        self._parsed_element = element
+        if element is not None:
+            self._xml = None
+
+    @property
+    def is_parsed(self) -> bool:
+        return self._xml is None
+
+    @property
+    def blob(self) -> bytes:
+        return self._unparsed_xml() if self._xml is not None else super().blob
+
+    def _unparsed_xml(self) -> bytes:
+        return self._xml() if callable(self._xml) else self._xml
+
+
+# every slide loaded from a file, including the template's, is parsed lazily
+PartFactory.part_type_for[CT.PML_SLIDE] = LazySlidePart
+
+
+class _MappedFile(mmap.mmap):
+    # zipfile asks whether the file it reads from is seekable, which mmap objects only answer from Python 3.13
+    def seekable(self) -> bool:
+        return True
+
+
+def open_presentation(path: str):
+    """
+    Opens a saved presentation with its slides' XML left unparsed until each slide is used.
+
+    The file is memory mapped and its zip members are read straight from the mapping, so the file is not also
+    buffered in memory while the package is unpacked.
+    """
+    with open(path, "rb") as f, _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+        presentation = Presentation(mapped_file)
+    logger.info(f"Opened {path} with {len(presentation.slides._sldIdLst)} slides")
+    return presentation
@@ -0,0 +1,215 @@
+import logging
+
+import numpy as np
+
+from errors.DatasetQueryException import DatasetQueryException
+
+logger = logging.getLogger('Dataset Query')
+
+FILTER_OPERATORS = ('eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'in', 'contains')
+AGGREGATIONS = ('sum', 'mean', 'count', 'min', 'max')
+
+
+def _comparable_value(values: np.ndarray, value):
+    """Casts a JSON filter value to the dtype of the column it is compared against."""
+    if np.issubdtype(values.dtype, np.datetime64):
+        return np.datetime64(value, 'D')
+    if np.issubdtype(values.dtype, np.floating):
+        return float(value)
+    return str(value)
+
+
+def build_row_mask(columns: dict[str, np.ndarray], filters: list[dict] | None) -> np.ndarray:
+    """
+    Builds a boolean row mask from a list of filters. All filters must match for a row to be kept.
+
+    Each filter is a dictionary of the form:
+        {"column": "Region", "op": "eq", "value": "North"}
+    Supported operators are eq, ne, gt, gte, lt, lte, in (value is a list) and contains (substring match).
+    """
+    num_rows = len(next(iter(columns.values()))) if columns else 0
+    mask = np.ones(num_rows, dtype=bool)
+    for f in filters or []:
+        column, op, value = f.get('column'), f.get('op', 'eq'), f.get('value')
+        if column not in columns:
+            raise DatasetQueryException(f"Error: Filter column '{column}' does not exist in the dataset.")
+        if op not in FILTER_OPERATORS:
+            raise DatasetQueryException(f"Error: Unsupported filter operator '{op}'. Use one of {', '.join(FILTER_OPERATORS)}.")
+        values = columns[column]
+        try:
+            if op == 'in':
+                mask &= np.isin(values, [_comparable_value(values, v) for v in value])
+            elif op == 'contains':
+                mask &= np.char.find(np.char.lower(values.astype(str)), str(value).lower()) >= 0
+            else:
+                target = _comparable_value(values, value)
+                mask &= {
+                    'eq': values == target,
+                    'ne': values != target,
+                    'gt': values > target,
+                    'gte': values >= target,
+                    'lt': values < target,
+                    'lte': values <= target,
+                }[op]
+        except (TypeError, ValueError) as e:
+            raise DatasetQueryException(f"Error: Unable to apply filter {f}: {e}")
+    return mask
+
+
+def group_and_aggregate(keys: np.ndarray, values: np.ndarray, aggregation: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorised group-by. Returns the unique keys (in order of first appearance) and the aggregate of
+    values for each key. NaN values are ignored by every aggregation.
+    """
+    if aggregation not in AGGREGATIONS:
+        raise DatasetQueryException(f"Error: Unsupported aggregation '{aggregation}'. Use one of {', '.join(AGGREGATIONS)}.")
+
+    unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # np.unique sorts its output, re-order groups so they appear in the same order as in the file
+    order = np.argsort(first_index)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    group_ids = rank[inverse.ravel()]
+    num_groups = len(unique_keys)
+
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    counts = np.bincount(group_ids, weights=present, minlength=num_groups)
+    if aggregation == 'count':
+        result = counts
+    elif aggregation in ('sum', 'mean'):
+        sums = np.bincount(group_ids[present], weights=values[present], minlength=num_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = sums if aggregation == 'sum' else sums / counts
+    else:
+        fill = np.inf if aggregation == 'min' else -np.inf
+        result = np.full(num_groups, fill)
+        ufunc = np.minimum if aggregation == 'min' else np.maximum
+        ufunc.at(result, group_ids[present], values[present])
+        result[counts == 0] = np.nan
+    return unique_keys[order], result
+
+
+def to_json_values(values: np.ndarray) -> list:
+    """Converts a NumPy column into a JSON friendly list. NaN and NaT become None and dates ISO strings."""
+    if np.issubdtype(values.dtype, np.datetime64):
+        return [None if np.isnat(v) else str(v) for v in values]
+    if np.issubdtype(values.dtype, np.floating):
+        return [None if np.isnan(v) else (int(v) if float(v).is_integer() else float(v)) for v in values]
+    return values.tolist()
+
+
+def query_dataset(
+        columns: dict[str, np.ndarray],
+        select: list[str] | None = None,
+        filters: list[dict] | None = None,
+        group_by: str | None = None,
+        aggregation: str = 'sum',
+        limit: int | None = None,
+) -> dict:
+    """
+    Runs a filter / pick columns / group-by query against a columnar dataset.
+
+    Args:
+        columns (dict): Column name to NumPy array, as held by DatasetStore.
+        select (list): Columns to return. Defaults to every column.
+        filters (list): Row filters, see build_row_mask.
+        group_by (str): Optional column to group rows by. Every other selected column must be numeric
+                        and is aggregated with the given aggregation.
+        aggregation (str): One of sum, mean, count, min or max.
+        limit (int): Optional maximum number of rows to return.
+
+    Returns:
+        dict: The result in table_data format.
+        {
+            "columns": ["Region", "Revenue"],
+            "values": [["North", 31500], ["South", 14850]]
+        }
+    """
+    select = list(select or columns.keys())
+    for name in select + ([group_by] if group_by else []):
+        if name not in columns:
+            raise DatasetQueryException(f"Error: Column '{name}' does not exist in the dataset.")
+
+    mask = build_row_mask(columns, filters)
+
+    if group_by:
+        keys = columns[group_by][mask]
+        result_columns = [group_by]
+        result_values = None
+        for name in select:
+            if name == group_by:
+                continue
+            values = columns[name][mask]
+            if not np.issubdtype(values.dtype, np.floating):
+                raise DatasetQueryException(f"Error: Column '{name}' is not numeric and cannot be aggregated.")
+            group_keys, aggregated = group_and_aggregate(keys, values, aggregation)
+            if result_values is None:
+                result_values = [to_json_values(group_keys)]
+            result_columns.append(name)
+            result_values.append(to_json_values(aggregated))
+        if result_values is None:
+            group_keys, _ = group_and_aggregate(keys, np.zeros(len(keys)), 'count')
+            result_values = [to_json_values(group_keys)]
+    else:
+        result_columns = select
+        result_values = [to_json_values(columns[name][mask]) for name in select]
+
+    rows = [list(row) for row in zip(*result_values)]
+    if limit:
+        rows = rows[:limit]
+    logger.info(f"Dataset query returned {len(rows)} rows and {len(result_columns)} columns")
+    return {
+        "columns": result_columns,
+        "values": rows
+    }
+
+
+def table_data_to_chart_data(table_data: dict) -> dict:
+    """
+    Converts a query result in table_data format into chart_data format. The first column becomes the
+    categories and each remaining numeric column becomes a series. Missing values, e.g. the mean of a group with
+    no values, stay None so they are left out of charts and summaries rather than shown as 0.
+    """
+    categories = [str(row[0]) for row in table_data['values']]
+    series = []
+    for i, name in enumerate(table_data['columns'][1:], start=1):
+        series.append({
+            "name": str(name),
+            "values": [row[i] for row in table_data['values']]
+        })
+    return {
+        "categories": categories,
+        "series": series
+    }
+
+
+def split_rows_by_group(keys: np.ndarray) -> list[tuple]:
+    """
+    Splits row indices by group key in a single sort rather than one full scan per group.
+    Returns a list of (key, row_indices) tuples with groups in order of first appearance.
+    """
+    unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    sorted_rows = np.argsort(inverse, kind='stable')
+    boundaries = np.flatnonzero(np.diff(inverse[sorted_rows])) + 1
+    row_groups = np.split(sorted_rows, boundaries) if len(sorted_rows) else []
+    return [(unique_keys[i], row_groups[i]) for i in np.argsort(first_index)]
+
+
+def table_data_to_columns(table_data: dict, numeric_columns: list[str]) -> dict[str, np.ndarray]:
+    """
+    Converts table_data into the columnar form used by DatasetStore so it can be queried the same way.
+    The numeric_columns are parsed as float64, every other column is kept as strings.
+    """
+    columns = {}
+    for i, name in enumerate(table_data['columns']):
+        values = [row[i] for row in table_data['values']]
+        if name in numeric_columns:
+            try:
+                columns[str(name)] = np.array([np.nan if v in (None, '') else v for v in values], dtype=np.float64)
+            except ValueError:
+                raise DatasetQueryException(f"Error: Column '{name}' contains values which are not numbers.")
+        else:
+            columns[str(name)] = np.array([str(v) for v in values], dtype=str)
+    return columns
@@ -0,0 +1,123 @@
+import logging
+
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+from utils.fit_text import BODY_TEXT_SIZE_PT, TextCapacities
+
+logger = logging.getLogger('Layout Recommender')
+
+CONTENT_KINDS = ("title", "text", "chart", "table", "image")
+# Layouts whose text placeholder the text fills at least this much are equally good, so slides rotate between them.
+# Below it, the layout the text fills most is best, so short text is not lost in a large placeholder
+MIN_FILL = 0.3
+
+
+class LayoutRecommender:
+    """
+    Picks the slide layout for a piece of content from the slide layout metadata, without the agent reading the
+    metadata and counting words itself.
+
+    An index of the active layouts is built once per template: the kinds of content each layout takes, read from its
+    'type' and 'content-type' metadata, and the capacity of its largest body text placeholder from TextCapacities.
+    A recommendation matches the kinds of content against the index and measures any text against each candidate's
+    capacity. Layouts which take the content equally well are used in turn, so a run of similar slides gets a
+    variety of layouts. Whose turn it is comes from how many slides of the presentation already use those layouts,
+    so the same presentation always gets the same recommendation, including when a change is undone or replayed.
+    """
+    def __init__(self, slide_layouts_metadata: dict, text_capacities: TextCapacities):
+        self.slide_layouts_metadata = slide_layouts_metadata
+        self.text_capacities = text_capacities
+        # layout name -> (metadata, content kinds, body text capacity, layout part)
+        self._index: dict[str, tuple] = {}
+
+    def _layout_index(self, presentation) -> dict[str, tuple]:
+        if not self._index:
+            slide_layouts = presentation.slide_layouts
+            for metadata in self.slide_layouts_metadata['layouts']:
+                if not metadata.get('active') or metadata['slide_layout_index'] >= len(slide_layouts):
+                    continue
+                layout = slide_layouts[metadata['slide_layout_index']]
+                capacities = self.text_capacities.layout_capacities(layout)
+                body_capacities = [
+                    capacities[placeholder.placeholder_format.idx] for placeholder in layout.placeholders
+                    if placeholder.placeholder_format.type == PP_PLACEHOLDER.BODY and placeholder.placeholder_format.idx in capacities
+                ]
+                body_capacity = max(body_capacities, key=lambda capacity: capacity.width_pt * capacity.height_pt, default=None)
+                self._index[metadata['slide_layout_name']] = (metadata, _content_kinds(metadata), body_capacity, layout.part)
+            logger.info(f"Indexed {len(self._index)} slide layouts")
+        return self._index
+
+    def recommend(self, presentation, content_kind: str, text: str = None, size_pt: float = BODY_TEXT_SIZE_PT) -> dict | None:
+        """
+        Returns the best layout for content of the given kind with optional text, or None if no layout takes that
+        kind of content. Between layouts which are equally good, the next one is picked each time a slide is added
+        with one of them.
+
+        Example of the Returned Dictionary:
+        {
+            "slide_layout_name": "Text Slide",
+            "user_friendly_name": "Text Slide",
+            "fits": true,
+            "lines_needed": 14,
+            "lines_available": 24,
+            "alternatives": ["Large Text Slide"]
+        }
+        """
+        candidates = []
+        layout_parts = {}
+        for name, (metadata, kinds, body_capacity, layout_part) in self._layout_index(presentation).items():
+            if content_kind == "title" and "title" not in kinds:
+                continue
+            if content_kind == "text" and kinds != {"text"}:
+                continue
+            if content_kind not in ("title", "text") and content_kind not in kinds:
+                continue
+            if text and body_capacity is None:
+                # a layout without a text placeholder has no room for the text
+                continue
+            if text:
+                lines_needed, lines_available = body_capacity.lines_needed(text, size_pt), body_capacity.max_lines(size_pt)
+            else:
+                lines_needed, lines_available = 0, body_capacity.max_lines(size_pt) if body_capacity else 0
+            candidates.append((name, metadata, lines_needed, lines_available))
+            layout_parts[name] = layout_part
+        if not candidates:
+            return None
+
+        fitting = [candidate for candidate in candidates if candidate[2] <= candidate[3]]
+        if fitting:
+            def fill(candidate) -> float:
+                return candidate[2] / candidate[3] if candidate[3] else 1.0
+            equally_good = [candidate for candidate in fitting if fill(candidate) >= MIN_FILL] or [max(fitting, key=fill)]
+            turn = _slides_using(presentation, {layout_parts[candidate[0]] for candidate in equally_good})
+            best = equally_good[turn % len(equally_good)]
+        else:
+            # nothing fits, so the layout with the most room, for the text to be split across slides
+            best = max(candidates, key=lambda candidate: candidate[3])
+        name, metadata, lines_needed, lines_available = best
+        return {
+            "slide_layout_name": name,
+            "user_friendly_name": metadata.get('user_friendly_name', name),
+            "fits": lines_needed <= lines_available,
+            "lines_needed": lines_needed,
+            "lines_available": lines_available,
+            "alternatives": [candidate[0] for candidate in fitting if candidate is not best]
+        }
+
+
+def _slides_using(presentation, layout_parts: set) -> int:
+    """Returns how many slides of a presentation use one of the layout parts, read from relationships without parsing slides."""
+    presentation_part = presentation.part
+    return sum(
+        presentation_part.related_part(slide_id.rId).part_related_by(RT.SLIDE_LAYOUT) in layout_parts
+        for slide_id in presentation.slides._sldIdLst
+    )
+
+
+def _content_kinds(metadata: dict) -> set[str]:
+    """Returns the kinds of content a layout takes, from its 'type' and 'content-type' metadata, e.g. {'chart', 'text'}."""
+    if metadata.get('type') == 'TITLE':
+        return {"title"}
+    content_type = metadata.get('content-type', '').lower()
+    return {kind for kind in CONTENT_KINDS if kind in content_type}
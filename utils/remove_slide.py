@@ -0,0 +1,25 @@
+import logging
+
+logger = logging.getLogger('Slide Remover')
+
+
+def remove_slide(presentation, slide_index: int) -> None:
+    """
+    Removes the slide at slide_index (0-based) from the presentation.
+
+    Removing the slide's entry from the slide list is not enough: the presentation part would still hold a
+    relationship to the slide part, so the slide and everything it uses (charts, embedded workbooks, images,
+    notes) would stay in memory and be written on every save. Dropping the relationship as well leaves those
+    parts unreachable, and python-pptx only saves parts that are reachable from the package.
+
+    The remaining slide parts are then renamed to slide1.xml, slide2.xml etc. in slide order. python-pptx names a
+    new slide part after the number of slides, so without this the next slide added would take the partname of an
+    existing slide and the two would be written to the same zip entry.
+    """
+    slide_id_list = presentation.slides._sldIdLst
+    slide_id = list(slide_id_list)[slide_index]
+    rId = slide_id.rId
+    slide_id_list.remove(slide_id)
+    presentation.part.drop_rel(rId)
+    presentation.part.rename_slide_parts([remaining.rId for remaining in slide_id_list])
+    logger.info(f"Removed slide at index {slide_index} and dropped its relationship {rId}")
@@ -0,0 +1,124 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger('Data Summariser')
+
+# A fitted slope smaller than this fraction of the mean absolute value per period is reported as flat
+FLAT_TREND_THRESHOLD = 0.01
+DECIMAL_PLACES = 2
+
+
+def _rounded(value) -> float | None:
+    if value is None or not np.isfinite(value):
+        return None
+    value = round(float(value), DECIMAL_PLACES)
+    return int(value) if value.is_integer() else value
+
+
+def period_over_period_change(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the absolute and percentage change between each consecutive pair of values.
+    Percentage changes from a zero or missing value are NaN.
+    """
+    changes = np.diff(values)
+    previous = values[:-1]
+    pct_changes = np.full(changes.shape, np.nan)
+    np.divide(changes * 100, np.abs(previous), out=pct_changes, where=(previous != 0) & ~np.isnan(previous))
+    return changes, pct_changes
+
+
+def trend(values: np.ndarray) -> dict:
+    """
+    Fits a least squares line through the values (ignoring missing ones) and describes its direction.
+    """
+    present = ~np.isnan(values)
+    if np.count_nonzero(present) < 2:
+        return {"direction": "insufficient data", "slope_per_period": None}
+    x = np.arange(len(values))[present]
+    slope, _ = np.polyfit(x, values[present], 1)
+    scale = np.mean(np.abs(values[present]))
+    if scale == 0 or abs(slope) < FLAT_TREND_THRESHOLD * scale:
+        direction = "flat"
+    else:
+        direction = "increasing" if slope > 0 else "decreasing"
+    return {"direction": direction, "slope_per_period": _rounded(slope)}
+
+
+def summarise_series(categories: list, values: list) -> dict:
+    """
+    Computes summary facts for one chart series.
+
+    Args:
+        categories (list): The category labels, e.g. months or regions.
+        values (list): The series values, one per category. None is treated as missing.
+
+    Returns:
+        dict: Summary facts for the series.
+        {
+            "count": 4, "total": 38, "mean": 9.5, "min": {"category": "Mar", "value": 4},
+            "max": {"category": "Feb", "value": 10}, "change": {"from": "Jan", "to": "Apr", "value": 2, "pct": 33.33},
+            "largest_increase": {...}, "largest_decrease": {...},
+            "period_over_period_pct": [66.67, -60, 100],
+            "trend": {"direction": "increasing", "slope_per_period": 0.4}
+        }
+    """
+    values = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    present = ~np.isnan(values)
+    if not np.any(present):
+        return {"count": 0}
+
+    categories = [str(c) for c in categories]
+    present_values = values[present]
+    min_index = int(np.nanargmin(values))
+    max_index = int(np.nanargmax(values))
+    first_index = int(np.argmax(present))
+    last_index = len(values) - 1 - int(np.argmax(present[::-1]))
+
+    summary = {
+        "count": int(np.count_nonzero(present)),
+        "total": _rounded(present_values.sum()),
+        "mean": _rounded(present_values.mean()),
+        "min": {"category": categories[min_index], "value": _rounded(values[min_index])},
+        "max": {"category": categories[max_index], "value": _rounded(values[max_index])},
+    }
+
+    if last_index > first_index:
+        first, last = values[first_index], values[last_index]
+        summary["change"] = {
+            "from": categories[first_index],
+            "to": categories[last_index],
+            "value": _rounded(last - first),
+            "pct": _rounded((last - first) * 100 / abs(first)) if first else None,
+        }
+        changes, pct_changes = period_over_period_change(values)
+        if np.any(~np.isnan(changes)):
+            increase_index = int(np.nanargmax(changes))
+            decrease_index = int(np.nanargmin(changes))
+            if changes[increase_index] > 0:
+                summary["largest_increase"] = {
+                    "to": categories[increase_index + 1],
+                    "value": _rounded(changes[increase_index]),
+                    "pct": _rounded(pct_changes[increase_index]),
+                }
+            if changes[decrease_index] < 0:
+                summary["largest_decrease"] = {
+                    "to": categories[decrease_index + 1],
+                    "value": _rounded(changes[decrease_index]),
+                    "pct": _rounded(pct_changes[decrease_index]),
+                }
+        summary["period_over_period_pct"] = [_rounded(p) for p in pct_changes]
+        summary["trend"] = trend(values)
+
+    return summary
+
+
+def summarise_chart_data(chart_data: dict) -> dict:
+    """
+    Computes summary facts for every series in a chart_data dictionary, keyed by series name.
+    """
+    summary = {}
+    for series in chart_data['series']:
+        summary[series['name']] = summarise_series(chart_data['categories'], series['values'])
+    logger.info(f"Summarised {len(summary)} series over {len(chart_data['categories'])} categories")
+    return summary
@@ -0,0 +1,66 @@
+import logging
+
+from pptx.enum.shapes import PP_PLACEHOLDER
+
+logger = logging.getLogger('Footer Updater')
+
+# The footer text on the template's layouts, replaced with the client and project title
+FOOTER_TEMPLATE_TEXT = "Client x Jaywing Project Title"
+
+
+def footer_text(client_name: str = "", project_title: str = "") -> str:
+    return f'{client_name} x {project_title}' if client_name and project_title else ""
+
+
+def add_footer_placeholders(slide) -> set:
+    """
+    Adds the footer and slide number placeholders of the slide's layout to the slide if it does not have them, and
+    returns the types of the placeholders added. python-pptx does not copy these from the layout when a slide is added.
+    """
+    present = {placeholder.placeholder_format.type for placeholder in slide.placeholders}
+    added = set()
+    for layout_placeholder in slide.slide_layout.placeholders:
+        placeholder_type = layout_placeholder.placeholder_format.type
+        if placeholder_type in (PP_PLACEHOLDER.FOOTER, PP_PLACEHOLDER.SLIDE_NUMBER) and placeholder_type not in present:
+            slide.shapes.clone_placeholder(layout_placeholder)
+            added.add(placeholder_type)
+    return added
+
+
+def update_footers(presentation, from_index: int = 0, footer: dict = None) -> int:
+    """
+    Brings the slide numbers and footers of the slides from from_index onwards up to date.
+
+    Slides before from_index are untouched, so adding a slide at the end only updates that slide and deleting
+    or inserting a slide only renumbers the slides after it.
+
+    Args:
+        presentation: The presentation to update.
+        from_index (int): The 0-based index of the first slide whose position may have changed.
+        footer (dict): The footer state stored for the session, or None if footers have not been set up. Of the form:
+            {"text": "Client x Project", "previous_text": "Old Client x Project"}
+            When set, slides without footer and slide number placeholders get them from their layout, and those
+            footers and footers showing the template text or the previous text are changed to the current text.
+            Footers left blank or given other text are kept.
+
+    Returns:
+        int: The number of slides updated.
+    """
+    slides = presentation.slides
+    replaceable_text = {FOOTER_TEMPLATE_TEXT, footer.get("previous_text")} if footer else set()
+    for index in range(from_index, len(slides)):
+        slide = slides[index]
+        added = add_footer_placeholders(slide) if footer else set()
+        for placeholder in slide.placeholders:
+            placeholder_type = placeholder.placeholder_format.type
+            # footers copied from the layout by add_footer_placeholders start empty
+            if placeholder_type == PP_PLACEHOLDER.FOOTER and (placeholder_type in added or placeholder.text in replaceable_text):
+                if placeholder.text != footer["text"]:
+                    placeholder.text_frame.text = footer["text"]
+            elif placeholder_type == PP_PLACEHOLDER.SLIDE_NUMBER:
+                slide_number = str(index + 1)
+                if placeholder.text != slide_number:
+                    placeholder.text = slide_number
+    updated = max(0, len(slides) - from_index)
+    logger.info(f"Updated footers and slide numbers of {updated} slides from index {from_index}")
+    return updated
@@ -1,5 +1,5 @@
 import logging
-from errors import ChartDataConverterException
+from errors.ChartDataConverterException import ChartDataConverterException
 
 logger = logging.getLogger('Chart Data Validator')
 
@@ -70,9 +70,9 @@ def validate_chart_data(data):
             if not isinstance(s['values'], list):
                 return False, ChartDataConverterException(f"Error: The 'values' for series at index {i} must be a list.")
 
-            # 6. Validate that all values in the 'values' list are numbers
+            # 6. Validate that all values in the 'values' list are numbers, or None for a missing value
             for val_index, value in enumerate(s['values']):
-                if not isinstance(value, (int, float)):
+                if value is not None and not isinstance(value, (int, float)):
                     return False, ChartDataConverterException(f"Error: Value at index {val_index} in series '{s['name']}' is not a number.")
 
             # 7. Check for length consistency